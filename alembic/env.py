@@ -13,6 +13,10 @@ config = context.config
 # This line sets up loggers basically.
 fileConfig(config.config_file_name)
 
+# migrate the same database the app uses (DATABASE_BACKEND)
+from app.config import Config
+config.set_main_option('sqlalchemy.url', Config.sqlalchemy_url())
+
 # add your model's MetaData object here
 # for 'autogenerate' support
 # from myapp import mymodel
@@ -0,0 +1,31 @@
+"""add created/updated timestamps to ark
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # existing rows keep NULL timestamps: they predate change tracking and
+    # are covered by a full export
+    op.add_column('ark', sa.Column('created', sa.DateTime))
+    op.add_column('ark', sa.Column('updated', sa.DateTime))
+    op.create_index('ix_ark_updated', 'ark', ['updated'])
+
+
+def downgrade():
+    op.drop_index('ix_ark_updated', 'ark')
+    with op.batch_alter_table('ark') as batch_op:
+        batch_op.drop_column('updated')
+        batch_op.drop_column('created')
@@ -0,0 +1,211 @@
+"""lookup-optimized schema: (naan, shoulder) key, WITHOUT ROWID ark
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+SHOULDER_COLUMNS = ['naan', 'shoulder', 'name', 'description', 'redirect_prefix', 'template', 'created', 'updated']
+ARK_COLUMNS = ['identifier', 'naan', 'assigned_name', 'shoulder', 'url', 'who', 'what', 'when', 'created', 'updated']
+
+SHOULDER_TABLE = '''
+CREATE TABLE shoulder_new (
+  naan INTEGER NOT NULL,
+  shoulder TEXT NOT NULL,
+  name TEXT,
+  description TEXT,
+  redirect_prefix TEXT,
+  template TEXT,
+  created DATETIME,
+  updated DATETIME,
+  PRIMARY KEY (naan, shoulder),
+  FOREIGN KEY (naan) REFERENCES naan(naan)
+) WITHOUT ROWID
+'''
+
+ARK_TABLE = '''
+CREATE TABLE ark_new (
+  identifier TEXT NOT NULL PRIMARY KEY,
+  naan INTEGER,
+  assigned_name TEXT,
+  shoulder TEXT,
+  url TEXT,
+  who TEXT,
+  what TEXT,
+  "when" TEXT,
+  created DATETIME,
+  updated DATETIME,
+  FOREIGN KEY (naan) REFERENCES naan(naan),
+  FOREIGN KEY (naan, shoulder) REFERENCES shoulder(naan, shoulder)
+) WITHOUT ROWID
+'''
+
+# the 0001 layout, as the app has been using it
+LEGACY_SHOULDER_TABLE = '''
+CREATE TABLE shoulder_new (
+  shoulder TEXT PRIMARY KEY,
+  naan INTEGER,
+  name TEXT,
+  description TEXT,
+  redirect_prefix TEXT,
+  template TEXT,
+  FOREIGN KEY (naan) REFERENCES naan(naan)
+)
+'''
+
+LEGACY_ARK_TABLE = '''
+CREATE TABLE ark_new (
+  identifier TEXT PRIMARY KEY,
+  naan INTEGER,
+  assigned_name TEXT,
+  shoulder TEXT,
+  url TEXT,
+  who TEXT,
+  what TEXT,
+  "when" TEXT,
+  created DATETIME,
+  updated DATETIME,
+  FOREIGN KEY (naan) REFERENCES naan(naan),
+  FOREIGN KEY (shoulder) REFERENCES shoulder(shoulder)
+)
+'''
+
+
+def copy_table(table, create_sql, columns, order_by=None):
+    """Rebuild `table` as `create_sql`, copying `columns` over.
+
+    Columns the old table doesn't have (databases created from the old
+    schema.sql lack who/what/when, redirect_prefix and template) are
+    filled with NULL.
+    """
+    existing = {c['name'] for c in sa.inspect(op.get_bind()).get_columns(table)}
+    select = ', '.join(f'"{c}"' if c in existing else 'NULL' for c in columns)
+    names = ', '.join(f'"{c}"' for c in columns)
+
+    op.execute(create_sql)
+    query = f'INSERT INTO {table}_new ({names}) SELECT {select} FROM {table}'
+    if order_by:
+        # insert in key order so the clustered b-tree is built by appending
+        query += f' ORDER BY {order_by}'
+    op.execute(query)
+    op.execute(f'DROP TABLE {table}')
+    op.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
+
+
+def check_meta_unused():
+    """ark.meta (schema.sql before 0002) is dropped: refuse if it holds data.
+
+    Returns whether the column exists.
+    """
+    bind = op.get_bind()
+    if 'meta' not in {c['name'] for c in sa.inspect(bind).get_columns('ark')}:
+        return False
+    count = bind.execute(sa.text("SELECT count(*) FROM ark WHERE meta IS NOT NULL AND meta <> ''")).scalar()
+    if count:
+        raise RuntimeError(
+            f'{count} ARKs have a value in ark.meta, which this revision drops. '
+            'Move the values to who/what/when (or clear them) and upgrade again.'
+        )
+    return True
+
+
+def add_missing_columns(table, columns):
+    existing = {c['name'] for c in sa.inspect(op.get_bind()).get_columns(table)}
+    for column in columns:
+        if column.name not in existing:
+            op.add_column(table, column)
+
+
+def drop_foreign_keys(table, referred_table):
+    for fk in sa.inspect(op.get_bind()).get_foreign_keys(table):
+        if fk['referred_table'] == referred_table and fk['name']:
+            op.drop_constraint(fk['name'], table, type_='foreignkey')
+
+
+def replace_primary_key(table, columns):
+    pk = sa.inspect(op.get_bind()).get_pk_constraint(table)
+    if pk['name']:
+        op.drop_constraint(pk['name'], table, type_='primary')
+    for column in columns:
+        op.alter_column(table, column, nullable=False)
+    op.create_primary_key(f'{table}_pkey', table, columns)
+
+
+def upgrade_server(has_meta):
+    """PostgreSQL: same keys and indexes; ark is clustered once on its key."""
+    add_missing_columns('shoulder', [
+        sa.Column('redirect_prefix', sa.Text),
+        sa.Column('template', sa.Text),
+        sa.Column('created', sa.DateTime),
+        sa.Column('updated', sa.DateTime),
+    ])
+    add_missing_columns('ark', [sa.Column('who', sa.Text), sa.Column('what', sa.Text), sa.Column('when', sa.Text)])
+    if has_meta:
+        op.drop_column('ark', 'meta')
+
+    drop_foreign_keys('ark', 'shoulder')
+    replace_primary_key('shoulder', ['naan', 'shoulder'])
+    op.create_foreign_key('ark_naan_shoulder_fkey', 'ark', 'shoulder', ['naan', 'shoulder'], ['naan', 'shoulder'])
+
+    op.execute('DROP INDEX IF EXISTS idx_assigned_name')
+    op.create_index('ix_ark_shoulder', 'ark', ['shoulder', 'identifier', 'naan'])
+    pk = sa.inspect(op.get_bind()).get_pk_constraint('ark')
+    op.execute(f'CLUSTER ark USING "{pk["name"]}"')
+    op.execute('ANALYZE ark')
+
+
+def downgrade_server():
+    op.drop_index('ix_ark_shoulder', 'ark')
+    op.create_index('idx_assigned_name', 'ark', ['assigned_name'])
+    drop_foreign_keys('ark', 'shoulder')
+    replace_primary_key('shoulder', ['shoulder'])
+    op.create_foreign_key('ark_shoulder_fkey', 'ark', 'shoulder', ['shoulder'], ['shoulder'])
+    op.drop_column('shoulder', 'updated')
+    op.drop_column('shoulder', 'created')
+    op.drop_column('naan', 'updated')
+    op.drop_column('naan', 'created')
+
+
+def upgrade():
+    # before any change: SQLite DDL is not rolled back if this fails
+    has_meta = check_meta_unused()
+    add_missing_columns('naan', [sa.Column('created', sa.DateTime), sa.Column('updated', sa.DateTime)])
+
+    if op.get_bind().dialect.name != 'sqlite':
+        upgrade_server(has_meta)
+        return
+
+    # copy_table leaves ark.meta behind
+    copy_table('shoulder', SHOULDER_TABLE, SHOULDER_COLUMNS)
+    # drops idx_assigned_name (never queried) and ix_ark_updated with the table
+    copy_table('ark', ARK_TABLE, ARK_COLUMNS, order_by='identifier')
+
+    op.execute('CREATE INDEX ix_ark_shoulder ON ark (shoulder, identifier, naan)')
+    op.execute('CREATE INDEX ix_ark_updated ON ark (updated)')
+    op.execute('ANALYZE')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        downgrade_server()
+        return
+
+    copy_table('shoulder', LEGACY_SHOULDER_TABLE, SHOULDER_COLUMNS[:-2])
+    copy_table('ark', LEGACY_ARK_TABLE, ARK_COLUMNS, order_by='identifier')
+
+    op.execute('CREATE INDEX idx_assigned_name ON ark (assigned_name)')
+    op.execute('CREATE INDEX ix_ark_updated ON ark (updated)')
+
+    with op.batch_alter_table('naan') as batch_op:
+        batch_op.drop_column('updated')
+        batch_op.drop_column('created')
@@ -0,0 +1,89 @@
+"""full-text search index over ark who/what/when
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+HAS_METADATA = '''coalesce({0}.who, '') || coalesce({0}.what, '') || coalesce({0}."when", '') <> \'\''''
+
+# same as schema.sql; see app/search.py
+SQLITE_STATEMENTS = [
+    '''
+CREATE TABLE ark_search_key (
+  id INTEGER PRIMARY KEY,
+  identifier TEXT NOT NULL UNIQUE
+)
+''',
+    '''
+CREATE VIRTUAL TABLE ark_search USING fts5(
+  who, what, "when", content='', tokenize='unicode61 remove_diacritics 2'
+)
+''',
+    f'''
+CREATE TRIGGER ark_search_insert AFTER INSERT ON ark
+WHEN {HAS_METADATA.format('new')}
+BEGIN
+  INSERT INTO ark_search_key (identifier) VALUES (new.identifier);
+  INSERT INTO ark_search (rowid, who, what, "when")
+    SELECT id, new.who, new.what, new."when" FROM ark_search_key WHERE identifier = new.identifier;
+END
+''',
+    '''
+CREATE TRIGGER ark_search_delete AFTER DELETE ON ark BEGIN
+  INSERT INTO ark_search (ark_search, rowid, who, what, "when")
+    SELECT 'delete', id, old.who, old.what, old."when" FROM ark_search_key WHERE identifier = old.identifier;
+  DELETE FROM ark_search_key WHERE identifier = old.identifier;
+END
+''',
+    f'''
+CREATE TRIGGER ark_search_update AFTER UPDATE OF who, what, "when" ON ark BEGIN
+  INSERT INTO ark_search (ark_search, rowid, who, what, "when")
+    SELECT 'delete', id, old.who, old.what, old."when" FROM ark_search_key WHERE identifier = old.identifier;
+  DELETE FROM ark_search_key
+    WHERE identifier = new.identifier AND NOT ({HAS_METADATA.format('new')});
+  INSERT INTO ark_search_key (identifier)
+    SELECT new.identifier WHERE {HAS_METADATA.format('new')}
+    AND NOT EXISTS (SELECT 1 FROM ark_search_key WHERE identifier = new.identifier);
+  INSERT INTO ark_search (rowid, who, what, "when")
+    SELECT id, new.who, new.what, new."when" FROM ark_search_key WHERE identifier = new.identifier;
+END
+''',
+]
+
+SEARCH_DOCUMENT = '''to_tsvector('simple', coalesce(who, '') || ' ' || coalesce(what, '') || ' ' || coalesce("when", ''))'''
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        op.execute(f'CREATE INDEX ix_ark_search ON ark USING gin ({SEARCH_DOCUMENT})')
+        return
+
+    for statement in SQLITE_STATEMENTS:
+        op.execute(statement)
+    op.execute(f'INSERT INTO ark_search_key (identifier) SELECT identifier FROM ark WHERE {HAS_METADATA.format("ark")} ORDER BY identifier')
+    op.execute(
+        'INSERT INTO ark_search (rowid, who, what, "when") '
+        'SELECT k.id, a.who, a.what, a."when" FROM ark_search_key k JOIN ark a ON a.identifier = k.identifier'
+    )
+    op.execute("INSERT INTO ark_search (ark_search) VALUES ('optimize')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        op.drop_index('ix_ark_search', 'ark')
+        return
+
+    for trigger in ('ark_search_insert', 'ark_search_delete', 'ark_search_update'):
+        op.execute(f'DROP TRIGGER {trigger}')
+    op.execute('DROP TABLE ark_search')
+    op.execute('DROP TABLE ark_search_key')
@@ -0,0 +1,38 @@
+"""minter_counter table for counter-backed templates
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the minter used to create it on first use, so it may exist already
+    if 'minter_counter' in sa.inspect(op.get_bind()).get_table_names():
+        if op.get_bind().dialect.name != 'sqlite':
+            # created as int4; permuted random templates count past 2**31
+            op.alter_column('minter_counter', 'value', type_=sa.BigInteger)
+        return
+
+    op.create_table(
+        'minter_counter',
+        sa.Column('naan', sa.Integer, nullable=False),
+        sa.Column('shoulder', sa.Text, nullable=False),
+        sa.Column('template', sa.Text, nullable=False),
+        sa.Column('value', sa.BigInteger, nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('naan', 'shoulder', 'template'),
+    )
+
+
+def downgrade():
+    op.drop_table('minter_counter')
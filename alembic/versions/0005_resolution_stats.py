@@ -0,0 +1,46 @@
+"""resolution_stats and shoulder_resolution_stats tables
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    # the stats flush used to create it on first use
+    if 'resolution_stats' not in tables:
+        op.create_table(
+            'resolution_stats',
+            sa.Column('day', sa.Text, nullable=False),
+            sa.Column('identifier', sa.Text, nullable=False),
+            sa.Column('naan', sa.Integer),
+            sa.Column('shoulder', sa.Text),
+            sa.Column('hits', sa.Integer, nullable=False, server_default='0'),
+            sa.PrimaryKeyConstraint('day', 'identifier'),
+        )
+
+    # shoulder fallbacks are counted per shoulder, not per requested name
+    op.create_table(
+        'shoulder_resolution_stats',
+        sa.Column('day', sa.Text, nullable=False),
+        sa.Column('naan', sa.Integer, nullable=False),
+        sa.Column('shoulder', sa.Text, nullable=False),
+        sa.Column('hits', sa.Integer, nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('day', 'naan', 'shoulder'),
+    )
+
+
+def downgrade():
+    op.drop_table('shoulder_resolution_stats')
+    op.drop_table('resolution_stats')
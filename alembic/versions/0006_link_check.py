@@ -0,0 +1,37 @@
+"""link_check table for flask ark-linkcheck
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # ark-linkcheck used to create it on its first run
+    if 'link_check' in sa.inspect(op.get_bind()).get_table_names():
+        return
+
+    op.create_table(
+        'link_check',
+        sa.Column('identifier', sa.Text, primary_key=True),
+        sa.Column('url', sa.Text),
+        sa.Column('status', sa.Integer),
+        sa.Column('error', sa.Text),
+        sa.Column('final_url', sa.Text),
+        sa.Column('latency_ms', sa.Float),
+        sa.Column('checked', sa.DateTime),
+    )
+
+
+def downgrade():
+    op.drop_table('link_check')
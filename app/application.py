@@ -1,15 +1,17 @@
 import os
 
-import secrets
 import functools
 
+import json
+
 from flask import (
     g,
     Flask,
-    redirect,
+    Response,
     abort,
     request,
     jsonify,
+    stream_with_context,
 )
 
 # from app.database import session
@@ -17,7 +19,33 @@ from flask import (
 #     Ark,
 #     Naan,
 # )
-import sqlite3
+
+from app.db import get_db, get_pool
+from app.cache import MISSING, get_resolution_cache
+from app.shoulders import find_shoulder, match_shoulder
+from app.noid import (
+    NamespaceExhausted,
+    compile_template,
+    generate_noid,
+)
+from app.metrics import (
+    MINT_COLLISIONS,
+    MINT_RETRIES,
+    observe_query,
+    set_outcome,
+)
+from app.minter import (
+    get_counter_blocks,
+    get_group_writer,
+    permutation_key,
+    permute,
+)
+from app.redirects import redirect_response
+from app.resolver_index import get_resolver_index
+from app.bloom import get_ark_filter
+from app.resolution_stats import StatsUnavailable, daily_totals, get_hit_counter, top_arks
+from app.search import MAX_LIMIT as SEARCH_MAX_LIMIT, search_arks
+from app.tracing import span
 
 def create_app():
     app = Flask(__name__)
@@ -35,6 +63,46 @@ def create_app():
 
 flask_app = create_app()
 
+# Database connection pool, released on app context teardown
+from app import db
+db.init_app(flask_app)
+
+# In-process resolution cache
+from app import cache
+cache.init_app(flask_app)
+
+# In-memory shoulder prefix index
+from app import shoulders
+shoulders.init_app(flask_app)
+
+# Memory-mapped resolver index, if RESOLVER_INDEX is set
+from app import resolver_index
+resolver_index.init_app(flask_app)
+
+# Per-NAAN Bloom filters of existing identifiers, if BLOOM_FILTER is set
+from app import bloom
+bloom.init_app(flask_app)
+
+# Per-ARK resolution counts, flushed in the background, if RESOLUTION_STATS is set
+from app import resolution_stats
+resolution_stats.init_app(flask_app)
+
+# Per-worker counter blocks for sequential templates
+from app import minter
+minter.init_app(flask_app)
+
+# /health, /health/live and /health/ready
+from app import health
+health.init_app(flask_app)
+
+# Sampled stage timings and the slow-request log (TRACING)
+from app import tracing
+tracing.init_app(flask_app)
+
+# Prometheus metrics and /metrics endpoint
+from app import metrics
+metrics.init_app(flask_app)
+
 # Register CLI commands
 from app import commands
 commands.init_app(flask_app)
@@ -44,20 +112,6 @@ def index():
     return 'pid'
 
 
-@flask_app.route('/health')
-def health():
-    """Health check endpoint for load balancers and monitoring."""
-    try:
-        # Check database connection
-        con = sqlite3.connect('ark.db')
-        cur = con.cursor()
-        cur.execute('SELECT 1')
-        con.close()
-        return jsonify({'status': 'healthy'}), 200
-    except Exception as e:
-        return jsonify({'status': 'unhealthy', 'error': str(e)}), 503
-
-
 def require_api_key(f):
     @functools.wraps(f)
     def decorated(*args, **kwargs):
@@ -68,83 +122,87 @@ def require_api_key(f):
     return decorated
 
 
-# NOID character sets
-DIGIT_CHARS = '0123456789'
-EXTENDED_CHARS = '0123456789bcdfghjkmnpqrstvwxz'  # 29 chars (radix)
-
-
-def noid_check_digit(s):
-    """Calculate NOID check digit using NCDA algorithm."""
-    total = 0
-    for i, c in enumerate(s, start=1):
-        if c in EXTENDED_CHARS:
-            ordinal = EXTENDED_CHARS.index(c)
-        else:
-            ordinal = 0
-        total += i * ordinal
-    return EXTENDED_CHARS[total % len(EXTENDED_CHARS)]
+def uses_counter(template):
+    """Whether mints for `template` come from minter_counter.
 
+    Always for sequential templates; for random ones when
+    MINT_RANDOM_MODE is 'permute'.
+    """
+    return compile_template(template).sequential or flask_app.config['MINT_RANDOM_MODE'] == 'permute'
 
-def parse_noid_template(template):
-    """Parse NOID template into prefix and mask.
 
-    Template format: prefix.mask
-    Mask starts with generator type (r=random, s=sequential, z=unlimited)
-    followed by: d (digit), e (extended digit), k (check digit at end)
+def next_sequences(con, naan, shoulder, template, count=1):
+    """Take `count` counter values for a counter-backed template.
 
-    Example: .reeeeee -> prefix='', generator='r', mask='eeeeee'
+    Random templates map the counter through a keyed permutation of the
+    template namespace, so the values look random but never repeat.
     """
-    if '.' in template:
-        prefix, mask = template.split('.', 1)
-    else:
-        prefix, mask = '', template
+    compiled = compile_template(template)
+    capacity = None if compiled.generator == 'z' else compiled.capacity
+    values = get_counter_blocks().take(con, naan, shoulder, template, count, capacity)
 
-    if not mask:
-        raise ValueError('Template mask is required')
+    if not compiled.sequential:
+        key = permutation_key(flask_app.config['MINT_PERMUTATION_KEY'], naan, shoulder, template)
+        values = [permute(value, compiled.capacity, key) for value in values]
+    return values
 
-    generator = mask[0]
-    if generator not in 'rsz':
-        raise ValueError(f'Invalid generator type: {generator}')
 
-    pattern = mask[1:]
-    has_check = pattern.endswith('k')
-    if has_check:
-        pattern = pattern[:-1]
+# created/updated are UTC, set by the database so every writer agrees on the format
+ARK_COLUMNS = ('identifier', 'naan', 'assigned_name', 'shoulder', 'url', 'who', 'what', 'when', 'created', 'updated')
 
-    for c in pattern:
-        if c not in 'de':
-            raise ValueError(f'Invalid mask character: {c}')
 
-    return {
-        'prefix': prefix,
-        'generator': generator,
-        'pattern': pattern,
-        'has_check': has_check,
-    }
+def ark_insert_sql(on_conflict=None):
+    """INSERT for the first 8 ARK_COLUMNS; created/updated are set to now.
+
+    'replace' keeps `created`, and leaves rows whose values are all the
+    same untouched (`updated` included).
+    """
+    pool = get_pool()
+    values = ['?'] * 8 + [pool.NOW, pool.NOW]
+    return pool.insert_sql(
+        'ark', ARK_COLUMNS, values, on_conflict=on_conflict, key=('identifier',),
+        keep=('created',), compare=ARK_COLUMNS[1:8]
+    )
 
 
-def generate_noid(template, naan='', shoulder=''):
-    """Generate a NOID identifier based on template.
+def check_mint_target(data):
+    """Validate naan, shoulder and template of a mint request.
 
-    The check digit (if template has 'k') is calculated on full ARK: naan/shoulder+random.
-    Returns only the random part (without shoulder).
+    Returns ((naan, shoulder, template), None) on success or
+    (None, error_response).
     """
-    parsed = parse_noid_template(template)
+    naan = data.get('naan')
+    shoulder = data.get('shoulder')
+
+    try:
+        naan = int(naan)
+    except (TypeError, ValueError):
+        return None, (jsonify({'error': 'naan must be an integer'}), 400)
+    if not isinstance(shoulder, str):
+        return None, (jsonify({'error': 'shoulder must be a string'}), 400)
+
+    # verify naan exists
+    res = get_db().execute('SELECT * FROM naan WHERE naan = ?', (naan,))
+    if not res.fetchone():
+        return None, (jsonify({'error': f'NAAN {naan} not found'}), 404)
 
-    result = parsed['prefix']
+    # verify shoulder exists and get template
+    shoulder_row = find_shoulder(naan, shoulder)
+    if not shoulder_row:
+        return None, (jsonify({'error': f'Shoulder {shoulder} not found for NAAN {naan}'}), 404)
 
-    for c in parsed['pattern']:
-        if c == 'd':
-            result += secrets.choice(DIGIT_CHARS)
-        elif c == 'e':
-            result += secrets.choice(EXTENDED_CHARS)
+    # priority: request template > shoulder template > default
+    shoulder_template = shoulder_row['template'] or '.reedede'
+    template = data.get('template', shoulder_template)
+    if not isinstance(template, str):
+        return None, (jsonify({'error': 'template must be a string'}), 400)
 
-    if parsed['has_check']:
-        # Check digit calculated on full ARK including naan/shoulder
-        full_ark = f"{naan}/{shoulder}{result}"
-        result += noid_check_digit(full_ark)
+    try:
+        compile_template(template)
+    except ValueError as e:
+        return None, (jsonify({'error': f'Invalid template: {e}'}), 400)
 
-    return result
+    return (naan, shoulder, template), None
 
 
 @flask_app.route('/api/mint', methods=['POST'])
@@ -154,76 +212,307 @@ def mint():
     if not data:
         return jsonify({'error': 'JSON body required'}), 400
 
-    naan = data.get('naan')
-    shoulder = data.get('shoulder')
-    url = data.get('url')
-
-    if not all([naan, shoulder, url]):
+    if not all([data.get('naan'), data.get('shoulder'), data.get('url')]):
         return jsonify({'error': 'naan, shoulder, and url are required'}), 400
 
-    try:
-        naan = int(naan)
-    except ValueError:
-        return jsonify({'error': 'naan must be an integer'}), 400
+    with span('check_mint_target'):
+        target, error = check_mint_target(data)
+    if error:
+        return error
+    naan, shoulder, template = target
 
+    url = data['url']
     who = data.get('who', '')
     what = data.get('what', '')
     when = data.get('when', '')
 
-    con = sqlite3.connect('ark.db')
+    con = get_db()
     cur = con.cursor()
+    counter = uses_counter(template)
+    IntegrityError = get_pool().IntegrityError
+    # with group commit the insert is committed by the worker's writer
+    # thread together with concurrent mints, conflicts come back as False
+    writer = get_group_writer()
+    insert_sql = ark_insert_sql('ignore' if writer else None)
+    ark_filter = get_ark_filter()
 
-    # verify naan exists
-    res = cur.execute('SELECT * FROM naan WHERE naan = ?', (naan,))
-    if not res.fetchone():
-        con.close()
-        return jsonify({'error': f'NAAN {naan} not found'}), 404
+    # generate unique assigned_name
+    try:
+        for attempt in range(10):
+            if attempt:
+                MINT_RETRIES.labels('mint').inc()
+
+            with span('generate'):
+                if counter:
+                    sequence = next_sequences(con, naan, shoulder, template)[0]
+                    random_part = generate_noid(template, naan, shoulder, sequence)
+                else:
+                    random_part = generate_noid(template, naan, shoulder)
+            assigned_name = f'{shoulder}{random_part}'
+            identifier = f'{naan}/{assigned_name}'
+
+            # counter values are unique by construction, no lookup needed;
+            # neither for names the Bloom filter has never seen (the primary
+            # key still catches a concurrent mint)
+            if not counter and (not ark_filter or ark_filter.might_contain(con, naan, identifier)):
+                sql = 'SELECT * FROM ark WHERE identifier = ?'
+                with observe_query('mint_collision_check', sql, (identifier,)):
+                    res = cur.execute(sql, (identifier,))
+                    exists = res.fetchone()
+                if exists:
+                    MINT_COLLISIONS.labels('mint').inc()
+                    continue
+
+            # insert new ARK
+            params = (identifier, naan, assigned_name, shoulder, url, who, what, when)
+            if writer:
+                with span('group_commit'):
+                    inserted = writer.insert(insert_sql, params)
+                if not inserted:
+                    MINT_COLLISIONS.labels('mint').inc()
+                    continue
+                break
+
+            try:
+                with observe_query('mint_insert', insert_sql, params):
+                    cur.execute(insert_sql, params)
+            except IntegrityError:
+                # taken concurrently, or by a row minted outside the counter;
+                # PostgreSQL needs the failed transaction rolled back
+                con.rollback()
+                MINT_COLLISIONS.labels('mint').inc()
+                continue
+            break
+        else:
+            return jsonify({'error': 'Failed to generate unique identifier'}), 500
+    except NamespaceExhausted as e:
+        return jsonify({'error': str(e)}), 409
+    except TimeoutError as e:
+        # nothing was written, the client may retry
+        return jsonify({'error': str(e)}), 503
+
+    if not writer:
+        with observe_query('mint_commit'):
+            con.commit()
+
+    # drop any cached miss / shoulder fallback for the new identifier
+    get_resolution_cache().invalidate(identifier)
+    if ark_filter:
+        ark_filter.add(naan, identifier)
 
-    # verify shoulder exists and get template
-    res = cur.execute('SELECT shoulder, naan, name, description, redirect_prefix, template FROM shoulder WHERE shoulder = ? AND naan = ?', (shoulder, naan))
-    shoulder_row = res.fetchone()
-    if not shoulder_row:
-        con.close()
-        return jsonify({'error': f'Shoulder {shoulder} not found for NAAN {naan}'}), 404
+    return jsonify({
+        'ark': f'ark:/{identifier}',
+        'identifier': identifier,
+        'url': url,
+    }), 201
 
-    # priority: request template > shoulder template > default
-    shoulder_template = shoulder_row[5] if shoulder_row[5] else '.reedede'
-    template = data.get('template', shoulder_template)
 
-    try:
-        parsed = parse_noid_template(template)
-    except ValueError as e:
-        con.close()
-        return jsonify({'error': f'Invalid template: {e}'}), 400
+def find_existing_identifiers(con, identifiers, chunk_size=500):
+    """Return the subset of `identifiers` already in the ark table."""
+    identifiers = list(identifiers)
+    existing = set()
+    for i in range(0, len(identifiers), chunk_size):
+        chunk = identifiers[i:i + chunk_size]
+        placeholders = ', '.join('?' * len(chunk))
+        res = con.execute(f'SELECT identifier FROM ark WHERE identifier IN ({placeholders})', chunk)
+        existing.update(row[0] for row in res)
+    return existing
 
-    # generate unique assigned_name
-    for _ in range(10):
-        random_part = generate_noid(template, naan, shoulder)
-        assigned_name = f'{shoulder}{random_part}'
-        identifier = f'{naan}/{assigned_name}'
 
-        res = cur.execute('SELECT * FROM ark WHERE identifier = ?', (identifier,))
-        if not res.fetchone():
+def generate_unique_identifiers(con, count, template, naan, shoulder, rounds=10):
+    """Generate `count` identifiers unique within the batch and the ark table.
+
+    Counter-backed templates take a block of counter values and need no
+    check. Otherwise collisions are checked with set lookups and chunked
+    IN queries; only the colliding positions are regenerated in the next
+    round.
+    """
+    compiled = compile_template(template)
+    if uses_counter(template):
+        return [
+            f'{naan}/{shoulder}{compiled.generate(naan, shoulder, sequence)}'
+            for sequence in next_sequences(con, naan, shoulder, template, count)
+        ]
+
+    identifiers = [None] * count
+    pending = list(range(count))
+    taken = set()
+
+    for _ in range(rounds):
+        candidates = {}
+        names = compiled.generate_many(len(pending), naan, shoulder)
+        for i, name in zip(pending, names):
+            identifier = f'{naan}/{shoulder}{name}'
+            if identifier not in taken and identifier not in candidates:
+                candidates[identifier] = i
+
+        ark_filter = get_ark_filter()
+        if ark_filter:
+            maybe = [identifier for identifier in candidates if ark_filter.might_contain(con, naan, identifier)]
+        else:
+            maybe = candidates
+        with observe_query('mint_batch_collision_check'):
+            existing = find_existing_identifiers(con, maybe)
+        collisions = len(pending) - len(candidates) + len(existing)
+        if collisions:
+            MINT_COLLISIONS.labels('mint_batch').inc(collisions)
+
+        for identifier, i in candidates.items():
+            if identifier not in existing:
+                identifiers[i] = identifier
+                taken.add(identifier)
+
+        pending = [i for i in pending if identifiers[i] is None]
+        if not pending:
+            return identifiers
+        MINT_RETRIES.labels('mint_batch').inc(len(pending))
+
+    raise ValueError('Failed to generate unique identifiers')
+
+
+@flask_app.route('/api/mint/batch', methods=['POST'])
+@require_api_key
+def mint_batch():
+    """Mint many ARKs under one naan/shoulder in a single transaction."""
+    data = request.get_json()
+    if not data:
+        return jsonify({'error': 'JSON body required'}), 400
+
+    items = data.get('items')
+    if not all([data.get('naan'), data.get('shoulder'), items]) or not isinstance(items, list):
+        return jsonify({'error': 'naan, shoulder, and items are required'}), 400
+
+    max_items = flask_app.config['MINT_BATCH_MAX']
+    if len(items) > max_items:
+        return jsonify({'error': f'At most {max_items} items per batch'}), 400
+
+    for i, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get('url'):
+            return jsonify({'error': f'items[{i}]: url is required'}), 400
+
+    with span('check_mint_target'):
+        target, error = check_mint_target(data)
+    if error:
+        return error
+    naan, shoulder, template = target
+
+    con = get_db()
+    insert_sql = ark_insert_sql()
+    for _ in range(3):
+        try:
+            with span('generate_unique_identifiers'):
+                identifiers = generate_unique_identifiers(con, len(items), template, naan, shoulder)
+        except NamespaceExhausted as e:
+            return jsonify({'error': str(e)}), 409
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 500
+
+        rows = [
+            (identifier, naan, identifier.split('/', 1)[1], shoulder,
+             item['url'], item.get('who', ''), item.get('what', ''), item.get('when', ''))
+            for identifier, item in zip(identifiers, items)
+        ]
+        try:
+            with observe_query('mint_batch_insert'), con:
+                con.executemany(insert_sql, rows)
             break
+        except get_pool().IntegrityError:
+            # another worker minted one of our identifiers in the meantime
+            continue
     else:
-        con.close()
-        return jsonify({'error': 'Failed to generate unique identifier'}), 500
+        return jsonify({'error': 'Failed to generate unique identifiers'}), 500
 
-    # insert new ARK
-    cur.execute(
-        'INSERT INTO ark (identifier, naan, assigned_name, shoulder, url, who, what, "when") VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
-        (identifier, naan, assigned_name, shoulder, url, who, what, when)
-    )
-    con.commit()
-    con.close()
+    cache = get_resolution_cache()
+    ark_filter = get_ark_filter()
+    for identifier in identifiers:
+        cache.invalidate(identifier)
+        if ark_filter:
+            ark_filter.add(naan, identifier)
 
     return jsonify({
-        'ark': f'ark:/{identifier}',
-        'identifier': identifier,
-        'url': url,
+        'arks': [
+            {
+                'ark': f'ark:/{identifier}',
+                'identifier': identifier,
+                'url': item['url'],
+            }
+            for identifier, item in zip(identifiers, items)
+        ],
     }), 201
 
 
+def stats_filters():
+    """since/until/naan/shoulder query arguments of the stats endpoints."""
+    return {
+        'since': request.args.get('since'),
+        'until': request.args.get('until'),
+        'naan': request.args.get('naan', type=int),
+        'shoulder': request.args.get('shoulder'),
+    }
+
+
+@flask_app.route('/api/stats/top')
+@require_api_key
+def stats_top():
+    """Most resolved identifiers, from resolution_stats."""
+    limit = min(request.args.get('limit', 100, type=int), 10000)
+    try:
+        rows = top_arks(get_db(), limit, **stats_filters())
+    except StatsUnavailable as e:
+        return jsonify({'error': str(e)}), 503
+    return jsonify({
+        'arks': [{'identifier': identifier, 'shoulder': shoulder, 'hits': hits} for identifier, shoulder, hits in rows],
+    })
+
+
+@flask_app.route('/api/stats/daily')
+@require_api_key
+def stats_daily():
+    """Resolutions, distinct ARKs and shoulder fallbacks per UTC day."""
+    try:
+        rows = daily_totals(get_db(), **stats_filters())
+    except StatsUnavailable as e:
+        return jsonify({'error': str(e)}), 503
+    return jsonify({
+        'days': [
+            {'day': day, 'hits': hits, 'identifiers': identifiers, 'shoulder_hits': shoulder_hits}
+            for day, hits, identifiers, shoulder_hits in rows
+        ],
+    })
+
+
+@flask_app.route('/api/search')
+def search():
+    """ARKs whose who/what/when contain all words of `q`, one page at a time."""
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', 100, type=int)
+    if not 1 <= limit <= SEARCH_MAX_LIMIT:
+        return jsonify({'error': f'limit must be between 1 and {SEARCH_MAX_LIMIT}'}), 400
+
+    con = get_db()
+    pool = get_pool()
+    try:
+        rows, next_cursor = search_arks(
+            con, query,
+            naan=request.args.get('naan', type=int),
+            shoulder=request.args.get('shoulder'),
+            cursor=request.args.get('cursor'),
+            limit=limit,
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except pool.Error:
+        if con.in_transaction:
+            con.rollback()
+        flask_app.logger.exception('search failed')
+        return jsonify({'error': 'Search is not available (run `alembic upgrade head`)'}), 503
+
+    return jsonify({
+        'results': [dict(row, ark=f"ark:/{row['identifier']}") for row in rows],
+        'next_cursor': next_cursor,
+    })
+
+
 def parse_ark(identifier):
     parts = identifier.split('/')
     if len(parts) < 2:
@@ -240,34 +529,164 @@ def parse_ark(identifier):
     return naan, assigned_name, suffix
 
 
+def lookup_target(naan, assigned_name):
+    """Find where `naan/assigned_name` redirects to.
+
+    Returns (target, settled): target is (url, append_suffix, shoulder,
+    updated) or None. ARK rows redirect to their url plus the request
+    suffix, shoulder fallbacks to redirect_prefix plus the rest of the
+    assigned name. `shoulder` selects the redirect policy, `updated` (of
+    the ark or shoulder row) the caching validators. `settled` is False
+    when only the Bloom filter ruled the ARK out: another worker may have
+    just minted it.
+    """
+    con = get_db()
+    identifier = f'{naan}/{assigned_name}'
+    if index := get_resolver_index():
+        with span('resolver_index'):
+            target = index.get(con, identifier)
+        if target:
+            return target, True
+
+    ark_filter = get_ark_filter()
+    if ark_filter:
+        with span('bloom_filter'):
+            maybe = ark_filter.might_contain(con, naan, identifier)
+        if not maybe:
+            return shoulder_target(naan, assigned_name), False
+
+    cur = con.cursor()
+    sql = 'SELECT url, shoulder, updated FROM ark WHERE identifier = ?'
+    with observe_query('resolve_ark', sql, (identifier,)):
+        res = cur.execute(sql, (identifier,))
+        row = res.fetchone()
+    if row:
+        url, shoulder, updated = row
+        if url:
+            return (url, True, shoulder, updated), True
+
+    # not match object, try shoulder (longest prefix), redirect
+    return shoulder_target(naan, assigned_name), True
+
+
+def shoulder_target(naan, assigned_name):
+    """Shoulder fallback of lookup_target, from the in-memory shoulder index."""
+    with span('shoulder_fallback'):
+        shoulder_row = match_shoulder(naan, assigned_name)
+    if shoulder_row:
+        if url := shoulder_row['redirect_prefix']:
+            target_name = assigned_name[len(shoulder_row['shoulder']):]
+            return (f'{url}{target_name}', False, shoulder_row['shoulder'], shoulder_row['updated'])
+
+    return None
+
+
+RESOLVE_COLUMNS = ('identifier', 'url', 'shoulder', 'who', 'what', 'when', 'created', 'updated')
+
+
+def resolve_chunk(con, identifiers):
+    """Bulk resolution results for a list of identifier strings, in order.
+
+    Identifiers may start with `ark:/` and carry a suffix. ARK rows come
+    from one IN query, the rest fall back to the shoulder index; the
+    resolution cache is bypassed so bulk checks don't evict hot entries.
+    """
+    parsed = []
+    for identifier in identifiers:
+        try:
+            if not isinstance(identifier, str):
+                raise ValueError('Identifier must be a string')
+            name = identifier.removeprefix('ark:').lstrip('/')
+            parsed.append(parse_ark(name))
+        except ValueError as e:
+            parsed.append(e)
+
+    keys = list({f'{p[0]}/{p[1]}' for p in parsed if not isinstance(p, ValueError)})
+    rows = {}
+    if keys:
+        columns = ', '.join(f'"{c}"' for c in RESOLVE_COLUMNS)
+        placeholders = ', '.join('?' * len(keys))
+        with observe_query('resolve_batch'):
+            res = con.execute(f'SELECT {columns} FROM ark WHERE identifier IN ({placeholders})', keys)
+            rows = {row[0]: dict(zip(RESOLVE_COLUMNS, row)) for row in res}
+
+    results = []
+    for identifier, p in zip(identifiers, parsed):
+        if isinstance(p, ValueError):
+            results.append({'input': identifier, 'match': 'invalid', 'error': str(p)})
+            continue
+
+        naan, assigned_name, suffix = p
+        key = f'{naan}/{assigned_name}'
+        result = {'input': identifier, 'ark': f'ark:/{key}', 'identifier': key}
+        row = rows.get(key)
+        if row and row['url']:
+            result.update(match='ark', url=f"{row['url']}{suffix}")
+            result.update((column, row[column]) for column in RESOLVE_COLUMNS[2:])
+        elif target := shoulder_target(naan, assigned_name):
+            url, _, shoulder, _ = target
+            result.update(match='shoulder', url=url, shoulder=shoulder)
+        else:
+            result.update(match='not_found', url=None)
+        results.append(result)
+    return results
+
+
+@flask_app.route('/api/resolve', methods=['POST'])
+def resolve_batch():
+    """Resolve many ARKs in one request, results streamed in input order."""
+    data = request.get_json(silent=True)
+    identifiers = data.get('identifiers') if isinstance(data, dict) else None
+    if not isinstance(identifiers, list):
+        return jsonify({'error': 'identifiers (a list) is required'}), 400
+
+    max_items = flask_app.config['RESOLVE_BATCH_MAX']
+    if len(identifiers) > max_items:
+        return jsonify({'error': f'At most {max_items} identifiers per request'}), 400
+
+    def generate(chunk_size=500):
+        con = get_db()
+        yield '{"results": ['
+        for i in range(0, len(identifiers), chunk_size):
+            results = resolve_chunk(con, identifiers[i:i + chunk_size])
+            yield (',' if i else '') + ','.join(json.dumps(result) for result in results)
+        yield ']}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+
 @flask_app.route('/ark:/<path:identifier>')
 def resolver(identifier):
     suffix = ''
     try:
-        naan, assigned_name, suffix = parse_ark(identifier)
+        with span('parse_ark'):
+            naan, assigned_name, suffix = parse_ark(identifier)
     except ValueError as e:
+        set_outcome('bad_request')
         return abort(400)
 
     #print(identifier, naan, assigned_name, suffix, flush=True)
 
-    con = sqlite3.connect('ark.db')
-    cur = con.cursor()
-    res = cur.execute(f"SELECT * FROM ark WHERE identifier = '{naan}/{assigned_name}'")
-    if row := res.fetchone():
-        if url := row[4]:
-            return redirect(f'{url}{suffix}')
-
-    # not match object, try shoulder, redirect
-    # shoulder can be 2 or 3 char
-    shoulder2 = assigned_name[:2]
-    shoulder3 = assigned_name[:3]
-    res = cur.execute(f"SELECT * FROM shoulder WHERE naan = '{naan}' AND (shoulder = '{shoulder3}' OR shoulder = '{shoulder2}')")
-    if row := res.fetchone():
-        if url := row[4]:
-            target_name = assigned_name[len(row[0]):]
-            return redirect(f'{url}{target_name}')
-
-    con.close()
+    # negative results are cached too, so repeated misses stay off SQLite
+    cache = get_resolution_cache()
+    key = f'{naan}/{assigned_name}'
+    with span('cache'):
+        target = cache.get(key)
+    if target is MISSING:
+        target, settled = lookup_target(naan, assigned_name)
+        # only ARK rows are kept for the full TTL: a miss or shoulder
+        # fallback (or a Bloom filter miss) may be another worker's
+        # fresh mint
+        ark_row = settled and target is not None and target[1]
+        cache.set(key, target, ttl=None if ark_row else cache.negative_ttl)
+
+    if target:
+        url, append_suffix, shoulder, updated = target
+        set_outcome('ark' if append_suffix else 'shoulder')
+        if hit_counter := get_hit_counter():
+            hit_counter.hit(int(naan), shoulder, key if append_suffix else None)
+        with span('redirect_response'):
+            return redirect_response(naan, shoulder, f'{url}{suffix}' if append_suffix else url, updated)
 
     #basic_object_name = f'ark:/{naan}/{assigned_name}'
     #if ark_obj := session.get(Ark, f'{naan}/{assigned_name}'):
@@ -280,6 +699,7 @@ def resolver(identifier):
     #    url = f'https://n2t.net/ark:/{naan}/{assigned_name}'
     #    return redirect(url)
 
+    set_outcome('not_found')
     return abort(404)
 
 
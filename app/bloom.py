@@ -0,0 +1,234 @@
+"""Per-NAAN Bloom filters over existing identifiers.
+
+A filter answers "definitely not in the ark table" without a query, so the
+resolver skips the ark lookup for misses (crawlers, typos) and the minters
+skip the collision check for almost every random candidate. "Maybe" still
+goes to the database, and inserts still rely on the primary key, so a false
+positive costs one query and nothing else.
+
+Each worker loads the filters from BLOOM_FILTER_PATH, or builds them from
+the ark table on first use and saves them there for the next worker.
+Identifiers it mints are added right away; rows written by other workers
+or imports are added every BLOOM_FILTER_INTERVAL seconds from the
+`updated` column, re-reading the last BLOOM_FILTER_OVERLAP seconds for
+transactions that committed late. Until then another worker's fresh mint
+is answered with its shoulder redirect (or 404), and the resolver caches
+such answers only for RESOLVER_CACHE_NEGATIVE_TTL.
+"""
+import hashlib
+import json
+import math
+import os
+import struct
+import threading
+import time
+
+from flask import current_app
+
+from app.db import get_pool, next_change_watermark
+
+MAGIC = b'ARKBLOOM'
+# filters are sized for this many times the identifiers they start with
+GROWTH = 2
+MIN_CAPACITY = 100000
+
+
+class BloomFilter(object):
+    """Bit array with `hashes` probes per item.
+
+    The probe positions are the 32-bit words of one blake2b digest, so a
+    check costs a single hash call (at most MAX_HASHES probes).
+    """
+    MAX_HASHES = 16
+
+    def __init__(self, bits, hashes, capacity, items=0, data=None):
+        self.bits = bits
+        self.hashes = hashes
+        self.capacity = capacity
+        self.items = items
+        self.data = bytearray(data) if data is not None else bytearray((bits + 7) // 8)
+        self._words = struct.Struct(f'<{hashes}I')
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_capacity(cls, capacity, fp_rate, max_bytes):
+        """Filter holding `capacity` items at `fp_rate`, at most `max_bytes` large."""
+        bits = math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2)
+        bits = max(64, min(bits, max_bytes * 8))
+        hashes = min(cls.MAX_HASHES, max(1, round(bits / capacity * math.log(2))))
+        return cls(bits, hashes, capacity)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=4 * self.hashes).digest()
+        bits = self.bits
+        return [word % bits for word in self._words.unpack(digest)]
+
+    def add(self, item):
+        positions = self._positions(item)
+        data = self.data
+        with self._lock:
+            for p in positions:
+                data[p >> 3] |= 1 << (p & 7)
+            self.items += 1
+
+    def __contains__(self, item):
+        data = self.data
+        for p in self._positions(item):
+            if not data[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+    def estimated_fp_rate(self):
+        return (1 - math.exp(-self.hashes * self.items / self.bits)) ** self.hashes
+
+    def stats(self):
+        return {
+            'items': self.items,
+            'capacity': self.capacity,
+            'bytes': len(self.data),
+            'hashes': self.hashes,
+            'estimated_fp_rate': round(self.estimated_fp_rate(), 6),
+        }
+
+
+def save_filters(path, filters, watermark):
+    """Write `filters` ({naan: BloomFilter}) to `path`, renamed into place."""
+    header = json.dumps({
+        'watermark': watermark,
+        'filters': [
+            {'naan': naan, 'bits': f.bits, 'hashes': f.hashes, 'capacity': f.capacity, 'items': f.items}
+            for naan, f in filters.items()
+        ],
+    }).encode()
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as out:
+        out.write(MAGIC + struct.pack('<Q', len(header)) + header)
+        for f in filters.values():
+            out.write(f.data)
+    os.replace(tmp, path)
+
+
+def load_filters(path):
+    """({naan: BloomFilter}, watermark) from a file written by save_filters."""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{path} is not a Bloom filter file')
+        (length,) = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(length))
+        filters = {}
+        for entry in header['filters']:
+            data = f.read((entry['bits'] + 7) // 8)
+            filters[entry['naan']] = BloomFilter(entry['bits'], entry['hashes'], entry['capacity'], entry['items'], data)
+    return filters, header['watermark']
+
+
+class ArkFilter(object):
+    """A worker's per-NAAN filters, kept current from the ark table."""
+
+    def __init__(self, path='', fp_rate=0.01, max_bytes=64 << 20, interval=1.0, overlap=10.0):
+        self.path = path
+        self.fp_rate = fp_rate
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.overlap = overlap
+        self.filters = None
+        self.watermark = None
+        self.checks = 0
+        self.negatives = 0
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def _new_filter(self, count):
+        return BloomFilter.for_capacity(max(MIN_CAPACITY, count * GROWTH), self.fp_rate, self.max_bytes)
+
+    def build(self, con):
+        """Filters for every identifier in the ark table, and their watermark."""
+        pool = get_pool()
+        watermark = next_change_watermark(con, self.overlap)
+        counts = con.execute('SELECT naan, count(*) FROM ark WHERE naan IS NOT NULL GROUP BY naan').fetchall()
+        filters = {int(naan): self._new_filter(count) for naan, count in counts}
+        for naan, identifier in pool.iterate(con, 'SELECT naan, identifier FROM ark WHERE naan IS NOT NULL'):
+            filters[int(naan)].add(identifier)
+        return filters, watermark
+
+    def _load(self, con):
+        if self.path and os.path.exists(self.path):
+            self.filters, self.watermark = load_filters(self.path)
+            return
+        self.filters, self.watermark = self.build(con)
+        if self.path:
+            save_filters(self.path, self.filters, self.watermark)
+
+    def _catch_up(self, con):
+        """Add rows written since the watermark (other workers, imports)."""
+        watermark = next_change_watermark(con, self.overlap)
+        res = con.execute('SELECT naan, identifier FROM ark WHERE updated > ? AND naan IS NOT NULL', (self.watermark,))
+        for naan, identifier in res:
+            self.add(naan, identifier)
+        self.watermark = watermark
+
+    def _refresh(self, con):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.interval:
+            return
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.interval:
+                return
+            if self.filters is None:
+                self._load(con)
+            self._catch_up(con)
+            self._checked_at = now
+
+    def might_contain(self, con, naan, identifier):
+        """False if `identifier` was not in the ark table at the last catch-up.
+
+        Rows committed since (by other workers) are not seen yet, so a
+        False answer is only good for a short while.
+        """
+        self._refresh(con)
+        self.checks += 1
+        bloom = self.filters.get(int(naan))
+        if bloom is not None and identifier in bloom:
+            return True
+        self.negatives += 1
+        return False
+
+    def add(self, naan, identifier):
+        """Record a new identifier (after minting it)."""
+        if self.filters is None:
+            return
+        naan = int(naan)
+        bloom = self.filters.get(naan)
+        if bloom is None:
+            bloom = self.filters.setdefault(naan, self._new_filter(0))
+        if identifier not in bloom:
+            bloom.add(identifier)
+
+    def stats(self):
+        if self.filters is None:
+            return {'loaded': False}
+        return {
+            'loaded': True,
+            'fp_rate': self.fp_rate,
+            'watermark': self.watermark,
+            'checks': self.checks,
+            'negatives': self.negatives,
+            'naans': {str(naan): f.stats() for naan, f in self.filters.items()},
+        }
+
+
+def get_ark_filter():
+    """The worker's ArkFilter, or None when BLOOM_FILTER is off."""
+    return current_app.extensions['ark_filter']
+
+
+def init_app(app):
+    app.extensions['ark_filter'] = None
+    if app.config['BLOOM_FILTER']:
+        app.extensions['ark_filter'] = ArkFilter(
+            app.config['BLOOM_FILTER_PATH'],
+            fp_rate=app.config['BLOOM_FILTER_FP_RATE'],
+            max_bytes=int(app.config['BLOOM_FILTER_MAX_MB'] * (1 << 20)),
+            interval=app.config['BLOOM_FILTER_INTERVAL'],
+            overlap=app.config['BLOOM_FILTER_OVERLAP'],
+        )
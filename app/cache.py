@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+MISSING = object()
+
+
+class ResolutionCache(object):
+    """Bounded LRU cache with per-entry TTL for resolver lookups.
+
+    Keys are `naan/assigned_name`, values are whatever the resolver wants to
+    remember about the key. A value of `None` is a negative entry (nothing
+    to redirect to) and expires after `negative_ttl` instead of `ttl`.
+    `maxsize=0` disables the cache.
+    """
+
+    def __init__(self, maxsize=10000, ttl=300, negative_ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value, or `MISSING`."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+
+            expires, value = entry
+            if expires < now:
+                del self._data[key]
+                self.misses += 1
+                return MISSING
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Cache `value` for `ttl` seconds (default: ttl or negative_ttl)."""
+        if not self.maxsize:
+            return
+
+        if ttl is None:
+            ttl = self.negative_ttl if value is None else self.ttl
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+def get_resolution_cache(app=None):
+    app = app or current_app
+    return app.extensions['resolution_cache']
+
+
+def init_app(app):
+    app.extensions['resolution_cache'] = ResolutionCache(
+        maxsize=app.config['RESOLVER_CACHE_SIZE'],
+        ttl=app.config['RESOLVER_CACHE_TTL'],
+        negative_ttl=app.config['RESOLVER_CACHE_NEGATIVE_TTL'],
+    )
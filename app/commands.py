@@ -1,52 +1,138 @@
+import asyncio
+import collections
+import csv
+import filecmp
+import gzip
+import io
+import json
+import os
+import re
+import shlex
+import subprocess
+import sys
+import time
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+
 import click
-import sqlite3
 from flask import current_app
 from flask.cli import with_appcontext
 
-# NOID character sets
-DIGIT_CHARS = '0123456789'
-EXTENDED_CHARS = '0123456789bcdfghjkmnpqrstvwxz'  # 29 chars (radix)
+from app.bloom import ArkFilter, save_filters
+from app.db import get_db, get_pool, next_change_watermark
+from app.linkcheck import RESULT_COLUMNS, USER_AGENT, LinkChecker
+from app.resolution_stats import StatsUnavailable, daily_totals, top_arks
+from app.redirects import redirect_policy
+from app.resolver_index import INDEX_COLUMNS, build_resolver_index
+from app.search import rebuild_search_index
+from app.shoulders import get_shoulder_index
+from app.noid import (
+    compile_template,
+    generate_noid,
+    noid_check_digit,
+    validate_noid,
+)
 
+# templates of all shoulders, set once per noid-check worker process
+_check_templates = {}
 
-def noid_check_digit(s):
-    """Calculate NOID check digit using NCDA algorithm."""
-    total = 0
-    for i, c in enumerate(s, start=1):
-        if c in EXTENDED_CHARS:
-            total += i * EXTENDED_CHARS.index(c)
-    return EXTENDED_CHARS[total % 29]
 
+def _init_check_worker(templates):
+    global _check_templates
+    _check_templates = templates
 
-def validate_noid(assigned_name, template, naan='', shoulder=''):
-    """Validate a NOID against its template.
 
-    The check digit is calculated on the full ARK: naan/shoulder+random.
+def check_noid_chunk(rows, include_valid=False):
+    """Validate a chunk of (identifier, naan, shoulder) rows.
 
-    Returns (is_valid, expected_check, actual_check) for templates with check digit.
-    Returns (True, None, None) for templates without check digit.
+    Runs in noid-check worker processes. Returns
+    (counts, invalid, valid) where `invalid` is a list of
+    (identifier, expected, actual) and `valid` lists valid identifiers
+    when `include_valid` is set.
     """
-    # Parse template
-    if '.' in template:
-        _, mask = template.split('.', 1)
-    else:
-        mask = template
+    counts = {'total': 0, 'valid': 0, 'invalid': 0, 'no_check': 0, 'no_shoulder': 0}
+    invalid = []
+    valid = []
+
+    for identifier, naan, shoulder_name in rows:
+        if naan is None:
+            # rows written without a naan column: take it from the identifier
+            naan = identifier.split('/', 1)[0]
+        try:
+            template = _check_templates.get((int(naan), shoulder_name or ''))
+        except ValueError:
+            template = None
+        if template is None:
+            counts['no_shoulder'] += 1
+            continue
+        counts['total'] += 1
+
+        # random part comes from the identifier ({naan}/{shoulder}{random}),
+        # whichever way assigned_name was stored
+        name = identifier.split('/', 1)[-1]
+        if shoulder_name and name.startswith(shoulder_name):
+            name = name[len(shoulder_name):]
+
+        is_valid, expected, actual = validate_noid(name, template, naan, shoulder_name)
+        if expected is None:
+            counts['no_check'] += 1
+        elif is_valid:
+            counts['valid'] += 1
+            if include_valid:
+                valid.append(identifier)
+        else:
+            counts['invalid'] += 1
+            invalid.append((identifier, expected, actual))
+
+    return counts, invalid, valid
+
+
+def iter_ark_chunks(con, chunk_size, after='', shoulder=None, limit=0):
+    """Read (identifier, naan, shoulder) rows in keyset-paginated chunks."""
+    query = "SELECT identifier, naan, shoulder FROM ark WHERE identifier > ?"
+    if shoulder:
+        query += " AND shoulder = ?"
+    query += " ORDER BY identifier LIMIT ?"
+
+    read = 0
+    while True:
+        size = chunk_size if not limit else min(chunk_size, limit - read)
+        if size <= 0:
+            return
+
+        params = [after, shoulder, size] if shoulder else [after, size]
+        rows = con.execute(query, params).fetchall()
+        if not rows:
+            return
+
+        yield rows
+        read += len(rows)
+        after = rows[-1][0]
 
-    if not mask or mask[0] not in 'rsz':
-        return (False, None, None)
 
-    pattern = mask[1:]
-    has_check = pattern.endswith('k')
+class InvalidArkWriter(object):
+    """Streams invalid ARKs to a CSV or JSONL file."""
 
-    if not has_check:
-        return (True, None, None)
+    def __init__(self, path, append=False):
+        self.format = 'jsonl' if path.endswith(('.jsonl', '.json')) else 'csv'
+        exists = append and os.path.exists(path) and os.path.getsize(path) > 0
+        self.file = open(path, 'a' if append else 'w', newline='')
+        if self.format == 'csv':
+            self.writer = csv.writer(self.file)
+            if not exists:
+                self.writer.writerow(['identifier', 'expected', 'actual'])
 
-    # Validate check digit (calculated on full ARK: naan/shoulder+assigned_name)
-    full_ark = f"{naan}/{shoulder}{assigned_name}"
-    base = full_ark[:-1]
-    actual_check = full_ark[-1]
-    expected_check = noid_check_digit(base)
+    def write(self, rows):
+        for identifier, expected, actual in rows:
+            if self.format == 'csv':
+                self.writer.writerow([identifier, expected, actual])
+            else:
+                self.file.write(json.dumps({'identifier': identifier, 'expected': expected, 'actual': actual}) + '\n')
+        self.file.flush()
 
-    return (actual_check == expected_check, expected_check, actual_check)
+    def close(self):
+        self.file.close()
 
 
 @click.command('noid-check')
@@ -55,13 +141,15 @@ def validate_noid(assigned_name, template, naan='', shoulder=''):
 @click.option('--limit', '-l', default=0, help='Limit number of ARKs to check (0=all)')
 @click.option('--show-invalid', '-i', is_flag=True, help='Only show invalid ARKs')
 @click.option('--verbose', '-v', is_flag=True, help='Show detailed output')
+@click.option('--workers', '-w', default=os.cpu_count() or 1, help='Worker processes (1=check in this process)')
+@click.option('--chunk-size', default=10000, help='ARKs read and validated per chunk')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), help='Write invalid ARKs to a .csv or .jsonl file')
+@click.option('--checkpoint', type=click.Path(dir_okay=False), help='Checkpoint file (default: <output>.checkpoint)')
+@click.option('--resume', is_flag=True, help='Continue from the last checkpointed identifier')
 @with_appcontext
-def noid_check(ark, shoulder, limit, show_invalid, verbose):
+def noid_check(ark, shoulder, limit, show_invalid, verbose, workers, chunk_size, output, checkpoint, resume):
     """Check NOID validity for ARKs in the database."""
 
-    con = sqlite3.connect('ark.db')
-    cur = con.cursor()
-
     if ark:
         # Check single ARK
         parts = ark.split('/')
@@ -71,17 +159,16 @@ def noid_check(ark, shoulder, limit, show_invalid, verbose):
             click.echo(f"Invalid ARK format: {ark}")
             return
 
-        # Get shoulder (2 or 3 chars)
-        res = cur.execute(
-            "SELECT shoulder, template FROM shoulder WHERE naan = ? AND (shoulder = ? OR shoulder = ?)",
-            (naan, assigned_name[:3], assigned_name[:2])
-        )
-        row = res.fetchone()
+        # Get shoulder (longest matching prefix)
+        try:
+            row = get_shoulder_index().match(naan, assigned_name)
+        except ValueError:
+            row = None
         if not row:
             click.echo(f"Shoulder not found for ARK: {ark}")
             return
 
-        shoulder_name, template = row
+        shoulder_name, template = row['shoulder'], row['template'] or '.reedede'
         name_without_shoulder = assigned_name[len(shoulder_name):]
 
         is_valid, expected, actual = validate_noid(name_without_shoulder, template, naan, shoulder_name)
@@ -95,68 +182,783 @@ def noid_check(ark, shoulder, limit, show_invalid, verbose):
             click.echo(f"Expected: {expected}")
             click.echo(f"Actual:   {actual}")
         click.echo(f"Valid:    {'✓' if is_valid else '✗'}")
+        return
+
+    # Check multiple ARKs: keyset-paginated chunks validated in a process
+    # pool, invalid rows streamed to the output file, constant memory
+    checkpoint = checkpoint or (f"{output}.checkpoint" if output else None)
+    if resume and not checkpoint:
+        raise click.UsageError("--resume needs --output or --checkpoint")
+
+    counts = {'total': 0, 'valid': 0, 'invalid': 0, 'no_check': 0, 'no_shoulder': 0}
+    after = ''
+    if resume and checkpoint and os.path.exists(checkpoint):
+        with open(checkpoint) as f:
+            state = json.load(f)
+        after = state['after']
+        counts.update(state['counts'])
+        click.echo(f"Resuming after {after} ({counts['total']} already checked)", err=True)
+
+    # shoulder templates come from the in-memory index instead of a join
+    templates = {
+        (int(row['naan']), row['shoulder']): row['template'] or '.reedede'
+        for row in get_shoulder_index().rows()
+    }
+    writer = InvalidArkWriter(output, append=resume) if output else None
+    first_invalid = []
+    include_valid = verbose and not show_invalid
+
+    def handle(result, last_identifier):
+        chunk_counts, invalid, valid = result
+        for key, value in chunk_counts.items():
+            counts[key] += value
+
+        for identifier in valid:
+            click.echo(f"✓ ark:/{identifier}")
+        for identifier, expected, actual in invalid:
+            if verbose or show_invalid:
+                click.echo(f"✗ ark:/{identifier} (expected: {expected}, actual: {actual})")
+            elif len(first_invalid) < 10:
+                first_invalid.append((identifier, expected, actual))
 
+        if writer:
+            writer.write(invalid)
+        if checkpoint:
+            tmp = f"{checkpoint}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump({'after': last_identifier, 'counts': counts}, f)
+            os.replace(tmp, checkpoint)
+
+    start = time.monotonic()
+    last_report = start
+    checked = 0
+
+    def progress(rows_done):
+        nonlocal last_report, checked
+        checked += rows_done
+        now = time.monotonic()
+        if now - last_report >= 2:
+            last_report = now
+            click.echo(f"... {checked} rows ({checked / (now - start):.0f} rows/s)", err=True)
+
+    chunks = iter_ark_chunks(get_db(), chunk_size, after, shoulder, limit)
+    try:
+        if workers <= 1:
+            _init_check_worker(templates)
+            for rows in chunks:
+                handle(check_noid_chunk(rows, include_valid), rows[-1][0])
+                progress(len(rows))
+        else:
+            with ProcessPoolExecutor(workers, initializer=_init_check_worker, initargs=(templates,)) as pool:
+                # results are handled in submission order, so the checkpoint
+                # only ever moves past fully validated chunks
+                pending = collections.deque()
+                for rows in chunks:
+                    pending.append((pool.submit(check_noid_chunk, rows, include_valid), rows[-1][0], len(rows)))
+                    if len(pending) >= workers * 2:
+                        future, last_identifier, size = pending.popleft()
+                        handle(future.result(), last_identifier)
+                        progress(size)
+                while pending:
+                    future, last_identifier, size = pending.popleft()
+                    handle(future.result(), last_identifier)
+                    progress(size)
+    finally:
+        if writer:
+            writer.close()
+
+    elapsed = time.monotonic() - start
+    click.echo("")
+    click.echo("=" * 40)
+    click.echo(f"Total checked:    {counts['total']}")
+    click.echo(f"Valid:            {counts['valid']}")
+    click.echo(f"Invalid:          {counts['invalid']}")
+    click.echo(f"No check digit:   {counts['no_check']}")
+    if counts['no_shoulder']:
+        click.echo(f"Unknown shoulder: {counts['no_shoulder']}")
+    click.echo(f"Throughput:       {checked / elapsed if elapsed else 0:.0f} rows/s")
+    if output:
+        click.echo(f"Invalid ARKs written to {output}")
+
+    if first_invalid:
+        click.echo("")
+        click.echo(f"First 10 invalid ARKs:")
+        for ark_id, expected, actual in first_invalid:
+            click.echo(f"  ✗ ark:/{ark_id} (expected: {expected}, actual: {actual})")
+
+
+def read_import_rows(path, fmt=None):
+    """Yield (line_number, row, error) from a CSV or JSONL file."""
+    fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row, None
+        else:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_number, json.loads(line), None
+                except ValueError as e:
+                    yield line_number, None, f'invalid JSON: {e}'
+
+
+def parse_import_row(row, naans, shoulder_index, check_digits=True):
+    """Validate one import row, return (ark_row, None) or (None, reason)."""
+    for field in ('identifier', 'ark', 'url', 'shoulder', 'who', 'what', 'when'):
+        if row.get(field) is not None and not isinstance(row[field], str):
+            return None, f'{field} must be a string'
+
+    identifier = (row.get('identifier') or row.get('ark') or '').strip()
+    if identifier.startswith('ark:'):
+        identifier = identifier[4:].lstrip('/')
+    url = (row.get('url') or '').strip()
+
+    parts = identifier.split('/')
+    if len(parts) != 2 or not parts[1]:
+        return None, 'identifier must be naan/assigned_name'
+    naan, assigned_name = parts
+
+    try:
+        naan = int(naan)
+    except ValueError:
+        return None, 'NAAN must be an integer'
+    if naan not in naans:
+        return None, f'NAAN {naan} not found'
+
+    if shoulder := row.get('shoulder'):
+        shoulder_row = shoulder_index.get(naan, shoulder)
+        if not shoulder_row or not assigned_name.startswith(shoulder):
+            return None, f'Shoulder {shoulder} not found for NAAN {naan}'
     else:
-        # Check multiple ARKs
-        query = """
-            SELECT a.identifier, a.assigned_name, a.shoulder, s.template
-            FROM ark a
-            JOIN shoulder s ON a.shoulder = s.shoulder
-        """
-        params = []
-
-        if shoulder:
-            query += " WHERE a.shoulder = ?"
-            params.append(shoulder)
-
-        if limit > 0:
-            query += f" LIMIT {limit}"
-
-        res = cur.execute(query, params)
-
-        total = 0
-        valid_count = 0
-        invalid_count = 0
-        no_check_count = 0
-        invalid_arks = []
-
-        for row in res:
-            identifier, assigned_name, shoulder_name, template = row
-            total += 1
-
-            if not template:
-                template = '.reedede'
-
-            # Extract naan from identifier (format: naan/assigned_name)
-            naan = identifier.split('/')[0]
-            is_valid, expected, actual = validate_noid(assigned_name, template, naan, shoulder_name)
-
-            if expected is None:
-                no_check_count += 1
-            elif is_valid:
-                valid_count += 1
-                if verbose and not show_invalid:
-                    click.echo(f"✓ ark:/{identifier}")
+        shoulder_row = shoulder_index.match(naan, assigned_name)
+        if not shoulder_row:
+            return None, 'no matching shoulder'
+    shoulder = shoulder_row['shoulder']
+
+    if check_digits:
+        template = shoulder_row['template'] or '.reedede'
+        is_valid, expected, actual = validate_noid(assigned_name[len(shoulder):], template, naan, shoulder)
+        if not is_valid:
+            return None, f'check digit mismatch (expected: {expected}, actual: {actual})'
+
+    return (
+        f'{naan}/{assigned_name}', naan, assigned_name, shoulder, url,
+        row.get('who') or '', row.get('what') or '', row.get('when') or '',
+    ), None
+
+
+@click.command('ark-import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Input format (default: from file extension)')
+@click.option('--batch-size', default=50000, help='Rows per executemany/transaction')
+@click.option('--on-conflict', type=click.Choice(['skip', 'replace', 'fail']), default='skip', help='What to do with identifiers that already exist')
+@click.option('--no-check-digits', is_flag=True, help='Do not validate NCDA check digits')
+@click.option('--rejects', type=click.Path(dir_okay=False), help='Write rejected rows (line, identifier, reason) to this CSV file')
+@click.option('--drop-indexes', is_flag=True, help='Drop secondary ark indexes during the import and rebuild them at the end (offline loads only)')
+@click.option('--dry-run', is_flag=True, help='Validate only, write nothing')
+@with_appcontext
+def ark_import(path, fmt, batch_size, on_conflict, no_check_digits, rejects, drop_indexes, dry_run):
+    """Bulk import ARKs from a CSV or JSONL file.
+
+    Columns: identifier (naan/assigned_name, "ark:/" prefix allowed), url,
+    and optionally shoulder, who, what, when.
+    """
+    from app.application import ark_insert_sql, find_existing_identifiers
+
+    db = get_db()
+    naans = {row[0] for row in db.execute('SELECT naan FROM naan')}
+    shoulder_index = get_shoulder_index(max_age=0)
+
+    pool = get_pool()
+    insert_sql = ark_insert_sql({'skip': 'ignore', 'replace': 'replace', 'fail': None}[on_conflict])
+
+    # a dedicated connection, so the import settings don't leak into the pool
+    con = pool.connect()
+    pool.tune_bulk_load(con)
+
+    dropped_indexes = []
+    if not dry_run and drop_indexes:
+        # secondary (non-unique) indexes are rebuilt once at the end;
+        # until then searches and exports by shoulder or date scan the table
+        dropped_indexes = pool.secondary_indexes(con, 'ark')
+        for name, _ in dropped_indexes:
+            con.execute(f'DROP INDEX "{name}"')
+        con.commit()
+
+    reject_file = open(rejects, 'w', newline='') if rejects else None
+    reject_writer = csv.writer(reject_file) if reject_file else None
+    if reject_writer:
+        reject_writer.writerow(['line', 'identifier', 'reason'])
+
+    counts = {'read': 0, 'imported': 0, 'skipped': 0, 'rejected': 0}
+    start = time.monotonic()
+    last_report = start
+
+    def reject(line, identifier, reason):
+        counts['rejected'] += 1
+        if reject_writer:
+            reject_writer.writerow([line, identifier, reason])
+
+    def flush(batch):
+        if dry_run:
+            existing = find_existing_identifiers(con, [row[0] for row in batch])
+            counts['skipped' if on_conflict != 'fail' else 'rejected'] += len(existing)
+            counts['imported'] += len(batch) - len(existing)
+            return
+
+        with con:
+            changed = con.executemany(insert_sql, batch).rowcount
+        counts['imported'] += changed
+        if on_conflict != 'fail':
+            # existing rows, or with 'replace' existing rows without changes
+            counts['skipped'] += len(batch) - changed
+
+    try:
+        batch = []
+        seen = set()
+        for line, row, error in read_import_rows(path, fmt):
+            counts['read'] += 1
+            if error or not isinstance(row, dict):
+                reject(line, '', error or 'not an object')
+                continue
+
+            ark_row, reason = parse_import_row(row, naans, shoulder_index, not no_check_digits)
+            if reason:
+                reject(line, row.get('identifier') or row.get('ark') or '', reason)
+                continue
+            if ark_row[0] in seen:
+                reject(line, ark_row[0], 'duplicate identifier in file')
+                continue
+
+            seen.add(ark_row[0])
+            batch.append(ark_row)
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+                seen = set()
+
+            now = time.monotonic()
+            if now - last_report >= 2:
+                last_report = now
+                click.echo(f"... {counts['read']} rows ({counts['read'] / (now - start):.0f} rows/s)", err=True)
+
+        if batch:
+            flush(batch)
+    except pool.IntegrityError as e:
+        raise click.ClickException(f'Import stopped, earlier batches were committed: {e}')
+    finally:
+        if dropped_indexes:
+            click.echo(f"Rebuilding {len(dropped_indexes)} index(es)...", err=True)
+            for _, sql in dropped_indexes:
+                con.execute(sql)
+            con.commit()
+        con.close()
+        if reject_file:
+            reject_file.close()
+
+    elapsed = time.monotonic() - start
+    click.echo("")
+    click.echo("=" * 40)
+    if dry_run:
+        click.echo("Dry run, nothing written")
+    click.echo(f"Rows read:        {counts['read']}")
+    label = 'Would import:' if dry_run else 'Imported:'
+    click.echo(f"{label:<18}{counts['imported']}")
+    label = 'Unchanged:' if on_conflict == 'replace' else 'Skipped (exists):'
+    click.echo(f"{label:<18}{counts['skipped']}")
+    click.echo(f"Rejected:         {counts['rejected']}")
+    click.echo(f"Throughput:       {counts['read'] / elapsed if elapsed else 0:.0f} rows/s")
+    if rejects:
+        click.echo(f"Rejected rows written to {rejects}")
+
+
+EXPORT_COLUMNS = ('identifier', 'naan', 'assigned_name', 'shoulder', 'url', 'who', 'what', 'when', 'updated')
+
+
+def open_export_output(path, compress):
+    """Open `path` ('-' for stdout) for text output, optionally compressed."""
+    if compress == 'gzip':
+        if path == '-':
+            return io.TextIOWrapper(gzip.GzipFile(fileobj=sys.stdout.buffer, mode='wb'), encoding='utf-8', newline='')
+        return gzip.open(path, 'wt', encoding='utf-8', newline='')
+
+    if compress == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise click.ClickException('zstd compression needs the zstandard package')
+        raw = sys.stdout.buffer if path == '-' else open(path, 'wb')
+        return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(raw), encoding='utf-8', newline='')
+
+    if path == '-':
+        return io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', newline='', write_through=False)
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+def format_erc(row):
+    """ERC record (kernel elements plus the target as _t), blank-line separated."""
+    return (
+        f"erc:\n"
+        f"who: {row['who'] or '(:unav)'}\n"
+        f"what: {row['what'] or '(:unav)'}\n"
+        f"when: {row['when'] or '(:unav)'}\n"
+        f"where: ark:/{row['identifier']}\n"
+        f"_t: {row['url'] or ''}\n"
+        f"\n"
+    )
+
+
+@click.command('ark-export')
+@click.argument('output', default='-')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl', 'erc']), default='csv', help='Output format')
+@click.option('--naan', '-n', type=int, help='Only export this NAAN')
+@click.option('--shoulder', '-s', help='Only export this shoulder')
+@click.option('--compress', type=click.Choice(['none', 'gzip', 'zstd']), help='Compression (default: from the .gz/.zst extension)')
+@click.option('--since', help='Only export rows updated after this UTC timestamp (YYYY-MM-DD HH:MM:SS)')
+@click.option('--watermark', type=click.Path(dir_okay=False), help='Read --since from this file and store the new watermark in it afterwards')
+@click.option('--overlap', default=60, help='Seconds the new watermark stays behind the export start, to catch slow transactions')
+@with_appcontext
+def ark_export(output, fmt, naan, shoulder, compress, since, watermark, overlap):
+    """Stream the ark table to OUTPUT (default: stdout).
+
+    Rows are read with one streaming cursor, so memory use does not grow
+    with the table. With --watermark, each run exports only the rows
+    changed since the previous run.
+    """
+    if compress is None:
+        compress = {'.gz': 'gzip', '.zst': 'zstd'}.get(os.path.splitext(output)[1], 'none')
+
+    if watermark and not since and os.path.exists(watermark):
+        with open(watermark) as f:
+            since = f.read().strip() or None
+
+    pool = get_pool()
+    con = get_db()
+    next_watermark = next_change_watermark(con, overlap)
+
+    columns = ', '.join(f'"{c}"' for c in EXPORT_COLUMNS)
+    query = f"SELECT {columns} FROM ark"
+    conditions = []
+    params = []
+    if naan:
+        conditions.append("naan = ?")
+        params.append(naan)
+    if shoulder:
+        conditions.append("shoulder = ?")
+        params.append(shoulder)
+    if since:
+        conditions.append("updated > ?")
+        params.append(since)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+
+    count = 0
+    start = time.monotonic()
+    out = open_export_output(output, compress)
+    try:
+        writer = csv.writer(out) if fmt == 'csv' else None
+        if writer:
+            writer.writerow(EXPORT_COLUMNS)
+
+        for values in pool.iterate(con, query, params):
+            row = dict(zip(EXPORT_COLUMNS, values))
+            if fmt == 'csv':
+                writer.writerow(values)
+            elif fmt == 'jsonl':
+                out.write(json.dumps(row, ensure_ascii=False) + '\n')
             else:
-                invalid_count += 1
-                invalid_arks.append((identifier, expected, actual))
-                if verbose or show_invalid:
-                    click.echo(f"✗ ark:/{identifier} (expected: {expected}, actual: {actual})")
+                out.write(format_erc(row))
+            count += 1
+    finally:
+        out.close()
 
-        click.echo("")
-        click.echo("=" * 40)
-        click.echo(f"Total checked:    {total}")
-        click.echo(f"Valid:            {valid_count}")
-        click.echo(f"Invalid:          {invalid_count}")
-        click.echo(f"No check digit:   {no_check_count}")
+    if watermark:
+        tmp = f'{watermark}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(next_watermark)
+        os.replace(tmp, watermark)
+
+    elapsed = time.monotonic() - start
+    click.echo(f"Exported {count} ARKs in {elapsed:.1f}s ({count / elapsed if elapsed else 0:.0f} rows/s)", err=True)
+    if watermark:
+        click.echo(f"Watermark: {next_watermark}", err=True)
+
+
+def nginx_map_entry(key, url, status, max_age):
+    """One `"key" "status max_age url";` line of an nginx map, or None.
+
+    The value carries the redirect policy of the ARK's shoulder, ark.conf
+    splits it into the status, Cache-Control and Location. nginx expands
+    variables in map values and has no escape for `$`, so such targets (and
+    anything with a line break) stay with the resolver.
+    """
+    if not url or '$' in key or '$' in url or any(c in key + url for c in '\r\n'):
+        return None
+
+    def quote(text):
+        return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+    return f'{quote(key)} {quote(f"{status} {max_age} {url}")};\n'
+
+
+def nginx_map_key(line):
+    """Key of a line written by nginx_map_entry."""
+    if not line.startswith('"'):
+        return None
+    end = 1
+    while line[end] != '"':
+        end += 2 if line[end] == '\\' else 1
+    return line[1:end].replace('\\"', '"').replace('\\\\', '\\')
+
+
+def count_resolved_arks(paths):
+    """Count resolved `naan/assigned_name` paths in access logs (nginx or gunicorn).
+
+    Only requests without a suffix are counted, the map can't serve others.
+    """
+    request_re = re.compile(r'"(?:GET|HEAD) (/ark:/[^ "]+) HTTP/[^"]*" (\d{3})')
+    counts = collections.Counter()
+    for path in paths:
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                match = request_re.search(line)
+                if not match or match.group(2) not in ('301', '302', '303', '307', '308'):
+                    continue
+                identifier = urllib.parse.unquote(match.group(1).split('?', 1)[0])[len('/ark:/'):]
+                if identifier.count('/') == 1:
+                    counts[identifier] += 1
+    return counts
+
+
+@click.command('nginx-map')
+@click.argument('output', type=click.Path(dir_okay=False))
+@click.option('--top', default=0, help='Only the N most resolved ARKs (0=all ARKs)')
+@click.option('--access-log', multiple=True, type=click.Path(exists=True, dir_okay=False), help='nginx/gunicorn access log(s) to rank ARKs by, for --top (.gz ok)')
+@click.option('--stats-days', default=30, help='Without --access-log, rank ARKs by resolution_stats of the last N days')
+@click.option('--incremental', is_flag=True, help='Only apply ARKs changed since the last run to OUTPUT')
+@click.option('--overlap', default=60, help='Seconds the watermark stays behind the run start, to catch slow transactions')
+@click.option('--reload-command', help='Run after OUTPUT changed, e.g. "nginx -s reload"')
+@with_appcontext
+def nginx_map(output, top, access_log, stats_days, incremental, overlap, reload_command):
+    """Compile ARK redirects into an nginx map include file.
+
+    OUTPUT holds the entries of `map $uri $ark_redirect` (see
+    docker/nginx/ark.conf): one exact entry per ARK, with the status and
+    max-age of its REDIRECT_POLICIES entry. With --top only the most
+    resolved ARKs (from access logs, or from resolution_stats when
+    RESOLUTION_STATS is on) are written. Everything else, shoulder
+    fallbacks and ARKs minted since the last run included, falls through to
+    the resolver. The file is written next to OUTPUT and renamed into place,
+    so nginx never reads half of it.
+    """
+    if top and not access_log and not current_app.config['RESOLUTION_STATS']:
+        raise click.UsageError('--top needs at least one --access-log, or RESOLUTION_STATS')
+
+    state_path = f'{output}.state'
+    state = {}
+    if incremental and os.path.exists(state_path) and os.path.exists(output):
+        with open(state_path) as f:
+            state = json.load(f)
+    # a policy change touches entries whose rows did not change
+    config = current_app.config
+    policy = [config['REDIRECT_STATUS'], config['REDIRECT_MAX_AGE'], config['REDIRECT_POLICIES']]
+    if state.get('top', 0) != top or state.get('policy') != policy:
+        state = {}
+
+    policies = {}
+
+    def entry(identifier, naan, shoulder, url):
+        if (naan, shoulder) not in policies:
+            policies[naan, shoulder] = redirect_policy(naan, shoulder)
+        return nginx_map_entry(f'/ark:/{identifier}', url, *policies[naan, shoulder])
+
+    con = get_db()
+    next_watermark = next_change_watermark(con, overlap)
+    tmp = f'{output}.tmp'
+    start = time.monotonic()
+    count = 0
+
+    with open(tmp, 'w', encoding='utf-8') as out:
+        out.write(f'# generated by flask nginx-map, {"top " + str(top) if top else "all ARKs"}\n')
+
+        if top:
+            # walk the ranking in chunks until `top` ARKs with a url are
+            # found; shoulder fallbacks in the log have no ark row
+            if access_log:
+                ranked = [identifier for identifier, _ in count_resolved_arks(access_log).most_common()]
+            else:
+                since = (datetime.now(timezone.utc) - timedelta(days=stats_days)).strftime('%Y-%m-%d')
+                try:
+                    ranked = [row[0] for row in top_arks(con, limit=top * 2, since=since)]
+                except StatsUnavailable as e:
+                    raise click.ClickException(str(e))
+            for i in range(0, len(ranked), 500):
+                chunk = ranked[i:i + 500]
+                placeholders = ', '.join('?' * len(chunk))
+                rows = con.execute(f'SELECT identifier, naan, shoulder, url FROM ark WHERE identifier IN ({placeholders})', chunk)
+                targets = {row[0]: row for row in rows}
+                for identifier in chunk:
+                    if count < top and identifier in targets and (line := entry(*targets[identifier])):
+                        out.write(line)
+                        count += 1
+                if count >= top:
+                    break
+
+        elif state:
+            # merge the rows changed since the last run into the old file
+            rows = con.execute('SELECT identifier, naan, shoulder, url FROM ark WHERE updated > ?', (state['watermark'],))
+            changed = {f'/ark:/{row[0]}': row for row in rows}
+            with open(output, encoding='utf-8') as f:
+                for line in f:
+                    key = nginx_map_key(line)
+                    if key is None:
+                        continue
+                    if key in changed:
+                        line = entry(*changed.pop(key))
+                        if line is None:
+                            continue
+                    out.write(line)
+                    count += 1
+            for row in changed.values():
+                if line := entry(*row):
+                    out.write(line)
+                    count += 1
+
+        else:
+            for row in get_pool().iterate(con, 'SELECT identifier, naan, shoulder, url FROM ark'):
+                if line := entry(*row):
+                    out.write(line)
+                    count += 1
+
+    if os.path.exists(output) and filecmp.cmp(tmp, output, shallow=False):
+        os.unlink(tmp)
+        changed_file = False
+    else:
+        os.replace(tmp, output)
+        changed_file = True
+
+    with open(f'{state_path}.tmp', 'w') as f:
+        json.dump({'top': top, 'policy': policy, 'watermark': next_watermark, 'entries': count}, f)
+    os.replace(f'{state_path}.tmp', state_path)
+
+    elapsed = time.monotonic() - start
+    click.echo(f"{count} ARK entries in {output} ({elapsed:.1f}s){'' if changed_file else ', unchanged'}", err=True)
+
+    if changed_file and reload_command:
+        result = subprocess.run(shlex.split(reload_command))
+        if result.returncode:
+            raise click.ClickException(f'{reload_command} exited with {result.returncode}')
+
+
+@click.command('resolver-index')
+@click.argument('output', required=False, type=click.Path(dir_okay=False))
+@click.option('--overlap', default=60, help='Seconds the watermark stays behind the build start, to catch slow transactions')
+@with_appcontext
+def resolver_index(output, overlap):
+    """Compile the ark table into the memory-mapped resolver index.
+
+    OUTPUT defaults to RESOLVER_INDEX. The new file is renamed into place;
+    workers map it within RESOLVER_INDEX_INTERVAL seconds. Rebuild it from
+    cron so the per-worker overlay of newer rows stays small.
+    """
+    output = output or current_app.config['RESOLVER_INDEX']
+    if not output:
+        raise click.UsageError('Give OUTPUT or set RESOLVER_INDEX')
+
+    pool = get_pool()
+    con = get_db()
+    watermark = next_change_watermark(con, overlap)
+    start = time.monotonic()
+    columns = ', '.join(f'"{c}"' for c in INDEX_COLUMNS)
+    rows = pool.iterate(con, f'SELECT {columns} FROM ark ORDER BY identifier{pool.BINARY_COLLATE}')
+    count = build_resolver_index(rows, output, watermark)
+
+    elapsed = time.monotonic() - start
+    click.echo(f'{count} ARKs in {output}, {os.path.getsize(output) / 1e6:.1f} MB ({elapsed:.1f}s)', err=True)
+
+
+@click.command('bloom-filter')
+@click.argument('output', required=False, type=click.Path(dir_okay=False))
+@with_appcontext
+def bloom_filter(output):
+    """Build the per-NAAN Bloom filters and save them for the workers.
+
+    OUTPUT defaults to BLOOM_FILTER_PATH. Workers load the file on start
+    and add newer rows themselves; rebuild it now and then (e.g. nightly)
+    so that catch-up stays short and the filters are sized for the table.
+    """
+    config = current_app.config
+    output = output or config['BLOOM_FILTER_PATH']
+    if not output:
+        raise click.UsageError('Give OUTPUT or set BLOOM_FILTER_PATH')
+
+    start = time.monotonic()
+    ark_filter = ArkFilter(
+        fp_rate=config['BLOOM_FILTER_FP_RATE'],
+        max_bytes=int(config['BLOOM_FILTER_MAX_MB'] * (1 << 20)),
+    )
+    filters, watermark = ark_filter.build(get_db())
+    save_filters(output, filters, watermark)
+
+    elapsed = time.monotonic() - start
+    for naan, f in filters.items():
+        stats = f.stats()
+        click.echo(
+            f"NAAN {naan}: {stats['items']} identifiers, {stats['bytes'] / 1e6:.1f} MB, "
+            f"{stats['hashes']} hashes, estimated false positives {stats['estimated_fp_rate']:.4%}",
+            err=True
+        )
+    click.echo(f'Saved {output} ({elapsed:.1f}s)', err=True)
+
+
+@click.command('search-index')
+@with_appcontext
+def search_index():
+    """Rebuild the full-text search index from the ark table.
+
+    The index is kept in sync on every write; rebuild it only if rows
+    were written without the alembic 0003 triggers (e.g. a restore into
+    an older schema). On SQLite this also merges the index segments.
+    """
+    start = time.monotonic()
+    count = rebuild_search_index(get_db())
+    click.echo(f'{count} ARKs with metadata indexed ({time.monotonic() - start:.1f}s)', err=True)
+
+
+def link_status_class(status, error):
+    if error:
+        return 'error'
+    return f'{status // 100}xx'
+
+
+@click.command('ark-linkcheck')
+@click.option('--naan', '-n', type=int, help='Only check ARKs of this NAAN')
+@click.option('--shoulder', '-s', help='Only check ARKs of this shoulder')
+@click.option('--max-age', default=168.0, help='Recheck links last checked more than this many hours ago')
+@click.option('--limit', '-l', default=0, help='Check at most this many links (0=all stale links)')
+@click.option('--concurrency', '-c', default=100, help='Requests in flight')
+@click.option('--per-host', default=4, help='Requests in flight per host')
+@click.option('--delay', default=0.1, help='Seconds between request starts to one host')
+@click.option('--timeout', default=10.0, help='Seconds per link, redirects included')
+@click.option('--user-agent', default=USER_AGENT, help='User-Agent header')
+@click.option('--batch-size', default=500, help='Results written per transaction')
+@with_appcontext
+def ark_linkcheck(naan, shoulder, max_age, limit, concurrency, per_host, delay, timeout, user_agent, batch_size):
+    """Check that ARK target URLs still resolve.
 
-        if invalid_arks and not verbose and not show_invalid:
-            click.echo("")
-            click.echo(f"First 10 invalid ARKs:")
-            for ark_id, expected, actual in invalid_arks[:10]:
-                click.echo(f"  ✗ ark:/{ark_id} (expected: {expected}, actual: {actual})")
+    Status, final URL after redirects, latency and check time are stored
+    per ARK in the link_check table. Only links never checked, checked
+    more than --max-age hours ago or whose URL changed since are checked,
+    so an interrupted run can simply be started again.
+    """
+    pool = get_pool()
+    con = get_db()
+    try:
+        con.execute('SELECT 1 FROM link_check LIMIT 1')
+    except pool.Error:
+        con.rollback()
+        raise click.ClickException('There is no link_check table, run `alembic upgrade head`')
+    cutoff = (datetime.now(timezone.utc) - timedelta(hours=max_age)).strftime('%Y-%m-%d %H:%M:%S')
+
+    query = (
+        "SELECT a.identifier, a.url FROM ark a LEFT JOIN link_check l ON l.identifier = a.identifier "
+        "WHERE a.url IS NOT NULL AND a.url <> '' AND (l.identifier IS NULL OR l.url <> a.url OR l.checked < ?)"
+    )
+    params = [cutoff]
+    for condition, value in (('a.naan = ?', naan), ('a.shoulder = ?', shoulder)):
+        if value is not None:
+            query += f' AND {condition}'
+            params.append(value)
+    if limit:
+        query += ' LIMIT ?'
+        params.append(limit)
+
+    # results go through their own connection: on PostgreSQL a commit on the
+    # reading one would close its server-side cursor
+    writer = pool.connect(durable=False)
+    upsert_sql = pool.insert_sql(
+        'link_check', RESULT_COLUMNS + ('checked',), ['?'] * len(RESULT_COLUMNS) + [pool.NOW],
+        on_conflict='replace', key=('identifier',)
+    )
+    counts = collections.Counter()
+    batch = []
+    start = time.monotonic()
+    last_report = start
+
+    def flush():
+        with writer:
+            writer.executemany(upsert_sql, batch)
+        batch.clear()
+
+    def handle(result):
+        nonlocal last_report
+        batch.append(result)
+        counts[link_status_class(result[2], result[3])] += 1
+        if len(batch) >= batch_size:
+            flush()
+        now = time.monotonic()
+        if now - last_report >= 2:
+            last_report = now
+            done = sum(counts.values())
+            click.echo(f'... {done} links ({done / (now - start):.0f} links/s)', err=True)
+
+    checker = LinkChecker(concurrency=concurrency, per_host=per_host, delay=delay, timeout=timeout, user_agent=user_agent)
+    try:
+        asyncio.run(checker.run(pool.iterate(con, query, params), handle))
+    finally:
+        if batch:
+            flush()
+        writer.close()
 
-    con.close()
+    elapsed = time.monotonic() - start
+    done = sum(counts.values())
+    click.echo(f"Checked {done} links in {elapsed:.1f}s ({done / elapsed if elapsed else 0:.0f} links/s)")
+    for name in sorted(counts):
+        click.echo(f'{name:<6}{counts[name]:>10}')
+
+
+@click.group('resolution-stats')
+def resolution_stats():
+    """Report resolution counts collected with RESOLUTION_STATS."""
+
+
+def stats_options(f):
+    f = click.option('--since', help='First UTC day (YYYY-MM-DD)')(f)
+    f = click.option('--until', help='Last UTC day (YYYY-MM-DD)')(f)
+    f = click.option('--naan', '-n', type=int, help='Only this NAAN')(f)
+    f = click.option('--shoulder', '-s', help='Only this shoulder')(f)
+    return f
+
+
+@resolution_stats.command('top')
+@click.option('--limit', '-l', default=20, help='Number of identifiers')
+@stats_options
+@with_appcontext
+def resolution_stats_top(limit, since, until, naan, shoulder):
+    """Most resolved ARKs."""
+    try:
+        rows = top_arks(get_db(), limit, since=since, until=until, naan=naan, shoulder=shoulder)
+    except StatsUnavailable as e:
+        raise click.ClickException(str(e))
+    for identifier, row_shoulder, hits in rows:
+        click.echo(f'{hits}\t{identifier}\t{row_shoulder or ""}')
+
+
+@resolution_stats.command('daily')
+@stats_options
+@with_appcontext
+def resolution_stats_daily(since, until, naan, shoulder):
+    """Resolutions, distinct ARKs and shoulder fallbacks per UTC day."""
+    try:
+        rows = daily_totals(get_db(), since=since, until=until, naan=naan, shoulder=shoulder)
+    except StatsUnavailable as e:
+        raise click.ClickException(str(e))
+    for day, hits, identifiers, shoulder_hits in rows:
+        click.echo(f'{day}\t{hits}\t{identifiers}\t{shoulder_hits}')
 
 
 @click.command('noid-generate')
@@ -167,16 +969,17 @@ def noid_check(ark, shoulder, limit, show_invalid, verbose):
 @with_appcontext
 def noid_generate(template, naan, shoulder, count):
     """Generate sample NOIDs using a template."""
-    from app.application import generate_noid
-
     click.echo(f"Template: {template}")
     click.echo(f"NAAN:     {naan}")
     click.echo(f"Shoulder: {shoulder}")
     click.echo(f"Generating {count} NOID(s):")
     click.echo("")
 
-    for _ in range(count):
-        noid = generate_noid(template, naan, shoulder)
+    # sequential templates: show the first `count` values of the counter
+    sequential = template.split('.', 1)[-1][:1] in ('s', 'z')
+
+    for i in range(count):
+        noid = generate_noid(template, naan, shoulder, i if sequential else None)
         full_id = shoulder + noid
         full_ark = f"{naan}/{full_id}"
 
@@ -198,7 +1001,92 @@ def noid_generate(template, naan, shoulder, count):
             click.echo(f"  ark:/{full_ark}")
 
 
+@click.command('noid-usage')
+@click.option('--naan', '-n', type=int, help='Only show counters for this NAAN')
+@click.option('--shoulder', '-s', help='Only show counters for this shoulder')
+@with_appcontext
+def noid_usage(naan, shoulder):
+    """Show how much of each counter-backed template namespace is used."""
+    query = "SELECT naan, shoulder, template, value FROM minter_counter"
+    conditions = []
+    params = []
+    if naan:
+        conditions.append("naan = ?")
+        params.append(naan)
+    if shoulder:
+        conditions.append("shoulder = ?")
+        params.append(shoulder)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY naan, shoulder, template"
+
+    con = get_db()
+    try:
+        rows = con.execute(query, params).fetchall()
+    except get_pool().Error:
+        # no minter_counter before `alembic upgrade head` (revision 0004)
+        con.rollback()
+        rows = []
+
+    if not rows:
+        click.echo("No counter-backed templates have been used yet.")
+        return
+
+    click.echo(f"{'NAAN':<8} {'Shoulder':<10} {'Template':<14} {'Reserved':>14} {'Capacity':>16} {'Used %':>8}")
+    for row_naan, row_shoulder, template, used in rows:
+        compiled = compile_template(template)
+        if compiled.generator == 'z':
+            capacity, percent = 'unlimited', '-'
+        else:
+            capacity = compiled.capacity
+            percent = f"{min(used, capacity) / capacity * 100:.2f}"
+        click.echo(f"{row_naan:<8} {row_shoulder:<10} {template:<14} {used:>14} {capacity:>16} {percent:>8}")
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db():
+    """Create the schema in an empty database and stamp it as migrated."""
+    from alembic import command
+    from alembic.config import Config as AlembicConfig
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    pool = get_pool()
+    if pool.backend == 'sqlite':
+        # the pool only opens existing files; an empty file is an empty database
+        open(pool.database, 'a').close()
+    con = get_db()
+    try:
+        con.execute('SELECT 1 FROM ark LIMIT 1')
+        raise click.ClickException('The ark table already exists, use `alembic upgrade head` instead')
+    except pool.Error:
+        con.rollback()
+
+    if pool.backend == 'sqlite':
+        with open(os.path.join(root, 'schema.sql')) as f:
+            con.executescript(f.read())
+    else:
+        from app.database import Base, engine
+        import app.models  # noqa: F401, registers the tables
+        Base.metadata.create_all(engine)
+
+    alembic_config = AlembicConfig(os.path.join(root, 'alembic.ini'))
+    alembic_config.set_main_option('script_location', os.path.join(root, 'alembic'))
+    command.stamp(alembic_config, 'head')
+    click.echo(f"Created the {pool.backend} schema")
+
+
 def init_app(app):
     """Register CLI commands with the Flask app."""
     app.cli.add_command(noid_check)
     app.cli.add_command(noid_generate)
+    app.cli.add_command(noid_usage)
+    app.cli.add_command(ark_import)
+    app.cli.add_command(ark_export)
+    app.cli.add_command(nginx_map)
+    app.cli.add_command(resolver_index)
+    app.cli.add_command(bloom_filter)
+    app.cli.add_command(search_index)
+    app.cli.add_command(ark_linkcheck)
+    app.cli.add_command(resolution_stats)
+    app.cli.add_command(init_db)
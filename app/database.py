@@ -39,7 +39,8 @@ Base = declarative_base()
 #def init_db(config):
     #print(config, flush=True)
 #engine = create_engine(config['DATABASE_URI'])
-engine = create_engine('sqlite:///foo.db') #TODO
+from app.config import Config
+engine = create_engine(Config.sqlalchemy_url())
 
 session = scoped_session(sessionmaker(autocommit=False,
                                       autoflush=False,
@@ -0,0 +1,402 @@
+"""Storage backends: per-worker connection pools for SQLite and PostgreSQL.
+
+Application code is written against sqlite3-style connections (`execute`
+on the connection, `?` placeholders, `with con:` transactions). The pool
+selected by DATABASE_BACKEND also carries what differs between the two
+databases: exception classes, the current-timestamp expression, upserts and
+index introspection.
+"""
+import functools
+import itertools
+import os
+import queue
+import sqlite3
+import urllib.parse
+from datetime import datetime, timedelta
+
+from flask import current_app, g
+
+
+class ConnectionPool(object):
+    """Small pool of long-lived SQLite connections for one worker process.
+
+    Connections are opened once with the configured pragmas and reused
+    across requests, so the prepared statement cache of each connection
+    survives between requests. `size=0` disables pooling (a connection is
+    opened and closed per request, the old behaviour).
+    """
+    backend = 'sqlite'
+    Error = sqlite3.Error
+    IntegrityError = sqlite3.IntegrityError
+
+    # UTC, as text that sorts and compares like the stored timestamps
+    NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+    # appended to ORDER BY to sort text by its bytes (sqlite's default)
+    BINARY_COLLATE = ''
+    # null-safe "differs from" (IS DISTINCT FROM needs SQLite 3.39)
+    DISTINCT_FROM = 'IS NOT'
+    # an `updated` value every row committed later is newer than; SQLite
+    # can't see open write transactions, next_change_watermark's overlap
+    # has to cover them
+    COMMITTED_BEFORE = NOW
+
+    def __init__(self, database, size=4, pragmas=None, cached_statements=256, timeout=5.0, relaxed_pragmas=None):
+        self.database = database
+        self.size = size
+        self.pragmas = pragmas or {}
+        self.relaxed_pragmas = relaxed_pragmas or {}
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._pid = os.getpid()
+
+    def connect(self, durable=True):
+        """A new connection outside the pool.
+
+        `durable=False` is for connections that only write data which may
+        be lost on power failure (resolution counts, link checks): they
+        skip the fsync per commit.
+        """
+        # mode=rw: a missing file is an error, not a new empty database
+        con = sqlite3.connect(
+            f"file:{urllib.parse.quote(self.database, safe='/:')}?mode=rw",
+            timeout=self.timeout,
+            cached_statements=self.cached_statements,
+            check_same_thread=False,
+            uri=True,
+        )
+        pragmas = self.pragmas if durable else dict(self.pragmas, **self.relaxed_pragmas)
+        for name, value in pragmas.items():
+            con.execute(f'PRAGMA {name} = {value}')
+        return con
+
+    def acquire(self):
+        if self._pid != os.getpid():
+            # forked (e.g. gunicorn --preload): never share a parent's connections
+            self._idle = queue.LifoQueue()
+            self._pid = os.getpid()
+
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self.connect()
+
+    def release(self, con):
+        if con.in_transaction:
+            con.rollback()
+
+        if self._pid == os.getpid() and self._idle.qsize() < self.size:
+            self._idle.put(con)
+        else:
+            con.close()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def stats(self):
+        return {'backend': self.backend, 'size': self.size, 'idle': self._idle.qsize()}
+
+    def table_names(self, con):
+        return [row[0] for row in con.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+
+    def insert_sql(self, table, columns, values=None, on_conflict=None, key=None, keep=(), compare=()):
+        """INSERT statement for `columns`, `?` placeholders unless `values` given.
+
+        `on_conflict` is None (raise IntegrityError), 'ignore' (keep the
+        existing row) or 'replace' (overwrite the row with the same `key`).
+        'replace' is an upsert, not INSERT OR REPLACE: the row is updated in
+        place, so its UPDATE triggers run (the ark search index). It leaves
+        the `keep` columns alone and, with `compare`, only updates rows
+        where one of those columns changes (rowcount 0 otherwise).
+        """
+        verb = 'INSERT OR IGNORE' if on_conflict == 'ignore' else 'INSERT'
+        names = ', '.join(f'"{c}"' for c in columns)
+        values = ', '.join(values or ['?'] * len(columns))
+        sql = f'{verb} INTO {table} ({names}) VALUES ({values})'
+        if on_conflict == 'replace':
+            updates = ', '.join(f'"{c}" = excluded."{c}"' for c in columns if c not in key and c not in keep)
+            sql += f' ON CONFLICT ({", ".join(key)}) DO UPDATE SET {updates}'
+            if compare:
+                sql += ' WHERE ' + ' OR '.join(f'{table}."{c}" {self.DISTINCT_FROM} excluded."{c}"' for c in compare)
+        return sql
+
+    def secondary_indexes(self, con, table):
+        """(name, create statement) of the non-unique indexes on `table`."""
+        return con.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? "
+            "AND sql IS NOT NULL AND sql NOT LIKE 'CREATE UNIQUE%'",
+            (table,)
+        ).fetchall()
+
+    def tune_bulk_load(self, con):
+        """Settings for a connection used only for a bulk load."""
+        con.execute('PRAGMA cache_size = -262144')  # 256 MB
+
+    def iterate(self, con, sql, params=(), size=10000):
+        """Rows of a large query, fetched `size` at a time."""
+        return con.execute(sql, params)
+
+
+@functools.lru_cache(maxsize=1024)
+def format_placeholders(sql):
+    """Rewrite `?` placeholders for psycopg2 (which uses `%s`)."""
+    return sql.replace('%', '%%').replace('?', '%s')
+
+
+@functools.lru_cache(maxsize=256)
+def split_insert_values(sql):
+    """(head, row, tail) of `INSERT ... VALUES (row) tail`, or None.
+
+    The row is found by matching parentheses, so it may contain function
+    calls (but no parentheses inside string literals).
+    """
+    start = sql.find(' VALUES (')
+    if start < 0 or not sql.startswith('INSERT'):
+        return None
+    start += len(' VALUES ')
+    depth = 0
+    for i in range(start, len(sql)):
+        if sql[i] == '(':
+            depth += 1
+        elif sql[i] == ')':
+            depth -= 1
+            if depth == 0:
+                return sql[:start], sql[start:i + 1], sql[i + 1:]
+    return None
+
+
+class PostgresCursor(object):
+    """psycopg2 cursor taking sqlite3-style `?` placeholders."""
+
+    # rows per statement in executemany
+    PAGE_SIZE = 1000
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._rowcount = None
+
+    def execute(self, sql, params=()):
+        self._rowcount = None
+        self._cursor.execute(format_placeholders(sql), tuple(params))
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        """Run `sql` for each parameter tuple, PAGE_SIZE rows per round trip.
+
+        psycopg2's own executemany is a loop of execute(). An INSERT becomes
+        one multi-row INSERT per page (execute_values), so an ON CONFLICT DO
+        UPDATE must not meet the same key twice in one call. rowcount is the
+        total of all pages, as with sqlite3; -1 for other statements, which
+        are sent with execute_batch.
+        """
+        from psycopg2.extras import execute_batch, execute_values
+
+        sql = format_placeholders(sql)
+        parts = split_insert_values(sql)
+        rows = iter(seq_of_params)
+        rowcount = 0
+        while page := list(itertools.islice(rows, self.PAGE_SIZE)):
+            if parts is None:
+                execute_batch(self._cursor, sql, page, page_size=len(page))
+                rowcount = -1
+            else:
+                head, template, tail = parts
+                execute_values(self._cursor, head + '%s' + tail, page, template=template, page_size=len(page))
+                rowcount += self._cursor.rowcount
+        self._rowcount = rowcount
+        return self
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount if self._rowcount is None else self._rowcount
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        # fetchone, fetchall, rowcount, description, close, ...
+        return getattr(self._cursor, name)
+
+
+class PostgresConnection(object):
+    """psycopg2 connection with the sqlite3 connection API the app uses."""
+
+    def __init__(self, connection):
+        self.raw = connection
+
+    def cursor(self):
+        return PostgresCursor(self.raw.cursor())
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def close(self):
+        self.raw.close()
+
+    @property
+    def closed(self):
+        return bool(self.raw.closed)
+
+    @property
+    def in_transaction(self):
+        import psycopg2.extensions
+        return self.raw.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+
+class PostgresPool(ConnectionPool):
+    """Per-worker pool of psycopg2 connections to DATABASE_URI.
+
+    Many workers can mint concurrently, where SQLite serializes all writers
+    on one lock. Needs the psycopg2 package.
+    """
+    backend = 'postgresql'
+    NOW = "(now() at time zone 'utc')"
+    BINARY_COLLATE = ' COLLATE "C"'
+    DISTINCT_FROM = 'IS DISTINCT FROM'
+    # now() is the start of the writing transaction, so stay behind the
+    # oldest transaction still open (visible for sessions of the same role,
+    # or all of them with pg_read_all_stats)
+    COMMITTED_BEFORE = (
+        "((SELECT least(now(), min(xact_start)) FROM pg_stat_activity"
+        " WHERE datname = current_database() AND backend_type = 'client backend')"
+        " at time zone 'utc')"
+    )
+
+    def __init__(self, database, size=4, timeout=5.0):
+        try:
+            import psycopg2
+            import psycopg2.extensions
+        except ImportError:
+            raise RuntimeError('DATABASE_BACKEND=postgresql needs the psycopg2 package')
+
+        # SQLAlchemy style URIs (postgresql+psycopg2://) are accepted too
+        super().__init__(database.replace('+psycopg2', '', 1), size=size, timeout=timeout)
+        self._psycopg2 = psycopg2
+        self.Error = psycopg2.Error
+        self.IntegrityError = psycopg2.IntegrityError
+        # timestamps as text, the same values sqlite3 returns
+        self._timestamp_text = psycopg2.extensions.new_type((1114,), 'TIMESTAMP_TEXT', lambda value, cur: value)
+
+    def connect(self, durable=True):
+        raw = self._psycopg2.connect(self.database, connect_timeout=max(1, int(self.timeout)))
+        self._psycopg2.extensions.register_type(self._timestamp_text, raw)
+        if not durable:
+            # commits return before the WAL is flushed
+            with raw.cursor() as cursor:
+                cursor.execute('SET synchronous_commit = off')
+            raw.commit()
+        return PostgresConnection(raw)
+
+    def release(self, con):
+        if con.closed:
+            return
+        super().release(con)
+
+    def insert_sql(self, table, columns, values=None, on_conflict=None, key=None, keep=(), compare=()):
+        if on_conflict == 'ignore':
+            return super().insert_sql(table, columns, values) + ' ON CONFLICT DO NOTHING'
+        return super().insert_sql(table, columns, values, on_conflict, key, keep, compare)
+
+    def table_names(self, con):
+        return [
+            row[0] for row in
+            con.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = current_schema()")
+        ]
+
+    def secondary_indexes(self, con, table):
+        return con.execute(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() "
+            "AND tablename = ? AND indexdef NOT LIKE 'CREATE UNIQUE%'",
+            (table,)
+        ).fetchall()
+
+    def tune_bulk_load(self, con):
+        con.execute("SET maintenance_work_mem = '256MB'")
+
+    def iterate(self, con, sql, params=(), size=10000):
+        # a named (server-side) cursor; a plain one fetches the whole result
+        cursor = con.raw.cursor(name=f'iterate_{id(con)}')
+        cursor.itersize = size
+        cursor.execute(format_placeholders(sql), tuple(params))
+        try:
+            yield from cursor
+        finally:
+            cursor.close()
+
+
+def get_pool(app=None):
+    app = app or current_app
+    return app.extensions['db_pool']
+
+
+def get_db():
+    """Connection bound to the current app context, released on teardown."""
+    if 'db' not in g:
+        g.db = get_pool().acquire()
+    return g.db
+
+
+def close_db(exception=None):
+    con = g.pop('db', None)
+    if con is not None:
+        get_pool().release(con)
+
+
+def next_change_watermark(con, overlap):
+    """`updated` value the next incremental run should start after.
+
+    Taken before reading, behind any transaction still open on PostgreSQL,
+    and `overlap` seconds in the past, so rows committed while a run reads
+    are picked up by the next one. On SQLite the overlap has to be longer
+    than any write transaction.
+    """
+    now = con.execute(f"SELECT {get_pool().COMMITTED_BEFORE}").fetchone()[0]
+    return (datetime.fromisoformat(now) - timedelta(seconds=overlap)).isoformat(' ', 'milliseconds')
+
+
+def create_pool(config):
+    backend = config['DATABASE_BACKEND']
+    if backend == 'sqlite':
+        return ConnectionPool(
+            config['SQLITE_DATABASE'],
+            size=config['SQLITE_POOL_SIZE'],
+            pragmas=config['SQLITE_PRAGMAS'],
+            relaxed_pragmas=config['SQLITE_RELAXED_PRAGMAS'],
+            cached_statements=config['SQLITE_CACHED_STATEMENTS'],
+        )
+    if backend == 'postgresql':
+        return PostgresPool(config['DATABASE_URI'], size=config['POSTGRES_POOL_SIZE'])
+    raise ValueError(f'Unknown DATABASE_BACKEND: {backend}')
+
+
+def init_app(app):
+    pool = app.extensions.get('db_pool')
+    if pool is not None:
+        pool.close_all()
+
+    app.extensions['db_pool'] = create_pool(app.config)
+    if close_db not in app.teardown_appcontext_funcs:
+        app.teardown_appcontext(close_db)
@@ -0,0 +1,125 @@
+"""Liveness and readiness endpoints for load balancers and orchestrators.
+
+`/health/live` only proves the worker answers requests and never touches
+the database. `/health/ready` checks the database through the worker's
+pooled connection, but at most once per HEALTH_CHECK_INTERVAL seconds;
+probes in between get the cached result, so frequent probes cost almost
+nothing.
+"""
+import os
+import threading
+import time
+
+from flask import current_app, jsonify
+
+from app.bloom import get_ark_filter
+from app.cache import get_resolution_cache
+from app.db import get_db, get_pool
+from app.resolution_stats import get_hit_counter
+from app.resolver_index import get_resolver_index
+
+REQUIRED_TABLES = ('naan', 'shoulder', 'ark')
+
+_started = time.monotonic()
+_requests = 0
+_requests_lock = threading.Lock()
+
+
+def _count_request():
+    global _requests
+    with _requests_lock:
+        _requests += 1
+
+
+def worker_stats():
+    """What this worker process has been doing, without touching the database."""
+    shoulder_index = current_app.extensions['shoulder_index']
+    stats = {
+        'pid': os.getpid(),
+        'uptime': round(time.monotonic() - _started, 1),
+        'requests': _requests,
+        'db_pool': get_pool().stats(),
+        'resolver_cache': get_resolution_cache().stats(),
+        'shoulder_index': shoulder_index.stats(),
+    }
+    if resolver_index := get_resolver_index():
+        stats['resolver_index'] = resolver_index.stats()
+    if ark_filter := get_ark_filter():
+        stats['bloom_filter'] = ark_filter.stats()
+    if hit_counter := get_hit_counter():
+        stats['resolution_stats'] = hit_counter.stats()
+    return stats
+
+
+def check_database():
+    """(ok, details) of a query against the expected tables."""
+    pool = get_pool()
+    start = time.perf_counter()
+    try:
+        con = get_db()
+        tables = set(pool.table_names(con))
+    except pool.Error as e:
+        return False, {'error': str(e)}
+
+    details = {'backend': pool.backend, 'latency_ms': round((time.perf_counter() - start) * 1000, 3)}
+    missing = [table for table in REQUIRED_TABLES if table not in tables]
+    if missing:
+        details['missing_tables'] = missing
+        return False, details
+    return True, details
+
+
+class ReadinessCheck(object):
+    """Runs check_database at most every `interval` seconds per worker."""
+
+    def __init__(self, interval=5):
+        self.interval = interval
+        self._result = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """(ok, details, age in seconds)."""
+        with self._lock:
+            now = time.monotonic()
+            if self._checked_at is None or now - self._checked_at >= self.interval:
+                self._result = check_database()
+                self._checked_at = now
+            ok, details = self._result
+            return ok, details, now - self._checked_at
+
+
+def live():
+    return jsonify({'status': 'alive', 'pid': os.getpid()}), 200
+
+
+def ready():
+    ok, details, age = current_app.extensions['readiness_check'].get()
+    return jsonify({
+        'status': 'ready' if ok else 'unavailable',
+        'database': details,
+        'checked_seconds_ago': round(age, 3),
+        'worker': worker_stats(),
+    }), 200 if ok else 503
+
+
+def health():
+    """Combined check kept for existing monitors, same cached result as /health/ready."""
+    ok, details, _ = current_app.extensions['readiness_check'].get()
+    body = {
+        'status': 'healthy' if ok else 'unhealthy',
+        'resolver_cache': get_resolution_cache().stats(),
+    }
+    if not ok:
+        body['error'] = details.get('error') or f"missing tables: {', '.join(details['missing_tables'])}"
+    return jsonify(body), 200 if ok else 503
+
+
+def init_app(app):
+    app.extensions['readiness_check'] = ReadinessCheck(interval=app.config['HEALTH_CHECK_INTERVAL'])
+    if _count_request not in app.before_request_funcs.get(None, []):
+        app.before_request(_count_request)
+    if 'health' not in app.view_functions:
+        app.add_url_rule('/health', 'health', health)
+        app.add_url_rule('/health/live', 'health_live', live)
+        app.add_url_rule('/health/ready', 'health_ready', ready)
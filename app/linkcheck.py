@@ -0,0 +1,246 @@
+"""Target URL checks for `flask ark-linkcheck`.
+
+LinkChecker probes URLs concurrently on one asyncio event loop with a small
+HTTP/1.1 client on asyncio streams (no third-party dependency). Per host,
+at most `per_host` requests run at once and request starts are at least
+`delay` seconds apart. Each of these per-host workers keeps one keep-alive
+connection for its HEAD requests. A HEAD the server refuses (405, 501) is
+retried as a GET that reads only the response head, and redirects are
+followed up to `max_redirects`.
+
+Results are stored in the `link_check` table (alembic revision 0006), one
+row per ARK. The CLI writes them in batches, so an interrupted run keeps
+what it checked, and the next run skips links checked recently for the
+same URL.
+"""
+import asyncio
+import collections
+import ssl
+import time
+import urllib.parse
+
+# a result is a tuple of these, `checked` is set by the database
+RESULT_COLUMNS = ('identifier', 'url', 'status', 'error', 'final_url', 'latency_ms')
+
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+# HEAD not allowed / not implemented: ask again with GET
+HEAD_REFUSED_STATUSES = {405, 501}
+USER_AGENT = 'ark-tools-linkcheck/1.0'
+# characters left alone when quoting a request target
+URL_SAFE = "!#$%&'()*+,/:;=?@[]~"
+
+
+class LinkCheckError(Exception):
+    pass
+
+
+def host_key(url):
+    """(scheme, host, port) of an http(s) URL, None for anything else."""
+    try:
+        parts = urllib.parse.urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return None
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        return None
+    return parts.scheme, parts.hostname.lower(), port or (443 if parts.scheme == 'https' else 80)
+
+
+async def read_response_head(reader):
+    """(version, status, {lowercase header: value}) of an HTTP response."""
+    line = await reader.readline()
+    if not line:
+        raise ConnectionResetError('connection closed by the server')
+    parts = line.decode('latin-1').split(None, 2)
+    if len(parts) < 2 or not parts[0].startswith('HTTP/') or not parts[1].isdigit():
+        raise LinkCheckError(f'bad status line {line[:40]!r}')
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return parts[0], int(parts[1]), headers
+
+
+class Connection(object):
+    def __init__(self, key, reader, writer):
+        self.key = key
+        self.reader = reader
+        self.writer = writer
+
+    def close(self):
+        self.writer.close()
+
+
+class Host(object):
+    """Links waiting for one host, and when the next request may start."""
+
+    def __init__(self):
+        self.queue = collections.deque()
+        self.workers = 0
+        self.next_start = 0.0
+
+
+class LinkChecker(object):
+    def __init__(self, concurrency=100, per_host=4, delay=0.1, timeout=10.0, max_redirects=5,
+                 user_agent=USER_AGENT, max_pending=10000):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.delay = delay
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        self.user_agent = user_agent
+        self.max_pending = max_pending
+        self._ssl = ssl.create_default_context()
+        self._hosts = {}
+
+    async def run(self, rows, handle):
+        """Check the URLs of (identifier, url) `rows`; handle(result) each.
+
+        `rows` may be a lazy iterator (a database cursor): at most
+        `max_pending` links are read ahead of the checks.
+        """
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._pending = asyncio.Semaphore(self.max_pending)
+        tasks = set()
+        for identifier, url in rows:
+            key = host_key(url)
+            if key is None:
+                handle((identifier, url, None, 'not an http(s) URL', None, None))
+                continue
+
+            await self._pending.acquire()
+            host = self._hosts.get(key)
+            if host is None:
+                host = self._hosts[key] = Host()
+            host.queue.append((identifier, url))
+            if host.workers < self.per_host:
+                host.workers += 1
+                task = asyncio.create_task(self._drain(key, host, handle))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+        while tasks:
+            await asyncio.gather(*tasks)
+
+    async def _drain(self, key, host, handle):
+        """One of up to `per_host` workers checking the links of a host."""
+        session = {'key': key, 'conn': None}
+        try:
+            while host.queue:
+                identifier, url = host.queue.popleft()
+                now = time.monotonic()
+                start = max(now, host.next_start)
+                host.next_start = start + self.delay
+                if start > now:
+                    await asyncio.sleep(start - now)
+                async with self._slots:
+                    result = await self._check(identifier, url, session)
+                handle(result)
+                self._pending.release()
+        finally:
+            host.workers -= 1
+            if session['conn'] is not None:
+                session['conn'].close()
+
+    async def _check(self, identifier, url, session):
+        start = time.monotonic()
+        status = error = None
+        target = url
+        try:
+            status, target, error = await asyncio.wait_for(self._follow(url, session), self.timeout)
+        except asyncio.TimeoutError:
+            error = 'timeout'
+        except (OSError, ValueError, LinkCheckError) as e:
+            error = str(e) or type(e).__name__
+        if error and session['conn'] is not None:
+            # possibly mid-response: don't reuse it
+            session['conn'].close()
+            session['conn'] = None
+        latency_ms = round((time.monotonic() - start) * 1000, 1)
+        return (identifier, url, status, error, target if target != url else None, latency_ms)
+
+    async def _follow(self, url, session):
+        """(status, url, error) of the last response, after following redirects."""
+        for _ in range(self.max_redirects + 1):
+            status, location = await self._fetch(url, session)
+            if status not in REDIRECT_STATUSES or not location:
+                return status, url, None
+            url = urllib.parse.urljoin(url, location)
+        return status, url, 'too many redirects'
+
+    async def _fetch(self, url, session):
+        """(status, Location header) of HEAD `url`, or of GET if HEAD is refused."""
+        key = host_key(url)
+        if key is None:
+            raise LinkCheckError(f'redirected to {url[:100]}')
+
+        if key != session['key']:
+            # a redirect to another host: one-off connection
+            status, location = await self._request_once(key, 'HEAD', url)
+        else:
+            status, location = await self._request_reusing(session, url)
+        if status in HEAD_REFUSED_STATUSES:
+            status, location = await self._request_once(key, 'GET', url)
+        return status, location
+
+    async def _request_reusing(self, session, url):
+        # a kept connection may have been closed by the server while idle:
+        # then reconnect once
+        for _ in range(2):
+            conn = session['conn']
+            fresh = conn is None
+            if fresh:
+                conn = session['conn'] = await self._open(session['key'])
+            try:
+                status, location, reusable = await self._request(conn, 'HEAD', url, keep_alive=True)
+            except ConnectionError:
+                conn.close()
+                session['conn'] = None
+                if fresh:
+                    raise
+                continue
+            if not reusable:
+                conn.close()
+                session['conn'] = None
+            return status, location
+        raise ConnectionResetError('connection closed by the server')
+
+    async def _request_once(self, key, method, url):
+        conn = await self._open(key)
+        try:
+            status, location, _ = await self._request(conn, method, url, keep_alive=False)
+        finally:
+            conn.close()
+        return status, location
+
+    async def _open(self, key):
+        scheme, host, port = key
+        reader, writer = await asyncio.open_connection(host, port, ssl=self._ssl if scheme == 'https' else None)
+        return Connection(key, reader, writer)
+
+    async def _request(self, conn, method, url, keep_alive):
+        """Send one request, read the response head: (status, location, reusable)."""
+        parts = urllib.parse.urlsplit(url)
+        target = urllib.parse.quote(parts.path or '/', safe=URL_SAFE)
+        if parts.query:
+            target += '?' + urllib.parse.quote(parts.query, safe=URL_SAFE)
+        request = (
+            f'{method} {target} HTTP/1.1\r\n'
+            f'Host: {parts.netloc.rpartition("@")[2]}\r\n'
+            f'User-Agent: {self.user_agent}\r\n'
+            f'Accept: */*\r\n'
+            f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'
+        )
+        conn.writer.write(request.encode('ascii', 'replace'))
+        await conn.writer.drain()
+        version, status, headers = await read_response_head(conn.reader)
+        # a HEAD response has no body, so the connection can take the next request
+        reusable = (
+            keep_alive and method == 'HEAD' and version != 'HTTP/1.0'
+            and headers.get('connection', '').lower() != 'close'
+        )
+        return status, headers.get('location'), reusable
@@ -0,0 +1,113 @@
+"""Prometheus metrics.
+
+With several gunicorn workers, set PROMETHEUS_MULTIPROC_DIR (gunicorn_conf.py
+does) so every worker writes its samples there and /metrics aggregates
+all of them, whichever worker answers the scrape.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+
+from app.tracing import record_query
+
+REQUEST_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5)
+QUERY_BUCKETS = (.0001, .00025, .0005, .001, .0025, .005, .01, .025, .05, .1, .25, 1)
+
+REQUESTS = Counter(
+    'ark_http_requests_total',
+    'HTTP requests by route and outcome',
+    ['route', 'outcome'],
+)
+REQUEST_LATENCY = Histogram(
+    'ark_http_request_duration_seconds',
+    'HTTP request latency by route and outcome',
+    ['route', 'outcome'],
+    buckets=REQUEST_BUCKETS,
+)
+QUERY_LATENCY = Histogram(
+    'ark_db_query_duration_seconds',
+    'Database query latency by query',
+    ['query'],
+    buckets=QUERY_BUCKETS,
+)
+MINT_RETRIES = Counter(
+    'ark_mint_retries_total',
+    'Extra identifier candidates generated after a collision',
+    ['endpoint'],
+)
+GROUP_COMMIT_ROWS = Histogram(
+    'ark_mint_group_commit_rows',
+    'Mints committed per group-commit transaction',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+MINT_COLLISIONS = Counter(
+    'ark_mint_collisions_total',
+    'Identifier candidates that already existed',
+    ['endpoint'],
+)
+
+
+@contextmanager
+def observe_query(name, sql=None, params=None):
+    """Time the enclosed database work as query `name`.
+
+    Also a span of the request's trace (see app.tracing); `sql` and
+    `params` let the slow-request log show the query plan.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        QUERY_LATENCY.labels(name).observe(duration)
+        record_query(name, start, duration, sql, params)
+
+
+def set_outcome(outcome):
+    """Label the current request's outcome (defaults to the status code)."""
+    g.metrics_outcome = outcome
+
+
+def _start_timer():
+    g.metrics_start = time.perf_counter()
+
+
+def _record_request(response):
+    start = g.pop('metrics_start', None)
+    if start is None:
+        return response
+
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    outcome = g.pop('metrics_outcome', None) or str(response.status_code)
+    REQUESTS.labels(route, outcome).inc()
+    REQUEST_LATENCY.labels(route, outcome).observe(time.perf_counter() - start)
+    return response
+
+
+def metrics():
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_app(app):
+    if not app.config['METRICS_ENABLED']:
+        return
+
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+    app.add_url_rule('/metrics', 'metrics', metrics)
@@ -0,0 +1,269 @@
+import hashlib
+import os
+import queue
+import threading
+import time
+
+from flask import current_app
+
+from app.db import get_pool
+from app.metrics import GROUP_COMMIT_ROWS, QUERY_LATENCY
+from app.noid import NamespaceExhausted
+
+def reserve_counter(con, naan, shoulder, template, count, capacity=None, needed=1):
+    """Atomically reserve counter values, return the range (start, end).
+
+    Reserves `count` values but never moves the counter past `capacity`;
+    once fewer than two blocks of `count` are left, only the `needed`
+    values are taken, so the end of a bounded namespace isn't stranded in
+    one worker's block. start == end when the namespace is exhausted.
+
+    The counter row is created on first use; the reservation is its own
+    transaction, the first UPDATE locks the row until the commit.
+    """
+    insert_sql = get_pool().insert_sql(
+        'minter_counter', ('naan', 'shoulder', 'template', 'value'), ('?', '?', '?', '0'), on_conflict='ignore'
+    )
+    key = (naan, shoulder, template)
+    where = 'naan = ? AND shoulder = ? AND template = ?'
+    with con:
+        con.execute(insert_sql, key)
+        res = con.execute(f'UPDATE minter_counter SET value = value WHERE {where} RETURNING value', key)
+        start = res.fetchone()[0]
+        end = start + count
+        if capacity is not None:
+            if capacity - start < 2 * count:
+                end = start + needed
+            end = max(start, min(end, capacity))
+        if end > start:
+            con.execute(f'UPDATE minter_counter SET value = ? WHERE {where}', (end,) + key)
+    return start, end
+
+
+def read_counter(con, naan, shoulder, template):
+    res = con.execute(
+        'SELECT value FROM minter_counter WHERE naan = ? AND shoulder = ? AND template = ?',
+        (naan, shoulder, template)
+    )
+    row = res.fetchone()
+    return row[0] if row else 0
+
+
+class CounterBlocks(object):
+    """Per-worker blocks of counter values reserved from minter_counter.
+
+    Each worker reserves `block_size` values in one transaction and hands
+    them out from memory, so sequential minting touches the counter row
+    once per block. Values left in a block when the worker exits are
+    skipped, never reused. Near the end of a bounded namespace blocks
+    shrink to single values (see reserve_counter), but values still left
+    in other workers' blocks are not handed out: a worker can answer 409
+    while others still hold the rest of their last full block.
+    """
+
+    def __init__(self, block_size=100):
+        self.block_size = block_size
+        self._blocks = {}
+        self._lock = threading.Lock()
+
+    def take(self, con, naan, shoulder, template, count=1, capacity=None):
+        """Return a list of `count` unused counter values.
+
+        Raises NamespaceExhausted once the counter has reached `capacity`
+        (None for unbounded templates).
+        """
+        key = (naan, shoulder, template)
+        taken = []
+        needed = count
+        with self._lock:
+            # (start, end) ranges reserved but not handed out yet
+            ranges = self._blocks.setdefault(key, [])
+            while needed:
+                if not ranges:
+                    start, end = reserve_counter(
+                        con, naan, shoulder, template, max(self.block_size, needed), capacity, needed
+                    )
+                    if start >= end:
+                        # a batch that doesn't fit leaves its values to later mints
+                        ranges[:0] = taken
+                        raise NamespaceExhausted(f'Template exhausted after {capacity} identifiers')
+                    ranges.append((start, end))
+
+                start, end = ranges[0]
+                n = min(end - start, needed)
+                taken.append((start, start + n))
+                if start + n < end:
+                    ranges[0] = (start + n, end)
+                else:
+                    del ranges[0]
+                needed -= n
+        return [value for start, end in taken for value in range(start, end)]
+
+
+class PendingWrite(object):
+    """One statement waiting in a GroupCommitWriter.
+
+    `state` goes from 'queued' to either 'started' (taken into a
+    transaction by the writer) or 'cancelled' (given up by the request),
+    whichever claims it first.
+    """
+
+    def __init__(self, sql, params):
+        self.sql = sql
+        self.params = params
+        self.inserted = None
+        self.error = None
+        self.done = threading.Event()
+        self.state = 'queued'
+        self._lock = threading.Lock()
+
+    def claim(self, state):
+        """Move from 'queued' to `state`; False if already claimed."""
+        with self._lock:
+            if self.state != 'queued':
+                return False
+            self.state = state
+            return True
+
+
+class GroupCommitWriter(object):
+    """Commits the inserts of concurrent requests in shared transactions.
+
+    A background thread with its own connection takes the first waiting
+    insert, collects more for up to `max_wait` seconds or `max_rows` rows,
+    runs them in one transaction and only then wakes the requests up, so a
+    reply still means the row is committed. Statements should be
+    `INSERT ... ON CONFLICT DO NOTHING` style (on_conflict='ignore'): a
+    conflicting row is reported back instead of failing its neighbours.
+
+    Only requests served concurrently by the same process are grouped, so
+    it pays off with threaded workers (GUNICORN_THREADS).
+    """
+
+    def __init__(self, pool, max_rows=100, max_wait=0.002, timeout=30):
+        self.pool = pool
+        self.max_rows = max_rows
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def insert(self, sql, params):
+        """Insert one row; True once committed, False if it already existed.
+
+        Raises TimeoutError if the writer has not started on the row after
+        `timeout` seconds; the row is then dropped from the queue, so it is
+        never written. A row already in a transaction is waited for.
+        """
+        self._start()
+        pending = PendingWrite(sql, params)
+        self._queue.put(pending)
+        if not pending.done.wait(self.timeout):
+            if pending.claim('cancelled'):
+                raise TimeoutError('Group commit did not start in time')
+            pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.inserted
+
+    def _start(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                # forked: the parent's thread doesn't exist here
+                self._queue = queue.Queue()
+                self._thread = threading.Thread(target=self._run, name='group-commit', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_rows:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        con = None
+        while True:
+            batch = [pending for pending in self._collect() if pending.claim('started')]
+            if not batch:
+                continue
+            start = time.perf_counter()
+            try:
+                if con is None:
+                    con = self.pool.connect()
+                with con:
+                    for pending in batch:
+                        pending.inserted = con.execute(pending.sql, pending.params).rowcount > 0
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+                if con is not None:
+                    con.close()
+                    con = None
+            finally:
+                QUERY_LATENCY.labels('mint_group_commit').observe(time.perf_counter() - start)
+                GROUP_COMMIT_ROWS.observe(len(batch))
+                for pending in batch:
+                    pending.done.set()
+
+
+def get_counter_blocks():
+    return current_app.extensions['counter_blocks']
+
+
+def get_group_writer():
+    """The worker's GroupCommitWriter, or None when MINT_GROUP_COMMIT is off."""
+    return current_app.extensions['group_writer']
+
+
+def init_app(app):
+    app.extensions['counter_blocks'] = CounterBlocks(block_size=app.config['MINT_COUNTER_BLOCK'])
+    app.extensions['group_writer'] = None
+    if app.config['MINT_GROUP_COMMIT']:
+        app.extensions['group_writer'] = GroupCommitWriter(
+            get_pool(app),
+            max_rows=app.config['MINT_GROUP_COMMIT_ROWS'],
+            max_wait=app.config['MINT_GROUP_COMMIT_WAIT_MS'] / 1000,
+        )
+
+
+def permutation_key(secret, naan, shoulder, template):
+    """Per-shoulder key for `permute`, derived from the configured secret."""
+    secret = hashlib.sha256(secret.encode()).digest()
+    return hashlib.blake2b(f'{naan}/{shoulder}/{template}'.encode(), key=secret, digest_size=32).digest()
+
+
+def permute(value, capacity, key, rounds=4):
+    """Keyed bijection of [0, capacity) onto itself.
+
+    A balanced Feistel network over the smallest even number of bits that
+    covers `capacity`, with cycle-walking to stay inside the range (fewer
+    than four walks on average). Distinct counter values therefore map to
+    distinct, random-looking values without any lookup.
+    """
+    if value >= capacity:
+        raise NamespaceExhausted(f'Template exhausted after {capacity} identifiers')
+
+    half = max(1, ((capacity - 1).bit_length() + 1) // 2)
+    mask = (1 << half) - 1
+    width = (half + 7) // 8
+    digest_size = min(64, max(8, width))
+
+    x = value
+    while True:
+        left, right = x >> half, x & mask
+        for r in range(rounds):
+            digest = hashlib.blake2b(right.to_bytes(width, 'big') + bytes([r]), key=key, digest_size=digest_size).digest()
+            left, right = right, left ^ (int.from_bytes(digest, 'big') & mask)
+        x = (left << half) | right
+        if x < capacity:
+            return x
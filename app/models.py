@@ -1,5 +1,7 @@
 from sqlalchemy import (
+    BigInteger,
     Column,
+    Float,
     Integer,
     Numeric,
     String,
@@ -8,9 +10,12 @@ from sqlalchemy import (
     Date,
     Boolean,
     ForeignKey,
+    ForeignKeyConstraint,
+    Index,
     Table,
     desc,
     select,
+    text,
 )
 
 from app.database import (
@@ -20,13 +25,25 @@ from app.database import (
 )
 
 
-class Ark(Base):
+class Ark(Base, TimestampMixin):
     __tablename__ = 'ark'
+    __table_args__ = (
+        ForeignKeyConstraint(['naan', 'shoulder'], ['shoulder.naan', 'shoulder.shoulder']),
+        Index('ix_ark_shoulder', 'shoulder', 'identifier', 'naan'),
+        Index('ix_ark_updated', 'updated'),
+        # PostgreSQL full-text search (app/search.py); SQLite uses FTS5 instead
+        Index(
+            'ix_ark_search',
+            text("""to_tsvector('simple', coalesce(who, '') || ' ' || coalesce(what, '') || ' ' || coalesce("when", ''))"""),
+            postgresql_using='gin',
+        ).ddl_if(dialect='postgresql'),
+        {'sqlite_with_rowid': False},
+    )
 
     identifier = Column(String(100), primary_key=True, autoincrement=False) # {naan}/{shoulder}{assigned_name}
     naan = Column(Integer, ForeignKey('naan.naan'))
     assigned_name = Column(String(1000))
-    shoulder = Column(String(20), ForeignKey('shoulder.shoulder'))
+    shoulder = Column(String(20))
     url = Column(String(1000))
     who = Column(String(500))
     what = Column(String(500))
@@ -42,10 +59,47 @@ class Naan(Base, TimestampMixin):
 
 class Shoulder(Base, TimestampMixin):
     __tablename__ = 'shoulder'
+    __table_args__ = {'sqlite_with_rowid': False}
 
+    naan = Column(Integer, ForeignKey('naan.naan'), primary_key=True, autoincrement=False)
     shoulder = Column(String(50), primary_key=True, autoincrement=False)
-    naan = Column(Integer, ForeignKey('naan.naan'))
     name = Column(String(500))
     description = Column(Text)
     redirect_prefix = Column(String(1000))
     template = Column(String(50), default='.reedede')
+
+class MinterCounter(Base):
+    __tablename__ = 'minter_counter'
+
+    naan = Column(Integer, primary_key=True, autoincrement=False)
+    shoulder = Column(String(50), primary_key=True, autoincrement=False)
+    template = Column(String(50), primary_key=True, autoincrement=False)
+    value = Column(BigInteger, nullable=False, default=0, server_default='0') # next unreserved value
+
+class ResolutionStats(Base):
+    __tablename__ = 'resolution_stats'
+
+    day = Column(Text, primary_key=True) # UTC, YYYY-MM-DD
+    identifier = Column(Text, primary_key=True)
+    naan = Column(Integer)
+    shoulder = Column(Text)
+    hits = Column(Integer, nullable=False, default=0, server_default='0')
+
+class ShoulderResolutionStats(Base):
+    __tablename__ = 'shoulder_resolution_stats'
+
+    day = Column(Text, primary_key=True)
+    naan = Column(Integer, primary_key=True, autoincrement=False)
+    shoulder = Column(Text, primary_key=True)
+    hits = Column(Integer, nullable=False, default=0, server_default='0') # shoulder fallbacks
+
+class LinkCheck(Base):
+    __tablename__ = 'link_check'
+
+    identifier = Column(Text, primary_key=True)
+    url = Column(Text) # as checked
+    status = Column(Integer)
+    error = Column(Text)
+    final_url = Column(Text)
+    latency_ms = Column(Float)
+    checked = Column(DateTime)
@@ -0,0 +1,217 @@
+"""NOID templates, generation and NCDA check digits.
+
+Template parsing is done once per template string: `compile_template`
+returns a cached CompiledTemplate holding the per-position alphabets and
+an ordinal lookup table, and remembers the NCDA weighted sum of each
+`naan/shoulder` it has seen, so generating or validating an identifier
+only processes its own characters.
+"""
+import functools
+import os
+import secrets
+
+# NOID character sets
+DIGIT_CHARS = '0123456789'
+EXTENDED_CHARS = '0123456789bcdfghjkmnpqrstvwxz'  # 29 chars (radix)
+
+# NCDA ordinal of each extended character; anything else counts as 0
+ORDINALS = {c: i for i, c in enumerate(EXTENDED_CHARS)}
+
+
+class NamespaceExhausted(ValueError):
+    """A bounded template has no identifiers left."""
+
+
+def ncda_sum(s, start=1):
+    """Weighted NCDA sum of `s`, first character at position `start`."""
+    return sum(i * ORDINALS.get(c, 0) for i, c in enumerate(s, start=start))
+
+
+def noid_check_digit(s):
+    """Calculate NOID check digit using NCDA algorithm."""
+    return EXTENDED_CHARS[ncda_sum(s) % len(EXTENDED_CHARS)]
+
+
+def parse_noid_template(template):
+    """Parse NOID template into prefix and mask.
+
+    Template format: prefix.mask
+    Mask starts with generator type (r=random, s=sequential, z=unlimited)
+    followed by: d (digit), e (extended digit), k (check digit at end)
+
+    Example: .reeeeee -> prefix='', generator='r', mask='eeeeee'
+    """
+    if '.' in template:
+        prefix, mask = template.split('.', 1)
+    else:
+        prefix, mask = '', template
+
+    if not mask:
+        raise ValueError('Template mask is required')
+
+    generator = mask[0]
+    if generator not in 'rsz':
+        raise ValueError(f'Invalid generator type: {generator}')
+
+    pattern = mask[1:]
+    has_check = pattern.endswith('k')
+    if has_check:
+        pattern = pattern[:-1]
+
+    for c in pattern:
+        if c not in 'de':
+            raise ValueError(f'Invalid mask character: {c}')
+
+    return {
+        'prefix': prefix,
+        'generator': generator,
+        'pattern': pattern,
+        'has_check': has_check,
+    }
+
+
+def pattern_capacity(pattern):
+    """Number of distinct values a mask pattern can hold."""
+    capacity = 1
+    for c in pattern:
+        capacity *= len(DIGIT_CHARS) if c == 'd' else len(EXTENDED_CHARS)
+    return capacity
+
+
+class CompiledTemplate(object):
+    """A parsed NOID template ready for repeated generation and validation."""
+
+    def __init__(self, template):
+        parsed = parse_noid_template(template)
+        self.template = template
+        self.prefix = parsed['prefix']
+        self.generator = parsed['generator']
+        self.pattern = parsed['pattern']
+        self.has_check = parsed['has_check']
+        self.alphabets = tuple(DIGIT_CHARS if c == 'd' else EXTENDED_CHARS for c in self.pattern)
+        self.capacity = pattern_capacity(self.pattern)
+        # random bytes per identifier: enough for the namespace plus 64 bits
+        # so the modulo bias of bulk draws is negligible
+        self._random_bytes = (self.capacity.bit_length() + 7) // 8 + 8
+        self._base_sums = {}
+
+    @property
+    def sequential(self):
+        return self.generator in 'sz'
+
+    def encode(self, n):
+        """Encode value `n` in the mask, most significant position first.
+
+        A bounded mask raises NamespaceExhausted once `n` is out of range;
+        an unlimited ('z') mask grows by repeating its first character, as
+        NOID does.
+        """
+        alphabets = self.alphabets
+        capacity = self.capacity
+        if n >= capacity:
+            if self.generator != 'z' or not alphabets:
+                raise NamespaceExhausted(f'Template exhausted after {capacity} identifiers')
+            while n >= capacity:
+                alphabets = (alphabets[0],) + alphabets
+                capacity *= len(alphabets[0])
+
+        chars = []
+        for alphabet in reversed(alphabets):
+            n, i = divmod(n, len(alphabet))
+            chars.append(alphabet[i])
+        chars.reverse()
+        return ''.join(chars)
+
+    def base_sum(self, naan, shoulder):
+        """(NCDA sum, length) of `naan/shoulder` + template prefix, cached."""
+        key = (naan, shoulder)
+        if key not in self._base_sums:
+            head = f'{naan}/{shoulder}{self.prefix}'
+            self._base_sums[key] = (ncda_sum(head), len(head))
+        return self._base_sums[key]
+
+    def check_char(self, naan, shoulder, body):
+        """Check character for `body` (the part after the template prefix)."""
+        total, length = self.base_sum(naan, shoulder)
+        total += ncda_sum(body, start=length + 1)
+        return EXTENDED_CHARS[total % len(EXTENDED_CHARS)]
+
+    def _finish(self, body, naan, shoulder):
+        if self.has_check:
+            return f'{self.prefix}{body}{self.check_char(naan, shoulder, body)}'
+        return f'{self.prefix}{body}'
+
+    def generate(self, naan='', shoulder='', sequence=None):
+        """Generate one NOID (without shoulder).
+
+        With a counter value `sequence` the value is encoded in the mask
+        (required for sequential 's' and 'z' templates, used by permuted
+        random minting); otherwise a random value is drawn.
+        """
+        if sequence is None:
+            if self.sequential:
+                raise ValueError('Sequential templates need a counter value')
+            sequence = secrets.randbelow(self.capacity)
+        return self._finish(self.encode(sequence), naan, shoulder)
+
+    def generate_many(self, count, naan='', shoulder=''):
+        """Generate `count` random NOIDs from a single draw of random bytes."""
+        if self.sequential:
+            raise ValueError('Sequential templates need a counter value')
+
+        width = self._random_bytes
+        data = os.urandom(width * count)
+        return [
+            self._finish(self.encode(int.from_bytes(data[i:i + width], 'big') % self.capacity), naan, shoulder)
+            for i in range(0, width * count, width)
+        ]
+
+    def validate(self, name, naan='', shoulder=''):
+        """Validate `name` (assigned name without shoulder).
+
+        Returns (is_valid, expected_check, actual_check) for templates with
+        check digit, (True, None, None) otherwise.
+        """
+        if not self.has_check:
+            return (True, None, None)
+
+        if not name:
+            return (False, None, None)
+
+        actual = name[-1]
+        if len(name) <= len(self.prefix) or not name.startswith(self.prefix):
+            # not produced by this template; fall back to the full string
+            expected = noid_check_digit(f'{naan}/{shoulder}{name[:-1]}')
+        else:
+            expected = self.check_char(naan, shoulder, name[len(self.prefix):-1])
+        return (actual == expected, expected, actual)
+
+
+@functools.lru_cache(maxsize=256)
+def compile_template(template):
+    """Cached CompiledTemplate for `template`; raises ValueError if invalid."""
+    return CompiledTemplate(template)
+
+
+def generate_noid(template, naan='', shoulder='', sequence=None):
+    """Generate a NOID identifier based on template.
+
+    The check digit (if template has 'k') is calculated on full ARK: naan/shoulder+random.
+    Returns only the random part (without shoulder).
+    """
+    return compile_template(template).generate(naan, shoulder, sequence)
+
+
+def validate_noid(assigned_name, template, naan='', shoulder=''):
+    """Validate a NOID against its template.
+
+    The check digit is calculated on the full ARK: naan/shoulder+random.
+
+    Returns (is_valid, expected_check, actual_check) for templates with check digit.
+    Returns (True, None, None) for templates without check digit.
+    """
+    try:
+        compiled = compile_template(template)
+    except ValueError:
+        return (False, None, None)
+    return compiled.validate(assigned_name, naan, shoulder)
@@ -0,0 +1,66 @@
+"""Redirect status and HTTP caching headers for resolver responses.
+
+REDIRECT_POLICIES maps a NAAN (`"18474"`) or a NAAN and shoulder
+(`"18474/b2"`) to `{"status": 301|302|303|307|308, "max_age": seconds}`;
+the most specific entry wins, anything unset falls back to
+REDIRECT_STATUS / REDIRECT_MAX_AGE. ETag and Last-Modified come from the
+target and the row's `updated` time, so caches (browsers, nginx
+proxy_cache, CDNs) can revalidate with a cheap 304.
+"""
+import hashlib
+from datetime import datetime, timezone
+
+from flask import Response, current_app, redirect, request
+from werkzeug.http import is_resource_modified
+
+
+def redirect_policy(naan, shoulder):
+    """(status, max_age) for redirects under `naan` / `shoulder`."""
+    config = current_app.config
+    policies = config['REDIRECT_POLICIES']
+    policy = dict(policies.get(str(naan), {}))
+    if shoulder:
+        policy.update(policies.get(f'{naan}/{shoulder}', {}))
+    return (
+        int(policy.get('status', config['REDIRECT_STATUS'])),
+        int(policy.get('max_age', config['REDIRECT_MAX_AGE'])),
+    )
+
+
+def parse_updated(updated):
+    """`updated` column value (UTC text) as an aware datetime, or None."""
+    if not updated:
+        return None
+    try:
+        return datetime.fromisoformat(str(updated)).replace(tzinfo=timezone.utc, microsecond=0)
+    except ValueError:
+        return None
+
+
+def redirect_response(naan, shoulder, location, updated=None):
+    """Redirect to `location` with the policy's status and caching headers.
+
+    Answers 304 when the request's If-None-Match / If-Modified-Since still
+    match, and skips the HTML body for HEAD.
+    """
+    status, max_age = redirect_policy(naan, shoulder)
+    etag = hashlib.blake2b(f'{status} {location} {updated or ""}'.encode(), digest_size=8).hexdigest()
+    last_modified = parse_updated(updated)
+
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = Response(status=304)
+    elif request.method == 'HEAD':
+        response = Response(status=status, headers={'Location': location})
+    else:
+        response = redirect(location, status)
+
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    if max_age > 0:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    else:
+        # cacheable, but only after revalidating with ETag / Last-Modified
+        response.cache_control.no_cache = True
+    return response
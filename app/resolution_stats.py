@@ -0,0 +1,180 @@
+"""Per-ARK, per-day resolution counts.
+
+The resolver only increments an in-memory counter. A background thread in
+each worker adds the counts to the `resolution_stats` table every
+RESOLUTION_STATS_INTERVAL seconds, in one transaction of upserts, so the
+hot path never waits for a write. Counts not yet flushed when a worker is
+killed are lost; a failed flush is retried with the next one.
+
+Shoulder fallbacks are counted per shoulder in `shoulder_resolution_stats`:
+any name under a shoulder resolves, so per-name rows would grow with every
+made-up identifier. Both tables come from alembic revision 0005.
+
+Only requests that reach Flask are counted: redirects answered by the
+nginx map or proxy_cache are not.
+"""
+import atexit
+import os
+import threading
+import time
+
+from flask import current_app
+
+from app.db import get_pool
+from app.metrics import QUERY_LATENCY
+
+# the same upserts work on SQLite (3.24+) and PostgreSQL
+UPSERT_SQL = '''
+INSERT INTO resolution_stats (day, identifier, naan, shoulder, hits) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (day, identifier) DO UPDATE SET hits = resolution_stats.hits + excluded.hits
+'''
+SHOULDER_UPSERT_SQL = '''
+INSERT INTO shoulder_resolution_stats (day, naan, shoulder, hits) VALUES (?, ?, ?, ?)
+ON CONFLICT (day, naan, shoulder) DO UPDATE SET hits = shoulder_resolution_stats.hits + excluded.hits
+'''
+
+
+class StatsUnavailable(Exception):
+    pass
+
+
+class HitCounter(object):
+    """A worker's unflushed resolution counts.
+
+    Keyed on (UTC day, identifier, naan, shoulder), identifier None for
+    shoulder fallbacks.
+    """
+
+    def __init__(self, pool, interval=5):
+        self.pool = pool
+        self.interval = interval
+        self.flushed = 0
+        self.failures = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._pid = None
+        self._day = (None, None)
+
+    def hit(self, naan, shoulder, identifier=None):
+        """Count one resolution: of ARK `identifier`, or a shoulder fallback."""
+        self._start()
+        day_number, day = self._day
+        if day_number != (today := int(time.time() // 86400)):
+            day = time.strftime('%Y-%m-%d', time.gmtime(today * 86400))
+            self._day = (today, day)
+        key = (day, identifier, naan, shoulder)
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + 1
+
+    def _start(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                # forked: the parent's thread and counts don't belong to us
+                self._pending = {}
+                threading.Thread(target=self._run, name='resolution-stats', daemon=True).start()
+                atexit.register(self.flush)
+                self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+    def flush(self):
+        """Write the pending counts; on failure keep them for the next flush."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        start = time.perf_counter()
+        con = None
+        arks, shoulders = [], []
+        for (day, identifier, naan, shoulder), hits in pending.items():
+            if identifier is None:
+                shoulders.append((day, naan, shoulder, hits))
+            else:
+                arks.append((day, identifier, naan, shoulder, hits))
+        try:
+            con = self.pool.connect(durable=False)
+            with con:
+                if arks:
+                    con.executemany(UPSERT_SQL, arks)
+                if shoulders:
+                    con.executemany(SHOULDER_UPSERT_SQL, shoulders)
+            self.flushed += len(pending)
+        except Exception:
+            self.failures += 1
+            with self._lock:
+                for key, hits in pending.items():
+                    self._pending[key] = self._pending.get(key, 0) + hits
+        finally:
+            if con is not None:
+                con.close()
+            QUERY_LATENCY.labels('resolution_stats_flush').observe(time.perf_counter() - start)
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {'pending': pending, 'flushed': self.flushed, 'failures': self.failures}
+
+
+def stats_filter(since=None, until=None, naan=None, shoulder=None):
+    """WHERE clause and parameters for the report queries."""
+    conditions, params = [], []
+    for condition, value in (('day >= ?', since), ('day <= ?', until), ('naan = ?', naan), ('shoulder = ?', shoulder)):
+        if value is not None:
+            conditions.append(condition)
+            params.append(value)
+    return (' WHERE ' + ' AND '.join(conditions) if conditions else ''), params
+
+
+def stats_query(con, sql, params):
+    """Rows of a report query; StatsUnavailable before alembic 0005."""
+    try:
+        return con.execute(sql, params).fetchall()
+    except get_pool().Error as e:
+        con.rollback()
+        reason = str(e).strip().splitlines()[0]
+        raise StatsUnavailable(f'Resolution stats unavailable ({reason}), run `alembic upgrade head`')
+
+
+def top_arks(con, limit=100, **filters):
+    """[(identifier, shoulder, hits)] of the most resolved ARKs."""
+    where, params = stats_filter(**filters)
+    return stats_query(
+        con,
+        f'SELECT identifier, shoulder, SUM(hits) AS total FROM resolution_stats{where} '
+        f'GROUP BY identifier, shoulder ORDER BY total DESC, identifier LIMIT ?',
+        params + [limit]
+    )
+
+
+def daily_totals(con, **filters):
+    """[(day, hits, identifiers, shoulder_hits)] per UTC day.
+
+    `hits` includes the `shoulder_hits` of shoulder fallbacks,
+    `identifiers` counts the distinct ARKs resolved.
+    """
+    where, params = stats_filter(**filters)
+    return stats_query(
+        con,
+        f'SELECT day, SUM(hits), SUM(identifiers), SUM(shoulder_hits) FROM ('
+        f'SELECT day, hits, 1 AS identifiers, 0 AS shoulder_hits FROM resolution_stats{where} '
+        f'UNION ALL SELECT day, hits, 0, hits FROM shoulder_resolution_stats{where}'
+        f') AS totals GROUP BY day ORDER BY day',
+        params + params
+    )
+
+
+def get_hit_counter():
+    """The worker's HitCounter, or None when RESOLUTION_STATS is off."""
+    return current_app.extensions['hit_counter']
+
+
+def init_app(app):
+    app.extensions['hit_counter'] = None
+    if app.config['RESOLUTION_STATS']:
+        app.extensions['hit_counter'] = HitCounter(get_pool(app), interval=app.config['RESOLUTION_STATS_INTERVAL'])
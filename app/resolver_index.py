@@ -0,0 +1,331 @@
+"""Read-only, memory-mapped resolver index shared by all workers.
+
+`flask resolver-index` compiles the ark table into one file of sorted
+identifiers. Every worker mmaps the same file, so the operating system's
+page cache holds a single copy however many workers there are. Lookups
+binary-search the mapped keys in place; nothing is loaded or deserialized
+per worker except the string tables and every FENCE-th key.
+
+File layout (little-endian), each section 8-byte aligned:
+
+    header      MAGIC, row count, watermark, (offset, length) per section
+    key_offsets u32 * (count + 1)   into keys
+    keys        identifiers, sorted by their bytes
+    prefix_ids  u32 * count         into strings['prefixes']
+    url_offsets u32 * (count + 1)   into urls (the rest of each url)
+    urls
+    shoulder_ids u16 * count        into strings['shoulders']
+    updated_offsets u32 * (count + 1) into updated
+    updated
+    strings     JSON: interned url prefixes and shoulders
+
+URLs are split after their last '/', and the part before it is interned,
+since most targets of a shoulder share a handful of prefixes.
+
+Rows changed after the build's watermark (new mints, imports) are kept in a
+per-worker delta overlay that is re-read every RESOLVER_INDEX_INTERVAL
+seconds; the resolver still falls back to the database for anything the
+index and overlay don't know, so a fresh mint resolves immediately.
+"""
+import array
+import bisect
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+from flask import current_app
+
+MAGIC = b'ARKIDX01'
+# every FENCE-th key is kept in memory to narrow the binary search
+FENCE = 64
+SECTIONS = (
+    'key_offsets', 'keys', 'prefix_ids', 'url_offsets', 'urls',
+    'shoulder_ids', 'updated_offsets', 'updated', 'strings',
+)
+HEADER = struct.Struct(f'<8sQ32s{2 * len(SECTIONS)}Q')
+INDEX_COLUMNS = ('identifier', 'url', 'shoulder', 'updated')
+
+
+def split_url(url):
+    """(prefix, rest) of `url`, split after its last '/'."""
+    cut = url.rfind('/') + 1
+    return url[:cut], url[cut:]
+
+
+class SectionWriter(object):
+    """Appends one section of the index to its own temporary file."""
+
+    def __init__(self, directory, typecode=None):
+        self.file = tempfile.TemporaryFile(dir=directory)
+        self.typecode = typecode
+        self.buffer = array.array(typecode) if typecode else bytearray()
+        self.length = 0
+
+    def append(self, value):
+        if self.typecode:
+            self.buffer.append(value)
+        else:
+            self.buffer.extend(value)
+        if len(self.buffer) >= 65536:
+            self.flush()
+
+    def flush(self):
+        data = self.buffer.tobytes() if self.typecode else bytes(self.buffer)
+        self.file.write(data)
+        self.length += len(data)
+        del self.buffer[:]
+
+
+def build_resolver_index(rows, path, watermark):
+    """Write the index for `rows` of INDEX_COLUMNS to `path`.
+
+    `rows` must be sorted by the bytes of their identifier (see
+    ConnectionPool.BINARY_COLLATE); ARKs without a url are left out, they
+    resolve through their shoulder. The file is written next to `path` and
+    renamed into place, so workers only ever map a complete index.
+    Returns the number of ARKs written.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    sections = {
+        'key_offsets': SectionWriter(directory, 'I'),
+        'keys': SectionWriter(directory),
+        'prefix_ids': SectionWriter(directory, 'I'),
+        'url_offsets': SectionWriter(directory, 'I'),
+        'urls': SectionWriter(directory),
+        'shoulder_ids': SectionWriter(directory, 'H'),
+        'updated_offsets': SectionWriter(directory, 'I'),
+        'updated': SectionWriter(directory),
+    }
+    blobs = {'key_offsets': 'keys', 'url_offsets': 'urls', 'updated_offsets': 'updated'}
+    sizes = dict.fromkeys(blobs, 0)
+    prefixes = {}
+    shoulders = {}
+
+    def add_string(offsets, data):
+        sections[blobs[offsets]].append(data)
+        sizes[offsets] += len(data)
+        if sizes[offsets] >= 1 << 32:
+            raise ValueError(f'{blobs[offsets]} section exceeds 4 GB')
+        sections[offsets].append(sizes[offsets])
+
+    for offsets in blobs:
+        sections[offsets].append(0)
+
+    count = 0
+    previous = b''
+    for identifier, url, shoulder, updated in rows:
+        if not url:
+            continue
+        key = identifier.encode()
+        if key <= previous:
+            raise ValueError(f'Rows are not sorted by identifier bytes at {identifier}')
+        previous = key
+
+        prefix, rest = split_url(url)
+        shoulder = shoulder or ''
+        if shoulder not in shoulders and len(shoulders) > 0xffff:
+            raise ValueError('More than 65536 distinct shoulders')
+        add_string('key_offsets', key)
+        sections['prefix_ids'].append(prefixes.setdefault(prefix, len(prefixes)))
+        add_string('url_offsets', rest.encode())
+        sections['shoulder_ids'].append(shoulders.setdefault(shoulder, len(shoulders)))
+        add_string('updated_offsets', str(updated or '').encode())
+        count += 1
+
+    strings = json.dumps({'prefixes': list(prefixes), 'shoulders': list(shoulders)}).encode()
+
+    table = []
+    position = HEADER.size
+    for name in SECTIONS:
+        if name == 'strings':
+            length = len(strings)
+        else:
+            sections[name].flush()
+            length = sections[name].length
+        position += -position % 8
+        table.extend((position, length))
+        position += length
+
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as out:
+        out.write(HEADER.pack(MAGIC, count, watermark.encode(), *table))
+        for name, offset in zip(SECTIONS, table[::2]):
+            out.write(b'\0' * (offset - out.tell()))
+            if name == 'strings':
+                out.write(strings)
+                continue
+            section = sections[name].file
+            section.seek(0)
+            while chunk := section.read(1 << 20):
+                out.write(chunk)
+            section.close()
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp, path)
+    return count
+
+
+class ResolverIndex(object):
+    """One mapped index file; lookups never copy more than the probed keys."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.stat = os.fstat(f.fileno())
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.count, watermark, *table = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a resolver index')
+        self.watermark = watermark.rstrip(b'\0').decode()
+        self.loaded_at = time.monotonic()
+
+        view = memoryview(self._map)
+        self._sections = {}
+        for name, offset, length in zip(SECTIONS, table[::2], table[1::2]):
+            self._sections[name] = (offset, view[offset:offset + length])
+        cast = {'key_offsets': 'I', 'prefix_ids': 'I', 'url_offsets': 'I', 'shoulder_ids': 'H', 'updated_offsets': 'I'}
+        for name, typecode in cast.items():
+            offset, section = self._sections[name]
+            self._sections[name] = (offset, section.cast(typecode))
+
+        strings = json.loads(bytes(self._sections['strings'][1]))
+        self._prefixes = strings['prefixes']
+        self._shoulders = strings['shoulders']
+
+        self._key_offsets = self._sections['key_offsets'][1]
+        self._keys_base = self._sections['keys'][0]
+        self._fences = [self._key(i) for i in range(0, self.count, FENCE)]
+
+    def __len__(self):
+        return self.count
+
+    def _string(self, offsets, blob, i):
+        offsets = self._sections[offsets][1]
+        base = self._sections[blob][0]
+        return self._map[base + offsets[i]:base + offsets[i + 1]]
+
+    def _key(self, i):
+        base, offsets = self._keys_base, self._key_offsets
+        return self._map[base + offsets[i]:base + offsets[i + 1]]
+
+    def find(self, identifier):
+        """Position of `identifier` in the index, or -1."""
+        key = identifier.encode()
+        block = bisect.bisect_right(self._fences, key) - 1
+        if block < 0:
+            return -1
+
+        # binary search inside the block of FENCE keys
+        base, offsets, data = self._keys_base, self._key_offsets, self._map
+        lo, hi = block * FENCE, min((block + 1) * FENCE, self.count)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if data[base + offsets[mid]:base + offsets[mid + 1]] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self._key(lo) == key:
+            return lo
+        return -1
+
+    def get(self, identifier):
+        """lookup_target tuple (url, True, shoulder, updated) or None."""
+        i = self.find(identifier)
+        if i < 0:
+            return None
+        prefix = self._prefixes[self._sections['prefix_ids'][1][i]]
+        url = prefix + self._string('url_offsets', 'urls', i).decode()
+        shoulder = self._shoulders[self._sections['shoulder_ids'][1][i]] or None
+        updated = self._string('updated_offsets', 'updated', i).decode() or None
+        return (url, True, shoulder, updated)
+
+
+class ResolverIndexHolder(object):
+    """The worker's mapped index plus the overlay of rows changed since its build.
+
+    Every `interval` seconds one request checks whether the file was
+    replaced (and maps the new one) and re-reads the overlay.
+    """
+
+    def __init__(self, path, interval=5):
+        self.path = path
+        self.interval = interval
+        self._index = None
+        self._overlay = {}
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _refresh(self, con):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._index, self._overlay = None, {}
+            return
+
+        index = self._index
+        if index is None or (stat.st_ino, stat.st_mtime_ns) != (index.stat.st_ino, index.stat.st_mtime_ns):
+            # the old map is released once no lookup uses it any more
+            index = ResolverIndex(self.path)
+
+        columns = ', '.join(f'"{c}"' for c in INDEX_COLUMNS)
+        res = con.execute(f'SELECT {columns} FROM ark WHERE updated > ?', (index.watermark,))
+        self._overlay = {
+            identifier: (url, True, shoulder, updated) if url else None
+            for identifier, url, shoulder, updated in res
+        }
+        self._index = index
+
+    def get(self, con, identifier):
+        """Target of `identifier` from the index, or None to ask the database."""
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= self.interval:
+            with self._lock:
+                if self._checked_at is None or now - self._checked_at >= self.interval:
+                    self._refresh(con)
+                    self._checked_at = now
+
+        index, overlay = self._index, self._overlay
+        if index is None:
+            return None
+        if identifier in overlay:
+            target = overlay[identifier]
+        else:
+            target = index.get(identifier)
+        if target is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return target
+
+    def stats(self):
+        index = self._index
+        if index is None:
+            return {'loaded': False}
+        return {
+            'loaded': True,
+            'arks': len(index),
+            'overlay': len(self._overlay),
+            'watermark': index.watermark,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+def get_resolver_index():
+    """The worker's ResolverIndexHolder, or None when RESOLVER_INDEX is unset."""
+    return current_app.extensions['resolver_index']
+
+
+def init_app(app):
+    app.extensions['resolver_index'] = None
+    if app.config['RESOLVER_INDEX']:
+        app.extensions['resolver_index'] = ResolverIndexHolder(
+            app.config['RESOLVER_INDEX'],
+            interval=app.config['RESOLVER_INDEX_INTERVAL'],
+        )
@@ -0,0 +1,112 @@
+"""Full-text search over the who/what/when metadata of ARKs.
+
+SQLite: `ark_search` is a contentless FTS5 table (it keeps only the index,
+not a copy of the text). ark is a WITHOUT ROWID table, so `ark_search_key`
+gives every ARK with metadata the integer rowid FTS5 needs. Triggers on
+ark keep both in sync for mints, imports and updates (alembic 0003).
+
+PostgreSQL: a GIN index on SEARCH_DOCUMENT, maintained by the server.
+
+Results come in rowid (SQLite) or identifier (PostgreSQL) order, so the
+next page starts after the last row returned instead of at an OFFSET.
+"""
+from app.db import get_pool
+
+SEARCH_COLUMNS = ('identifier', 'naan', 'shoulder', 'url', 'who', 'what', 'when', 'updated')
+
+# must match the expression of the ix_ark_search index
+SEARCH_DOCUMENT = '''to_tsvector('simple', coalesce(who, '') || ' ' || coalesce(what, '') || ' ' || coalesce("when", ''))'''
+
+# ARKs without any metadata are left out of the SQLite index
+HAS_METADATA = """coalesce(who, '') || coalesce(what, '') || coalesce("when", '') <> ''"""
+
+MAX_LIMIT = 1000
+
+
+def search_terms(query):
+    """[(word, prefix)] of a search string; a trailing `*` makes a prefix term."""
+    terms = []
+    for word in query.split():
+        prefix = word.endswith('*')
+        word = word.rstrip('*')
+        if word:
+            terms.append((word, prefix))
+    return terms
+
+
+def fts5_query(terms):
+    """FTS5 MATCH expression: every term, each quoted so it is never syntax."""
+    return ' '.join('"{}"{}'.format(word.replace('"', '""'), '*' if prefix else '') for word, prefix in terms)
+
+
+def tsquery(terms):
+    """to_tsquery() input: every term, quoted as a lexeme."""
+    return ' & '.join(
+        "'{}'{}".format(word.replace('\\', '\\\\').replace("'", "''"), ':*' if prefix else '')
+        for word, prefix in terms
+    )
+
+
+def search_arks(con, query, naan=None, shoulder=None, cursor=None, limit=100):
+    """ARKs whose metadata contains all words of `query`.
+
+    Returns ([row dict], next cursor or None). `cursor` is the value
+    returned with the previous page; a malformed one raises ValueError.
+    """
+    terms = search_terms(query)
+    if not terms:
+        raise ValueError('q must contain at least one word')
+
+    pool = get_pool()
+    columns = ', '.join(f'a."{c}"' for c in SEARCH_COLUMNS)
+    if pool.backend == 'sqlite':
+        sql = (
+            f'SELECT k.id, {columns} FROM ark_search f JOIN ark_search_key k ON k.id = f.rowid '
+            f'JOIN ark a ON a.identifier = k.identifier WHERE ark_search MATCH ?'
+        )
+        params = [fts5_query(terms)]
+        key = 'f.rowid'
+        try:
+            after = int(cursor) if cursor else None
+        except ValueError:
+            raise ValueError('Invalid cursor')
+        if after is not None and not 0 <= after < 1 << 63:
+            raise ValueError('Invalid cursor')
+    else:
+        sql = f"SELECT a.identifier, {columns} FROM ark a WHERE {SEARCH_DOCUMENT} @@ to_tsquery('simple', ?)"
+        params = [tsquery(terms)]
+        key = 'a.identifier'
+        after = cursor or None
+        if after and '\0' in after:
+            raise ValueError('Invalid cursor')
+
+    for condition, value in ((f'{key} > ?', after), ('a.naan = ?', naan), ('a.shoulder = ?', shoulder)):
+        if value is not None:
+            sql += f' AND {condition}'
+            params.append(value)
+    sql += f' ORDER BY {key} LIMIT ?'
+    params.append(limit + 1)
+
+    rows = con.execute(sql, params).fetchall()
+    next_cursor = str(rows[limit - 1][0]) if len(rows) > limit else None
+    return [dict(zip(SEARCH_COLUMNS, row[1:])) for row in rows[:limit]], next_cursor
+
+
+def rebuild_search_index(con):
+    """Re-create the search index from the ark table; returns indexed ARKs."""
+    pool = get_pool()
+    if pool.backend != 'sqlite':
+        con.execute('REINDEX INDEX ix_ark_search')
+        con.commit()
+        return con.execute(f'SELECT count(*) FROM ark WHERE {HAS_METADATA}').fetchone()[0]
+
+    with con:
+        con.execute("INSERT INTO ark_search (ark_search) VALUES ('delete-all')")
+        con.execute('DELETE FROM ark_search_key')
+        con.execute(f'INSERT INTO ark_search_key (identifier) SELECT identifier FROM ark WHERE {HAS_METADATA} ORDER BY identifier')
+        con.execute(
+            'INSERT INTO ark_search (rowid, who, what, "when") '
+            'SELECT k.id, a.who, a.what, a."when" FROM ark_search_key k JOIN ark a ON a.identifier = k.identifier'
+        )
+        con.execute("INSERT INTO ark_search (ark_search) VALUES ('optimize')")
+    return con.execute('SELECT count(*) FROM ark_search_key').fetchone()[0]
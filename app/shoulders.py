@@ -0,0 +1,139 @@
+import threading
+import time
+
+from flask import current_app
+
+from app.db import get_db
+
+SHOULDER_COLUMNS = ('shoulder', 'naan', 'name', 'description', 'redirect_prefix', 'template', 'updated')
+
+
+class ShoulderIndex(object):
+    """In-memory prefix trie of shoulders, one trie per NAAN.
+
+    Each trie node is a dict of next character -> node; the shoulder row
+    (a dict of SHOULDER_COLUMNS) is stored under the `None` key of the node
+    where the shoulder ends.
+    """
+
+    def __init__(self, rows=()):
+        self.loaded_at = time.monotonic()
+        self._tries = {}
+        self._count = 0
+        for row in rows:
+            self.add(dict(zip(SHOULDER_COLUMNS, row)))
+
+    def __len__(self):
+        return self._count
+
+    def rows(self):
+        """All shoulder rows, in no particular order."""
+        stack = list(self._tries.values())
+        while stack:
+            node = stack.pop()
+            for c, child in node.items():
+                if c is None:
+                    yield child
+                else:
+                    stack.append(child)
+
+    def add(self, shoulder_row):
+        node = self._tries.setdefault(int(shoulder_row['naan']), {})
+        for c in shoulder_row['shoulder']:
+            node = node.setdefault(c, {})
+        if None not in node:
+            self._count += 1
+        node[None] = shoulder_row
+
+    def _trie(self, naan):
+        try:
+            return self._tries.get(int(naan))
+        except (TypeError, ValueError):
+            return None
+
+    def get(self, naan, shoulder):
+        """Exact lookup of `shoulder` under `naan`."""
+        node = self._trie(naan)
+        if node is None or not isinstance(shoulder, str):
+            return None
+
+        for c in shoulder:
+            node = node.get(c)
+            if node is None:
+                return None
+        return node.get(None)
+
+    def match(self, naan, assigned_name):
+        """Longest shoulder under `naan` that is a prefix of `assigned_name`."""
+        node = self._trie(naan)
+        if node is None or not isinstance(assigned_name, str):
+            return None
+
+        found = node.get(None)
+        for c in assigned_name:
+            node = node.get(c)
+            if node is None:
+                break
+            found = node.get(None, found)
+        return found
+
+
+def load_shoulder_index(con):
+    columns = ', '.join(SHOULDER_COLUMNS)
+    return ShoulderIndex(con.execute(f'SELECT {columns} FROM shoulder'))
+
+
+class ShoulderIndexHolder(object):
+    """Keeps the worker's ShoulderIndex and rebuilds it when it gets old.
+
+    The shoulder table is tiny and changes rarely, so the whole trie is
+    rebuilt from one query every `ttl` seconds or after `invalidate()`.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._index = None
+        self._lock = threading.Lock()
+
+    def get(self, con, max_age=None):
+        max_age = self.ttl if max_age is None else max_age
+        index = self._index
+        if index is None or time.monotonic() - index.loaded_at > max_age:
+            with self._lock:
+                if self._index is index:
+                    self._index = load_shoulder_index(con)
+                index = self._index
+        return index
+
+    def invalidate(self):
+        self._index = None
+
+    def stats(self):
+        index = self._index
+        if index is None:
+            return {'loaded': False}
+        return {'loaded': True, 'shoulders': len(index), 'age': round(time.monotonic() - index.loaded_at, 1)}
+
+
+def get_shoulder_index(max_age=None):
+    return current_app.extensions['shoulder_index'].get(get_db(), max_age)
+
+
+def find_shoulder(naan, shoulder):
+    """Exact shoulder lookup for writers (mint, import).
+
+    A miss reloads the index once so a newly added shoulder is usable
+    without waiting for the TTL.
+    """
+    if row := get_shoulder_index().get(naan, shoulder):
+        return row
+    return get_shoulder_index(max_age=0).get(naan, shoulder)
+
+
+def match_shoulder(naan, assigned_name):
+    """Longest-prefix shoulder for an assigned name, or None."""
+    return get_shoulder_index().match(naan, assigned_name)
+
+
+def init_app(app):
+    app.extensions['shoulder_index'] = ShoulderIndexHolder(ttl=app.config['SHOULDER_INDEX_TTL'])
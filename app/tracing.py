@@ -0,0 +1,150 @@
+"""Per-request stage timings and the slow-request log.
+
+With TRACING=1, a TRACE_SAMPLE_RATE fraction of requests carry a Trace.
+`span(name)` blocks and every `observe_query` inside such a request add a
+(name, start, duration) entry. A traced request slower than SLOW_REQUEST_MS
+is written as one JSON line to SLOW_REQUEST_LOG (stderr if unset), with
+its spans and, when TRACE_QUERY_PLANS is on, the plan of each query.
+
+Off by default. When off, `span()` returns a shared no-op context manager
+after checking one module flag, and nothing is registered on the app.
+"""
+import contextlib
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+from flask import g, request
+
+from app.db import get_db, get_pool
+
+logger = logging.getLogger('app.slow_requests')
+
+_enabled = False
+_null_span = contextlib.nullcontext()
+
+
+class Trace(object):
+    """Spans of one request, times relative to the request start."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans = []
+
+    def add(self, name, start, duration, sql=None, params=None):
+        entry = {'name': name, 'start_ms': round((start - self.start) * 1000, 3), 'duration_ms': round(duration * 1000, 3)}
+        if sql is not None:
+            entry['sql'] = sql
+            entry['params'] = params
+        self.spans.append(entry)
+
+
+def current_trace():
+    """The current request's Trace, or None (tracing off or not sampled)."""
+    if not _enabled:
+        return None
+    return g.get('trace')
+
+
+class Span(object):
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.trace.add(self.name, self.start, time.perf_counter() - self.start)
+        return False
+
+
+def span(name):
+    """Time the enclosed block as stage `name` of the current trace."""
+    if not _enabled:
+        return _null_span
+    trace = g.get('trace')
+    if trace is None:
+        return _null_span
+    return Span(trace, name)
+
+
+def record_query(name, start, duration, sql=None, params=None):
+    """Called by observe_query: add a query span to the current trace."""
+    if trace := current_trace():
+        trace.add(name, start, duration, sql, params)
+
+
+def query_plan(sql, params):
+    """Plan of `sql` as a list of lines, or the error explaining it."""
+    con = get_db()
+    pool = get_pool()
+    try:
+        if pool.backend == 'sqlite':
+            return [row[-1] for row in con.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+        return [row[0] for row in con.execute(f'EXPLAIN {sql}', params)]
+    except pool.Error as e:
+        if con.in_transaction:
+            con.rollback()
+        return [f'error: {e}']
+
+
+def _start_trace():
+    if random.random() < _sample_rate:
+        g.trace = Trace()
+
+
+def _log_slow_request(response):
+    trace = g.pop('trace', None)
+    if trace is None:
+        return response
+
+    duration = time.perf_counter() - trace.start
+    if duration * 1000 < _slow_ms:
+        return response
+
+    if _query_plans:
+        for entry in trace.spans:
+            if 'sql' in entry:
+                entry['plan'] = query_plan(entry['sql'], entry['params'])
+    for entry in trace.spans:
+        # only needed for EXPLAIN; mint parameters carry user metadata
+        entry.pop('params', None)
+
+    logger.warning(json.dumps({
+        'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'pid': os.getpid(),
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'route': request.url_rule.rule if request.url_rule else None,
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 3),
+        'spans': trace.spans,
+    }))
+    return response
+
+
+def init_app(app):
+    global _enabled, _sample_rate, _slow_ms, _query_plans
+    _enabled = app.config['TRACING']
+    if not _enabled:
+        return
+
+    _sample_rate = app.config['TRACE_SAMPLE_RATE']
+    _slow_ms = app.config['SLOW_REQUEST_MS']
+    _query_plans = app.config['TRACE_QUERY_PLANS']
+
+    logger.handlers.clear()
+    path = app.config['SLOW_REQUEST_LOG']
+    handler = logging.FileHandler(path) if path else logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    app.before_request(_start_trace)
+    app.after_request(_log_slow_request)
@@ -0,0 +1,74 @@
+"""Misses/sec and mint collision checks with and without the Bloom filter.
+
+Builds the per-NAAN filters for a synthetic database, then resolves
+unknown ARKs (resolver cache off, so every request is a real miss) and
+mints random ARKs, once with BLOOM_FILTER off and once on.
+
+    python -m benchmarks.bench_bloom --count 1000000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from benchmarks.common import NAAN, SHOULDERS, ark_path, configure_app, remove_database, run_for, temp_database
+
+API_KEY = 'bench-api-key'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=1000000, help='ARKs in the synthetic database')
+    parser.add_argument('--seconds', type=float, default=3.0, help='duration of each run')
+    parser.add_argument('--fp-rate', type=float, default=0.01, help='BLOOM_FILTER_FP_RATE')
+    args = parser.parse_args()
+
+    from app import bloom, flask_app
+
+    database = temp_database(args.count)
+    fd, filter_path = tempfile.mkstemp(suffix='.bloom', prefix='ark-bench-')
+    os.close(fd)
+    os.unlink(filter_path)
+    try:
+        configure_app(flask_app, database)
+        start = time.perf_counter()
+        with flask_app.app_context():
+            from app.db import get_db
+            filters, watermark = bloom.ArkFilter(fp_rate=args.fp_rate).build(get_db())
+        bloom.save_filters(filter_path, filters, watermark)
+        stats = filters[NAAN].stats()
+        print(f"build: {time.perf_counter() - start:.1f}s, {stats['bytes'] / 1e6:.1f} MB, "
+              f"{stats['hashes']} hashes, estimated false positives {stats['estimated_fp_rate']:.3%}")
+
+        con = sqlite3.connect(database)
+        rate = run_for(args.seconds, lambda i: f'{NAAN}/zz{i}' in filters[NAAN])
+        print(f'absent check, filter: {rate:>9.0f}/s')
+        rate = run_for(args.seconds, lambda i: con.execute(
+            'SELECT url, shoulder, updated FROM ark WHERE identifier = ?', (f'{NAAN}/zz{i}',)
+        ).fetchone())
+        print(f'absent check, sqlite: {rate:>9.0f}/s')
+        false_positives = sum(f'{NAAN}/zz{i}' in filters[NAAN] for i in range(100000))
+        assert all(ark_path(i) in filters[NAAN] for i in range(0, args.count, 997))
+        print(f'measured false positives: {false_positives / 100000:.3%}')
+        con.close()
+
+        mint = {'naan': NAAN, 'shoulder': SHOULDERS[0], 'url': 'https://example.org/minted'}
+        for enabled in (False, True):
+            configure_app(
+                flask_app, database, RESOLVER_CACHE_SIZE=0, MINTER_API_KEY=API_KEY,
+                BLOOM_FILTER=enabled, BLOOM_FILTER_PATH=filter_path, BLOOM_FILTER_FP_RATE=args.fp_rate,
+            )
+            bloom.init_app(flask_app)
+            client = flask_app.test_client()
+            misses = run_for(args.seconds, lambda i: client.get(f'/ark:/{NAAN}/zz{i}'))
+            mints = run_for(args.seconds, lambda i: client.post('/api/mint', json=mint, headers={'X-API-Key': API_KEY}))
+            print(f"filter {'on ' if enabled else 'off'}: misses {misses:>7.0f}/s, mints {mints:>6.0f}/s")
+    finally:
+        remove_database(database)
+        if os.path.exists(filter_path):
+            os.unlink(filter_path)
+
+
+if __name__ == '__main__':
+    main()
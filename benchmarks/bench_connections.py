@@ -0,0 +1,58 @@
+"""Resolver requests/sec with a connection per request vs pooled connections.
+
+    python -m benchmarks.bench_connections --count 100000 --seconds 5
+"""
+import argparse
+
+from benchmarks.common import (
+    NAAN,
+    SHOULDERS,
+    configure_app,
+    remove_database,
+    run_for,
+    temp_database,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=100000, help='ARKs in the synthetic database')
+    parser.add_argument('--seconds', type=float, default=5.0, help='duration of each run')
+    args = parser.parse_args()
+
+    from app import flask_app
+
+    database = temp_database(args.count)
+    client = flask_app.test_client()
+
+    def resolve(i):
+        n = (i * 7919) % args.count
+        s = SHOULDERS[n % len(SHOULDERS)]
+        client.get(f'/ark:/{NAAN}/{s}{n:08d}')
+
+    try:
+        results = {}
+        runs = [
+            # the old behaviour: plain sqlite3.connect() for every request
+            ('connect per request', 0, {}),
+            ('pooled', 4, flask_app.config['SQLITE_PRAGMAS']),
+        ]
+        for label, pool_size, pragmas in runs:
+            configure_app(
+                flask_app,
+                database,
+                SQLITE_POOL_SIZE=pool_size,
+                SQLITE_PRAGMAS=pragmas,
+                RESOLVER_CACHE_SIZE=0,
+            )
+            results[label] = run_for(args.seconds, resolve)
+            print(f'{label:<22} {results[label]:>10.1f} req/s')
+
+        before, after = results['connect per request'], results['pooled']
+        print(f'{"speedup":<22} {after / before:>10.2f}x')
+    finally:
+        remove_database(database)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Mints/sec at different concurrency levels, with and without group commit.
+
+Each level runs that many threads posting /api/mint through the Flask test
+client for --seconds, once committing per request and once with
+MINT_GROUP_COMMIT. The default pragmas fsync every commit (synchronous
+FULL), which is what group commit amortizes; --synchronous NORMAL shows the
+gain without that fsync.
+
+    python -m benchmarks.bench_group_commit --concurrency 1,4,16,32
+"""
+import argparse
+import threading
+import time
+
+from benchmarks.common import NAAN, SHOULDERS, configure_app, remove_database, temp_database
+
+API_KEY = 'bench-api-key'
+
+
+def run_level(app, threads, seconds):
+    minted = []
+    errors = []
+    deadline = time.perf_counter() + seconds
+    data = {'naan': NAAN, 'shoulder': SHOULDERS[0], 'url': 'https://example.org/minted'}
+
+    def worker():
+        client = app.test_client()
+        count = 0
+        while time.perf_counter() < deadline:
+            response = client.post('/api/mint', json=data, headers={'X-API-Key': API_KEY})
+            if response.status_code == 201:
+                count += 1
+            else:
+                errors.append(response.status_code)
+        minted.append(count)
+
+    start = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return sum(minted) / (time.perf_counter() - start), len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=10000, help='ARKs in the synthetic database')
+    parser.add_argument('--concurrency', default='1,2,4,8,16,32', help='comma separated thread counts')
+    parser.add_argument('--seconds', type=float, default=3.0, help='duration of each run')
+    parser.add_argument('--rows', type=int, default=100, help='MINT_GROUP_COMMIT_ROWS')
+    parser.add_argument('--wait-ms', type=float, default=0.0, help='MINT_GROUP_COMMIT_WAIT_MS')
+    parser.add_argument('--synchronous', default='FULL', choices=['OFF', 'NORMAL', 'FULL'])
+    args = parser.parse_args()
+
+    from app import flask_app
+
+    levels = [int(n) for n in args.concurrency.split(',')]
+    database = temp_database(args.count)
+    pragmas = dict(flask_app.config['SQLITE_PRAGMAS'], synchronous=args.synchronous)
+    try:
+        print(f"{'threads':>8} {'per request':>14} {'group commit':>14} {'speedup':>8}")
+        for threads in levels:
+            results = {}
+            for group_commit in (False, True):
+                configure_app(
+                    flask_app,
+                    database,
+                    MINTER_API_KEY=API_KEY,
+                    SQLITE_PRAGMAS=pragmas,
+                    SQLITE_POOL_SIZE=max(4, threads),
+                    MINT_GROUP_COMMIT=group_commit,
+                    MINT_GROUP_COMMIT_ROWS=args.rows,
+                    MINT_GROUP_COMMIT_WAIT_MS=args.wait_ms,
+                )
+                results[group_commit] = run_level(flask_app, threads, args.seconds)
+
+            (plain, plain_errors), (grouped, grouped_errors) = results[False], results[True]
+            errors = f'  ({plain_errors}/{grouped_errors} failed)' if plain_errors or grouped_errors else ''
+            print(f'{threads:>8} {plain:>12.0f}/s {grouped:>12.0f}/s {grouped / plain:>7.2f}x{errors}')
+    finally:
+        remove_database(database)
+
+
+if __name__ == '__main__':
+    main()
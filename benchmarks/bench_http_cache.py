@@ -0,0 +1,100 @@
+"""Resolver requests saved by a shared cache honouring the redirect headers.
+
+Replays a Zipf-distributed stream of ARK resolutions (a few hot ARKs, a
+long tail) at --rate requests per simulated second through a minimal
+shared cache in front of the Flask test client, as nginx proxy_cache with
+proxy_cache_revalidate does: fresh entries are answered from the cache,
+expired ones are revalidated with If-None-Match, and responses without a
+max-age are not stored. Prints, for each REDIRECT_MAX_AGE, how many
+requests still reached the resolver and how many of those were 304s.
+
+    python -m benchmarks.bench_http_cache --max-ages 0,60,300,3600
+"""
+import argparse
+import itertools
+import random
+import sqlite3
+import time
+
+from benchmarks.common import ark_path, configure_app, remove_database, temp_database
+
+
+class SharedCache(object):
+    """Path -> (expires, etag) for cacheable redirects, on a simulated clock."""
+
+    def __init__(self, client):
+        self.client = client
+        self.entries = {}
+        self.upstream = 0
+        self.revalidated = 0
+        self.upstream_seconds = 0.0
+
+    def get(self, path, now):
+        entry = self.entries.get(path)
+        if entry and entry[0] > now:
+            return 'hit'
+
+        headers = {'If-None-Match': entry[1]} if entry else {}
+        start = time.perf_counter()
+        response = self.client.get(path, headers=headers)
+        self.upstream_seconds += time.perf_counter() - start
+        self.upstream += 1
+
+        cache_control = response.cache_control
+        if cache_control.max_age and not cache_control.no_cache:
+            self.entries[path] = (now + cache_control.max_age, response.headers['ETag'])
+        if response.status_code == 304:
+            self.revalidated += 1
+            return 'revalidated'
+        return 'miss'
+
+
+def request_stream(count, requests, skew, seed):
+    """`requests` ARK paths drawn with Zipf weights 1 / rank ** skew."""
+    rng = random.Random(seed)
+    weights = list(itertools.accumulate(1 / (rank ** skew) for rank in range(1, count + 1)))
+    ranks = list(range(count))
+    rng.shuffle(ranks)
+    return [f'/ark:/{ark_path(ranks[i])}' for i in rng.choices(range(count), cum_weights=weights, k=requests)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=100000, help='ARKs in the synthetic database')
+    parser.add_argument('--requests', type=int, default=50000, help='resolutions to replay')
+    parser.add_argument('--rate', type=float, default=50.0, help='requests per simulated second')
+    parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent of ARK popularity')
+    parser.add_argument('--max-ages', default='0,60,300,3600,86400', help='comma separated REDIRECT_MAX_AGE values')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    from app import flask_app
+
+    database = temp_database(args.count)
+    con = sqlite3.connect(database)
+    con.execute("UPDATE ark SET updated = '2026-01-01 00:00:00'")
+    con.commit()
+    con.close()
+
+    stream = request_stream(args.count, args.requests, args.skew, args.seed)
+    simulated = args.requests / args.rate
+    print(f'{args.requests} requests over {simulated:.0f} simulated seconds, {len(set(stream))} distinct ARKs')
+    try:
+        print(f"{'max-age':>8} {'upstream':>9} {'304':>7} {'saved':>7} {'resolver time':>14}")
+        for max_age in (int(n) for n in args.max_ages.split(',')):
+            configure_app(flask_app, database, REDIRECT_MAX_AGE=max_age, REDIRECT_POLICIES={})
+            cache = SharedCache(flask_app.test_client())
+            for i, path in enumerate(stream):
+                cache.get(path, i / args.rate)
+
+            saved = 1 - cache.upstream / args.requests
+            print(
+                f'{max_age:>8} {cache.upstream:>9} {cache.revalidated:>7} {saved:>6.1%} '
+                f'{cache.upstream_seconds:>13.2f}s'
+            )
+    finally:
+        remove_database(database)
+
+
+if __name__ == '__main__':
+    main()
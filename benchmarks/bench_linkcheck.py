@@ -0,0 +1,94 @@
+"""Link checks/sec: `flask ark-linkcheck` vs one-at-a-time urllib requests.
+
+Starts a local stand-in HTTP server on several ports (one "host" each,
+every response delayed by --latency ms), points the URLs of a synthetic
+database at it, and runs ark-linkcheck over all of them. The sequential
+baseline is timed on a sample. The outcomes of redirects, 404s, refused
+HEADs and timeouts are checked by tests/test_linkcheck.py.
+
+    python -m benchmarks.bench_linkcheck --count 5000 --latency 20
+"""
+import argparse
+import sqlite3
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.common import configure_app, remove_database, temp_database
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        time.sleep(self.latency)
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+def start_servers(hosts, latency):
+    StandInHandler.latency = latency
+    servers = []
+    for _ in range(hosts):
+        server = StandInServer(('127.0.0.1', 0), StandInHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    return servers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=5000, help='ARKs (links) in the synthetic database')
+    parser.add_argument('--hosts', type=int, default=4, help='stand-in hosts (ports)')
+    parser.add_argument('--latency', type=float, default=20, help='stand-in response time, ms')
+    parser.add_argument('--sample', type=int, default=200, help='links checked one at a time for the baseline')
+    args = parser.parse_args()
+
+    from app import flask_app
+    from app.commands import ark_linkcheck
+
+    servers = start_servers(args.hosts, args.latency / 1000)
+    bases = [f'http://127.0.0.1:{server.server_address[1]}' for server in servers]
+    database = temp_database(args.count)
+    try:
+        con = sqlite3.connect(database)
+        identifiers = [row[0] for row in con.execute('SELECT identifier FROM ark ORDER BY identifier')]
+        urls = {identifier: f'{bases[i % len(bases)]}/item/{i}' for i, identifier in enumerate(identifiers)}
+        with con:
+            con.executemany('UPDATE ark SET url = ? WHERE identifier = ?', [(url, i) for i, url in urls.items()])
+        con.close()
+
+        sample = list(urls.values())[:args.sample]
+        start = time.perf_counter()
+        for url in sample:
+            urllib.request.urlopen(urllib.request.Request(url, method='HEAD'), timeout=10).close()
+        rate = len(sample) / (time.perf_counter() - start)
+        print(f'one at a time (urllib): {rate:>7.0f} links/s, {args.count / rate:.0f}s for all')
+
+        configure_app(flask_app, database)
+        runner = flask_app.test_cli_runner()
+        options = ['--per-host', '16', '--delay', '0', '--timeout', '1']
+        start = time.perf_counter()
+        result = runner.invoke(ark_linkcheck, options)
+        elapsed = time.perf_counter() - start
+        print(f'ark-linkcheck:          {args.count / elapsed:>7.0f} links/s, {elapsed:.1f}s for all')
+        print(result.output.strip())
+    finally:
+        remove_database(database)
+        for server in servers:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
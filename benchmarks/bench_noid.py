@@ -0,0 +1,78 @@
+"""Per-identifier cost of NOID generation and check-digit validation.
+
+Compares the original implementation (template parsed on every call,
+`secrets.choice` per character, linear `EXTENDED_CHARS.index` scan over
+the whole ARK) with CompiledTemplate.
+
+    python -m benchmarks.bench_noid --count 200000
+"""
+import argparse
+import secrets
+import time
+
+from app.noid import (
+    DIGIT_CHARS,
+    EXTENDED_CHARS,
+    compile_template,
+    parse_noid_template,
+)
+
+
+def legacy_check_digit(s):
+    total = 0
+    for i, c in enumerate(s, start=1):
+        if c in EXTENDED_CHARS:
+            total += i * EXTENDED_CHARS.index(c)
+    return EXTENDED_CHARS[total % 29]
+
+
+def legacy_generate(template, naan, shoulder):
+    parsed = parse_noid_template(template)
+    result = parsed['prefix']
+    for c in parsed['pattern']:
+        if c == 'd':
+            result += secrets.choice(DIGIT_CHARS)
+        elif c == 'e':
+            result += secrets.choice(EXTENDED_CHARS)
+    if parsed['has_check']:
+        result += legacy_check_digit(f'{naan}/{shoulder}{result}')
+    return result
+
+
+def legacy_validate(name, template, naan, shoulder):
+    full_ark = f'{naan}/{shoulder}{name}'
+    expected = legacy_check_digit(full_ark[:-1])
+    return full_ark[-1] == expected
+
+
+def per_item(count, func):
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=200000, help='identifiers per measurement')
+    parser.add_argument('--template', default='.reedeedk')
+    parser.add_argument('--naan', default='18474')
+    parser.add_argument('--shoulder', default='b2')
+    args = parser.parse_args()
+
+    template, naan, shoulder, count = args.template, args.naan, args.shoulder, args.count
+    compiled = compile_template(template)
+    names = compiled.generate_many(count, naan, shoulder)
+
+    results = [
+        ('generate (legacy)', per_item(count, lambda: [legacy_generate(template, naan, shoulder) for _ in range(count)])),
+        ('generate (compiled)', per_item(count, lambda: [compiled.generate(naan, shoulder) for _ in range(count)])),
+        ('generate_many (compiled)', per_item(count, lambda: compiled.generate_many(count, naan, shoulder))),
+        ('validate (legacy)', per_item(count, lambda: [legacy_validate(n, template, naan, shoulder) for n in names])),
+        ('validate (compiled)', per_item(count, lambda: [compiled.validate(n, naan, shoulder) for n in names])),
+    ]
+    for label, usec in results:
+        print(f'{label:<26} {usec:>8.2f} us/identifier')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Lookups/sec from the memory-mapped resolver index vs SQLite.
+
+Builds the index for a synthetic database, then resolves random ARK hits
+through the Flask test client (resolver cache off) with and without
+RESOLVER_INDEX, and times the bare lookups.
+
+    python -m benchmarks.bench_resolver_index --count 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from benchmarks.common import ark_path, configure_app, remove_database, run_for, temp_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=1000000, help='ARKs in the synthetic database')
+    parser.add_argument('--seconds', type=float, default=3.0, help='duration of each run')
+    args = parser.parse_args()
+
+    from app import flask_app
+    from app.resolver_index import INDEX_COLUMNS, ResolverIndex, build_resolver_index
+
+    database = temp_database(args.count)
+    fd, index_path = tempfile.mkstemp(suffix='.idx', prefix='ark-bench-')
+    os.close(fd)
+    try:
+        con = sqlite3.connect(database)
+        start = time.perf_counter()
+        columns = ', '.join(f'"{c}"' for c in INDEX_COLUMNS)
+        build_resolver_index(con.execute(f'SELECT {columns} FROM ark ORDER BY identifier'), index_path, '')
+        print(f'build: {time.perf_counter() - start:.1f}s, index {os.path.getsize(index_path) / 1e6:.1f} MB, '
+              f'database {os.path.getsize(database) / 1e6:.1f} MB')
+
+        paths = [ark_path(random.randrange(args.count)) for _ in range(10000)]
+        index = ResolverIndex(index_path)
+        rate = run_for(args.seconds, lambda i: index.get(paths[i % len(paths)]))
+        print(f'lookup, index:  {rate:>9.0f}/s')
+        rate = run_for(args.seconds, lambda i: con.execute(
+            'SELECT url, shoulder, updated FROM ark WHERE identifier = ?', (paths[i % len(paths)],)
+        ).fetchone())
+        print(f'lookup, sqlite: {rate:>9.0f}/s')
+        con.close()
+
+        for label, path in (('sqlite', ''), ('index', index_path)):
+            configure_app(flask_app, database, RESOLVER_CACHE_SIZE=0, RESOLVER_INDEX=path)
+            from app import resolver_index
+            resolver_index.init_app(flask_app)
+            client = flask_app.test_client()
+            rate = run_for(args.seconds, lambda i: client.get(f'/ark:/{paths[i % len(paths)]}'))
+            print(f'resolve, {label + ":":7} {rate:>8.0f}/s')
+    finally:
+        remove_database(database)
+        os.unlink(index_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Lookups before and after alembic revision 0002 (lookup-optimized schema).
+
+Builds a database in the pre-0002 layout, measures resolve lookups, shoulder
+lookups and a per-shoulder keyset scan (as noid-check -s runs it), upgrades
+a copy with `alembic upgrade head` and measures again.
+
+    python -m benchmarks.bench_schema --count 1000000
+"""
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+
+from app.config import Config
+from app.db import ConnectionPool
+from benchmarks.common import LEGACY_SCHEMA, NAAN, ROOT, SHOULDERS, ark_path, create_database, remove_database, temp_database
+
+QUERIES = {
+    'resolve': 'SELECT url FROM ark WHERE identifier = ?',
+    'shoulder': 'SELECT * FROM shoulder WHERE naan = ? AND shoulder = ?',
+    'shoulder_scan': (
+        'SELECT identifier, naan, shoulder FROM ark WHERE identifier > ? AND shoulder = ? '
+        'ORDER BY identifier LIMIT ?'
+    ),
+}
+
+
+def upgrade(database):
+    env = dict(os.environ, SQLITE_DATABASE=database)
+    for args in (['stamp', '0001'], ['upgrade', 'head']):
+        subprocess.run([sys.executable, '-m', 'alembic', *args], cwd=ROOT, env=env, check=True)
+
+
+def measure(database, count, lookups, chunk_size):
+    con = ConnectionPool(database, pragmas=Config.SQLITE_PRAGMAS).connect()
+    # the migration leaves the old tables' pages on the freelist
+    con.execute('VACUUM')
+    rng = random.Random(count)
+
+    for name, query in QUERIES.items():
+        plan = con.execute(f'EXPLAIN QUERY PLAN {query}', (None,) * query.count('?')).fetchall()
+        print(f"  {name:<14} {'; '.join(row[-1] for row in plan)}")
+
+    results = {}
+    paths = [ark_path(rng.randrange(count)) for _ in range(lookups)]
+    start = time.perf_counter()
+    for path in paths:
+        con.execute(QUERIES['resolve'], (path,)).fetchone()
+    results['resolve'] = (time.perf_counter() - start) / lookups * 1e6
+
+    start = time.perf_counter()
+    for i in range(lookups):
+        con.execute(QUERIES['shoulder'], (NAAN, SHOULDERS[i % len(SHOULDERS)])).fetchone()
+    results['shoulder'] = (time.perf_counter() - start) / lookups * 1e6
+
+    rows = 0
+    after = ''
+    start = time.perf_counter()
+    while True:
+        chunk = con.execute(QUERIES['shoulder_scan'], (after, SHOULDERS[-1], chunk_size)).fetchall()
+        if not chunk:
+            break
+        rows += len(chunk)
+        after = chunk[-1][0]
+    results['shoulder_scan'] = rows / (time.perf_counter() - start)
+
+    con.close()
+    results['size_mb'] = os.path.getsize(database) / 2 ** 20
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=200000, help='ARKs in the database')
+    parser.add_argument('--lookups', type=int, default=100000)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    before = temp_database(args.count, schema=LEGACY_SCHEMA)
+    after = before.replace('.db', '-0002.db')
+    try:
+        shutil.copyfile(before, after)
+        upgrade(after)
+
+        results = {}
+        for label, database in (('before', before), ('after', after)):
+            print(f'{label}:')
+            results[label] = measure(database, args.count, args.lookups, args.chunk_size)
+
+        print()
+        print(f"{'':<16}{'before':>12}{'after':>12}")
+        print(f"{'resolve us':<16}{results['before']['resolve']:>12.2f}{results['after']['resolve']:>12.2f}")
+        print(f"{'shoulder us':<16}{results['before']['shoulder']:>12.2f}{results['after']['shoulder']:>12.2f}")
+        print(f"{'scan rows/s':<16}{results['before']['shoulder_scan']:>12.0f}{results['after']['shoulder_scan']:>12.0f}")
+        print(f"{'size MB':<16}{results['before']['size_mb']:>12.1f}{results['after']['size_mb']:>12.1f}")
+    finally:
+        remove_database(before)
+        remove_database(after)
+
+
+if __name__ == '__main__':
+    main()
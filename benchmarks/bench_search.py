@@ -0,0 +1,94 @@
+"""Metadata search: FTS5 index vs LIKE '%...%' scans.
+
+Fills who/what/when of a synthetic database (through the triggers that
+maintain the index), then times a rare and a common word with the search
+query and with the LIKE scan curators used, and pages through all matches
+of the common word with /api/search.
+
+    python -m benchmarks.bench_search --count 1000000
+"""
+import argparse
+import random
+import sqlite3
+import time
+
+from benchmarks.common import configure_app, remove_database, temp_database
+
+WORDS = ['moth', 'beetle', 'fern', 'orchid', 'frog', 'lizard', 'bird', 'bat', 'fungus', 'moss']
+COLLECTORS = ['Chen', 'Lin', 'Huang', 'Chang', 'Lee', 'Wang', 'Wu', 'Liu', 'Tsai', 'Yang']
+
+
+def timed(func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=1000000, help='ARKs in the synthetic database')
+    args = parser.parse_args()
+
+    from app import flask_app
+    from app.search import search_arks
+
+    database = temp_database(args.count)
+    try:
+        con = sqlite3.connect(database)
+        rng = random.Random(1)
+        start = time.perf_counter()
+        with con:
+            con.executemany(
+                'UPDATE ark SET who = ?, what = ?, "when" = ? WHERE identifier = ?',
+                (
+                    (f'{rng.choice(COLLECTORS)} {rng.choice(COLLECTORS)}',
+                     f'{rng.choice(WORDS)} specimen {i}' + (' holotype' if i % 10000 == 0 else ''),
+                     str(1900 + i % 120), identifier)
+                    for i, (identifier,) in enumerate(con.execute('SELECT identifier FROM ark').fetchall())
+                )
+            )
+        print(f'metadata + index for {args.count} ARKs: {time.perf_counter() - start:.1f}s')
+        con.close()
+
+        configure_app(flask_app, database)
+        with flask_app.app_context():
+            from app.db import get_db
+            con = get_db()
+            for word in ('holotype', 'moth'):
+                like_ms, like_rows = timed(lambda: con.execute(
+                    'SELECT identifier FROM ark WHERE who LIKE ? OR what LIKE ? OR "when" LIKE ? ORDER BY identifier LIMIT 100',
+                    (f'%{word}%',) * 3
+                ).fetchall())
+                search_ms, (rows, _) = timed(lambda: search_arks(con, word, limit=100))
+                print(f'{word!r:>10}, first 100: LIKE {like_ms:8.1f} ms, search {search_ms:6.2f} ms '
+                      f'({len(like_rows)} / {len(rows)} rows)')
+            last_ms, _ = timed(lambda: search_arks(con, 'moth', cursor=str(args.count), limit=100))
+            print(f"'moth', page after the last key: {last_ms:.2f} ms")
+
+        client = flask_app.test_client()
+        start = time.perf_counter()
+        pages = found = 0
+        cursor = None
+        while True:
+            query = {'q': 'moth', 'limit': 1000}
+            if cursor:
+                query['cursor'] = cursor
+            data = client.get('/api/search', query_string=query).json
+            pages += 1
+            found += len(data['results'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        elapsed = time.perf_counter() - start
+        print(f"all 'moth' matches through /api/search: {found} in {pages} pages, "
+              f'{elapsed:.1f}s ({elapsed / pages * 1000:.1f} ms/page)')
+    finally:
+        remove_database(database)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Helpers shared by the benchmark scripts.
+
+Run benchmarks from the repository root, e.g.::
+
+    python -m benchmarks.bench_connections
+"""
+import os
+import sqlite3
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+with open(os.path.join(ROOT, 'schema.sql')) as f:
+    SCHEMA = f.read()
+
+# the layout before alembic revision 0002, for before/after comparisons
+LEGACY_SCHEMA = '''
+CREATE TABLE naan (
+  naan INTEGER PRIMARY KEY,
+  name TEXT,
+  description TEXT,
+  url TEXT
+);
+
+CREATE TABLE shoulder (
+  shoulder TEXT PRIMARY KEY,
+  naan INTEGER,
+  name TEXT,
+  description TEXT,
+  redirect_prefix TEXT,
+  template TEXT
+);
+
+CREATE TABLE ark (
+  identifier TEXT PRIMARY KEY,
+  naan INTEGER,
+  assigned_name TEXT,
+  shoulder TEXT,
+  url TEXT,
+  who TEXT,
+  what TEXT,
+  "when" TEXT,
+  created DATETIME,
+  updated DATETIME
+);
+
+CREATE INDEX idx_assigned_name ON ark (assigned_name);
+CREATE INDEX ix_ark_updated ON ark (updated);
+'''
+
+NAAN = 18474
+SHOULDERS = ['b2', 'b3', 'x4r']
+
+
+def create_database(path, count, shoulders=SHOULDERS, naan=NAAN, schema=SCHEMA):
+    """Create a synthetic ark database with `count` ARKs spread over `shoulders`."""
+    con = sqlite3.connect(path)
+    # build speed only; the app opens the file with its own pragmas
+    con.execute('PRAGMA journal_mode = OFF')
+    con.execute('PRAGMA synchronous = OFF')
+    con.executescript(schema)
+    con.execute('INSERT INTO naan (naan, name) VALUES (?, ?)', (naan, 'bench'))
+    con.executemany(
+        'INSERT INTO shoulder (shoulder, naan, name, redirect_prefix, template) VALUES (?, ?, ?, ?, ?)',
+        [(s, naan, s, f'https://example.org/{s}/', '.reedeedk') for s in shoulders]
+    )
+    con.executemany(
+        'INSERT INTO ark (identifier, naan, assigned_name, shoulder, url, who, what, "when") VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+        (
+            (f'{naan}/{s}{i:08d}', naan, f'{s}{i:08d}', s, f'https://example.org/item/{i}', '', '', '')
+            for i in range(count)
+            for s in [shoulders[i % len(shoulders)]]
+        )
+    )
+    con.commit()
+    con.close()
+    return path
+
+
+def ark_path(i, shoulders=SHOULDERS, naan=NAAN):
+    """Path of the i-th synthetic ARK (as created by create_database)."""
+    return f'{naan}/{shoulders[i % len(shoulders)]}{i:08d}'
+
+
+def temp_database(count, **kwargs):
+    fd, path = tempfile.mkstemp(suffix='.db', prefix='ark-bench-')
+    os.close(fd)
+    os.unlink(path)
+    return create_database(path, count, **kwargs)
+
+
+def remove_database(path):
+    for ext in ('', '-wal', '-shm'):
+        if os.path.exists(path + ext):
+            os.unlink(path + ext)
+
+
+def configure_app(app, database, **config):
+    """Point the app at `database` and rebuild its connection pool and caches."""
+    from app import cache, db, minter, shoulders
+
+    app.config['SQLITE_DATABASE'] = database
+    app.config.update(config)
+    db.init_app(app)
+    cache.init_app(app)
+    shoulders.init_app(app)
+    minter.init_app(app)
+
+
+def run_for(seconds, func):
+    """Call `func` repeatedly for `seconds`, return calls per second."""
+    calls = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        func(calls)
+        calls += 1
+    return calls / (time.perf_counter() - start)
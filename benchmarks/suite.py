@@ -0,0 +1,263 @@
+"""Resolver and minter throughput suite.
+
+Builds (and keeps) synthetic databases of the requested sizes, then
+measures for each size:
+
+- resolve latency percentiles for ARK hits, shoulder fallbacks and misses
+- single mint and batch mint throughput
+- noid-check rows/sec
+
+against the Flask test client or a locally started gunicorn. Every run
+appends one JSON record to --output, so results can be compared over
+time.
+
+    python -m benchmarks.suite --sizes 10k,1m --output benchmarks/results.jsonl
+    python -m benchmarks.suite --sizes 10k --target gunicorn --workers 2
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.common import NAAN, SHOULDERS, ark_path, configure_app, create_database
+
+API_KEY = 'bench-api-key'
+MINT_SHOULDER = SHOULDERS[0]
+
+
+def parse_size(value):
+    value = value.strip().lower()
+    for suffix, factor in (('k', 1000), ('m', 1000000)):
+        if value.endswith(suffix):
+            return int(float(value[:-1]) * factor)
+    return int(value)
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+
+    def pick(p):
+        return samples[min(len(samples) - 1, int(len(samples) * p))] * 1000
+
+    return {
+        'count': len(samples),
+        'mean_ms': statistics.fmean(samples) * 1000,
+        'p50_ms': pick(.50),
+        'p90_ms': pick(.90),
+        'p99_ms': pick(.99),
+        'max_ms': samples[-1] * 1000,
+    }
+
+
+class TestClientTarget(object):
+    name = 'testclient'
+
+    def __init__(self, database, cache):
+        from app import flask_app
+
+        configure_app(
+            flask_app,
+            database,
+            MINTER_API_KEY=API_KEY,
+            RESOLVER_CACHE_SIZE=10000 if cache else 0,
+        )
+        self.client = flask_app.test_client()
+
+    def get(self, path):
+        return self.client.get(path).status_code
+
+    def post(self, path, data):
+        return self.client.post(path, json=data, headers={'X-API-Key': API_KEY}).status_code
+
+    def close(self):
+        pass
+
+
+class GunicornTarget(object):
+    """gunicorn started from gunicorn_conf.py on a free local port."""
+    name = 'gunicorn'
+
+    def __init__(self, database, cache, workers):
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            self.port = s.getsockname()[1]
+
+        env = dict(
+            os.environ,
+            WEB_ENV='dev',
+            MINTER_API_KEY=API_KEY,
+            SQLITE_DATABASE=database,
+            RESOLVER_CACHE_SIZE='10000' if cache else '0',
+        )
+        self.process = subprocess.Popen(
+            [
+                sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_conf.py',
+                '--bind', f'127.0.0.1:{self.port}', '--workers', str(workers),
+                '--access-logfile', '/dev/null', 'wsgi:app',
+            ],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                if self.get('/') == 200:
+                    return
+            except OSError:
+                time.sleep(.1)
+        self.close()
+        raise RuntimeError('gunicorn did not start')
+
+    def request(self, method, path, body=None, headers=None):
+        # sync workers close the connection after each response
+        con = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+        try:
+            con.request(method, path, body=body, headers=headers or {})
+            response = con.getresponse()
+            response.read()
+            return response.status
+        finally:
+            con.close()
+
+    def get(self, path):
+        return self.request('GET', path)
+
+    def post(self, path, data):
+        headers = {'X-API-Key': API_KEY, 'Content-Type': 'application/json'}
+        return self.request('POST', path, json.dumps(data), headers)
+
+    def close(self):
+        self.process.terminate()
+        self.process.wait(10)
+
+
+def bench_resolve(target, size, requests):
+    rng = random.Random(size)
+    paths = {
+        'hit': lambda: f'/ark:/{ark_path(rng.randrange(size))}',
+        'shoulder': lambda: f'/ark:/{NAAN}/{rng.choice(SHOULDERS)}zz{rng.randrange(10 ** 9)}',
+        'miss': lambda: f'/ark:/{NAAN}/qq{rng.randrange(10 ** 9)}',
+    }
+    expected = {'hit': 302, 'shoulder': 302, 'miss': 404}
+
+    results = {}
+    for kind, make_path in paths.items():
+        samples = []
+        for _ in range(requests):
+            path = make_path()
+            start = time.perf_counter()
+            status = target.get(path)
+            samples.append(time.perf_counter() - start)
+            if status != expected[kind]:
+                raise RuntimeError(f'{path}: expected {expected[kind]}, got {status}')
+        results[kind] = percentiles(samples)
+    return results
+
+
+def bench_mint(target, count, batch_size):
+    data = {'naan': NAAN, 'shoulder': MINT_SHOULDER, 'url': 'https://example.org/minted'}
+    start = time.perf_counter()
+    for _ in range(count):
+        if target.post('/api/mint', data) != 201:
+            raise RuntimeError('mint failed')
+    single = count / (time.perf_counter() - start)
+
+    batch = dict(data, items=[{'url': 'https://example.org/minted'}] * batch_size)
+    batches = max(1, count // batch_size) if batch_size <= count else 1
+    start = time.perf_counter()
+    for _ in range(batches):
+        if target.post('/api/mint/batch', batch) != 201:
+            raise RuntimeError('batch mint failed')
+    batched = batches * batch_size / (time.perf_counter() - start)
+
+    return {'single_per_s': single, 'batch_per_s': batched, 'batch_size': batch_size}
+
+
+def bench_noid_check(database, size, workers):
+    env = dict(os.environ, FLASK_APP='app', SQLITE_DATABASE=database)
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, '-m', 'flask', 'noid-check', '--workers', str(workers)],
+        env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    elapsed = time.perf_counter() - start
+    return {'rows_per_s': size / elapsed, 'workers': workers}
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10k', help='comma separated database sizes, e.g. 10k,1m,10m')
+    parser.add_argument('--target', choices=['testclient', 'gunicorn'], default='testclient')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--requests', type=int, default=2000, help='resolve requests per kind')
+    parser.add_argument('--mints', type=int, default=500, help='single mints (and batch-minted ARKs)')
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--check-workers', type=int, default=os.cpu_count() or 1, help='noid-check worker processes')
+    parser.add_argument('--skip', default='', help='comma separated benchmarks to skip: resolve,mint,noid-check')
+    parser.add_argument('--cache', action='store_true', help='keep the resolver cache enabled')
+    parser.add_argument('--data-dir', default=os.path.join('benchmarks', 'data'), help='where synthetic databases are kept')
+    parser.add_argument('--output', default=os.path.join('benchmarks', 'results.jsonl'), help='JSON lines file results are appended to')
+    args = parser.parse_args()
+
+    skip = set(filter(None, args.skip.split(',')))
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    record = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'target': args.target,
+        'workers': args.workers if args.target == 'gunicorn' else None,
+        'cache': args.cache,
+        'results': {},
+    }
+
+    for size in map(parse_size, args.sizes.split(',')):
+        database = os.path.join(args.data_dir, f'ark-{size}.db')
+        if not os.path.exists(database):
+            print(f'building {database} ...', file=sys.stderr)
+            create_database(database, size)
+
+        result = {}
+        if args.target == 'gunicorn':
+            target = GunicornTarget(database, args.cache, args.workers)
+        else:
+            target = TestClientTarget(database, args.cache)
+        try:
+            if 'resolve' not in skip:
+                result['resolve'] = bench_resolve(target, size, args.requests)
+            if 'mint' not in skip:
+                result['mint'] = bench_mint(target, args.mints, args.batch_size)
+        finally:
+            target.close()
+
+        if 'noid-check' not in skip:
+            result['noid_check'] = bench_noid_check(database, size, args.check_workers)
+
+        record['results'][str(size)] = result
+        print(json.dumps({str(size): result}, indent=2))
+
+    with open(args.output, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+    print(f'results appended to {args.output}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
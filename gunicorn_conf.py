@@ -1,12 +1,16 @@
 # Gunicorn configuration for production
 import os
+import shutil
 
 # Binding
 bind = "0.0.0.0:8001"
 
 # Workers
 workers = 2
-worker_class = "sync"
+# GUNICORN_THREADS > 1 serves several requests per worker (gthread), which
+# lets MINT_GROUP_COMMIT share one transaction between concurrent mints
+threads = int(os.getenv("GUNICORN_THREADS", 1))
+worker_class = "gthread" if threads > 1 else "sync"
 
 # Logging
 # Use '-' to log to stdout/stderr (recommended for Docker)
@@ -40,3 +44,20 @@ graceful_timeout = 30
 
 # Keep alive
 keepalive = 2
+
+
+# Prometheus metrics
+# Each worker writes its samples to this directory and /metrics aggregates
+# all of them (see app/metrics.py). Must be set before workers import the app.
+prometheus_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/ark-prometheus")
+
+
+def on_starting(server):
+    # drop samples left over from a previous master
+    shutil.rmtree(prometheus_dir, ignore_errors=True)
+    os.makedirs(prometheus_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
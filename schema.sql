@@ -1,29 +1,124 @@
+-- Schema at alembic revision 0006. A database created from this file
+-- should be stamped with `alembic stamp head`.
+
 CREATE TABLE naan (
   naan INTEGER PRIMARY KEY,
   name TEXT,
   description TEXT,
-  url TEXT
+  url TEXT,
+  created DATETIME,
+  updated DATETIME
 );
 
 CREATE TABLE shoulder (
-  shoulder TEXT PRIMARY KEY,
-  naan INTEGER,
+  naan INTEGER NOT NULL,
+  shoulder TEXT NOT NULL,
   name TEXT,
   description TEXT,
-  FOREIGN KEY(naan) REFERENCES naan(naan)
-);
+  redirect_prefix TEXT,
+  template TEXT,
+  created DATETIME,
+  updated DATETIME,
+  PRIMARY KEY (naan, shoulder),
+  FOREIGN KEY (naan) REFERENCES naan(naan)
+) WITHOUT ROWID;
 
+-- clustered on identifier: a resolve is a single b-tree search
 CREATE TABLE ark (
-  identifier TEXT PRIMARY KEY,
+  identifier TEXT NOT NULL PRIMARY KEY,
   naan INTEGER,
   assigned_name TEXT,
   shoulder TEXT,
   url TEXT,
-  meta TEXT,
+  who TEXT,
+  what TEXT,
+  "when" TEXT,
+  created DATETIME,
+  updated DATETIME,
   FOREIGN KEY (naan) REFERENCES naan(naan),
-  FOREIGN KEY (shoulder) REFERENCES shoulder(shoulder)
+  FOREIGN KEY (naan, shoulder) REFERENCES shoulder(naan, shoulder)
+) WITHOUT ROWID;
+
+-- per-shoulder keyset scans (noid-check -s, ark-export -s) in identifier
+-- order, covering the (naan, shoulder) join to shoulder
+CREATE INDEX ix_ark_shoulder ON ark (shoulder, identifier, naan);
+CREATE INDEX ix_ark_updated ON ark (updated);
+
+-- counter-backed templates (sequential, or permuted random), alembic 0004
+CREATE TABLE minter_counter (
+  naan INTEGER NOT NULL,
+  shoulder TEXT NOT NULL,
+  template TEXT NOT NULL,
+  value INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (naan, shoulder, template)
+);
+
+-- resolutions per UTC day (RESOLUTION_STATS, app/resolution_stats.py):
+-- per ARK, and per shoulder for shoulder fallbacks, alembic 0005
+CREATE TABLE resolution_stats (
+  day TEXT NOT NULL,
+  identifier TEXT NOT NULL,
+  naan INTEGER,
+  shoulder TEXT,
+  hits INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (day, identifier)
+);
+
+CREATE TABLE shoulder_resolution_stats (
+  day TEXT NOT NULL,
+  naan INTEGER NOT NULL,
+  shoulder TEXT NOT NULL,
+  hits INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (day, naan, shoulder)
+);
+
+-- target URL checks of `flask ark-linkcheck`, one row per ARK, alembic 0006
+CREATE TABLE link_check (
+  identifier TEXT NOT NULL PRIMARY KEY,
+  url TEXT,
+  status INTEGER,
+  error TEXT,
+  final_url TEXT,
+  latency_ms REAL,
+  checked TIMESTAMP
+);
+
+-- full-text search over who/what/when (app/search.py): a contentless FTS5
+-- index, keyed on ark_search_key.id since ark has no rowid; ARKs without
+-- metadata are left out. The triggers keep it in sync with ark.
+CREATE TABLE ark_search_key (
+  id INTEGER PRIMARY KEY,
+  identifier TEXT NOT NULL UNIQUE
+);
+
+CREATE VIRTUAL TABLE ark_search USING fts5(
+  who, what, "when", content='', tokenize='unicode61 remove_diacritics 2'
 );
 
-CREATE INDEX idx_assigned_name ON ark(assigned_name);
+CREATE TRIGGER ark_search_insert AFTER INSERT ON ark
+WHEN coalesce(new.who, '') || coalesce(new.what, '') || coalesce(new."when", '') <> ''
+BEGIN
+  INSERT INTO ark_search_key (identifier) VALUES (new.identifier);
+  INSERT INTO ark_search (rowid, who, what, "when")
+    SELECT id, new.who, new.what, new."when" FROM ark_search_key WHERE identifier = new.identifier;
+END;
 
+CREATE TRIGGER ark_search_delete AFTER DELETE ON ark BEGIN
+  INSERT INTO ark_search (ark_search, rowid, who, what, "when")
+    SELECT 'delete', id, old.who, old.what, old."when" FROM ark_search_key WHERE identifier = old.identifier;
+  DELETE FROM ark_search_key WHERE identifier = old.identifier;
+END;
 
+-- keeps the key (and so the search order) of ARKs that keep some metadata;
+-- NOT EXISTS rather than OR IGNORE, which an outer upsert would override
+CREATE TRIGGER ark_search_update AFTER UPDATE OF who, what, "when" ON ark BEGIN
+  INSERT INTO ark_search (ark_search, rowid, who, what, "when")
+    SELECT 'delete', id, old.who, old.what, old."when" FROM ark_search_key WHERE identifier = old.identifier;
+  DELETE FROM ark_search_key
+    WHERE identifier = new.identifier AND coalesce(new.who, '') || coalesce(new.what, '') || coalesce(new."when", '') = '';
+  INSERT INTO ark_search_key (identifier)
+    SELECT new.identifier WHERE coalesce(new.who, '') || coalesce(new.what, '') || coalesce(new."when", '') <> ''
+    AND NOT EXISTS (SELECT 1 FROM ark_search_key WHERE identifier = new.identifier);
+  INSERT INTO ark_search (rowid, who, what, "when")
+    SELECT id, new.who, new.what, new."when" FROM ark_search_key WHERE identifier = new.identifier;
+END;
@@ -0,0 +1,51 @@
+"""Bloom filter (BLOOM_FILTER) misses in the resolver and the catch-up."""
+import pytest
+
+from conftest import NAAN, TEST_DATABASE_URI
+from app.bloom import ArkFilter
+from app.db import get_db, get_pool
+
+INSERT_SQL = 'INSERT INTO ark (identifier, naan, assigned_name, shoulder, url, updated) VALUES (?, ?, ?, ?, ?, {now})'
+
+
+def insert_ark(con, name, url):
+    sql = INSERT_SQL.format(now=get_pool().NOW)
+    con.execute(sql, (f'{NAAN}/{name}', NAAN, name, 'b2', url))
+
+
+def test_miss_is_not_cached_for_long(app, configure):
+    # RESOLVER_CACHE_TTL would keep the shoulder redirect for 300 s
+    configure(BLOOM_FILTER=True, BLOOM_FILTER_INTERVAL=3600, RESOLVER_CACHE_NEGATIVE_TTL=0)
+    client = app.test_client()
+    response = client.get(f'/ark:/{NAAN}/b2new')
+    assert response.headers['Location'] == 'https://example.org/b2/new'
+
+    # minted by another worker: this one's filter has not caught up yet
+    with app.app_context():
+        con = get_db()
+        insert_ark(con, 'b2new', 'https://example.org/item/new')
+        con.commit()
+        app.extensions['ark_filter']._checked_at = None
+
+    response = client.get(f'/ark:/{NAAN}/b2new')
+    assert response.headers['Location'] == 'https://example.org/item/new'
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URI, reason='PostgreSQL only: SQLite relies on the overlap')
+def test_catch_up_waits_for_open_transactions(app):
+    with app.app_context():
+        pool = get_pool()
+        ark_filter = ArkFilter(interval=0, overlap=0)
+        con = get_db()
+        assert not ark_filter.might_contain(con, NAAN, f'{NAAN}/b2slow')
+        con.rollback()
+
+        # `updated` is the transaction start, long before its commit
+        slow = pool.connect()
+        insert_ark(slow, 'b2slow', 'https://example.org/item/slow')
+        assert not ark_filter.might_contain(con, NAAN, f'{NAAN}/b2slow')
+        con.rollback()
+        slow.commit()
+        slow.close()
+
+        assert ark_filter.might_contain(con, NAAN, f'{NAAN}/b2slow')
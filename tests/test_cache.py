@@ -0,0 +1,89 @@
+"""Resolver cache (RESOLVER_CACHE_*)."""
+from conftest import NAAN, mint
+from app import cache as cache_module
+from app.cache import MISSING, ResolutionCache
+from app.db import get_db
+
+TARGET = ('https://example.org/1', True, 'b2', None)
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_expiry(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, 'monotonic', clock)
+    cache = ResolutionCache(ttl=300, negative_ttl=30)
+    cache.set('a', TARGET)
+    cache.set('b', None)
+    cache.set('c', TARGET, ttl=30)
+
+    clock.now += 29
+    assert cache.get('a') == TARGET
+    assert cache.get('b') is None
+    assert cache.get('c') == TARGET
+
+    clock.now += 2
+    assert cache.get('a') == TARGET
+    assert cache.get('b') is MISSING
+    assert cache.get('c') is MISSING
+
+    clock.now += 300
+    assert cache.get('a') is MISSING
+
+
+def test_lru_eviction():
+    cache = ResolutionCache(maxsize=2)
+    cache.set('a', TARGET)
+    cache.set('b', TARGET)
+    cache.get('a')
+    cache.set('c', TARGET)
+    assert cache.get('b') is MISSING
+    assert cache.get('a') == TARGET
+    assert cache.get('c') == TARGET
+    assert cache.stats()['evictions'] == 1
+
+
+def test_disabled():
+    cache = ResolutionCache(maxsize=0)
+    cache.set('a', TARGET)
+    assert cache.get('a') is MISSING
+
+
+def test_mint_invalidates_miss(app, client):
+    assert client.get(f'/ark:/{NAAN}/x9unknown').status_code == 404
+    cache = app.extensions['resolution_cache']
+    assert cache.get(f'{NAAN}/x9unknown') is None
+
+    identifier = mint(client, url='https://example.org/new')
+    assert cache.get(identifier) is MISSING
+
+
+def test_fallbacks_use_negative_ttl(app, client, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, 'monotonic', clock)
+    identifier = mint(client, url='https://example.org/item')
+    assert client.get(f'/ark:/{identifier}').status_code == 302
+    response = client.get(f'/ark:/{NAAN}/b2zzzz1')
+    assert response.headers['Location'] == 'https://example.org/b2/zzzz1'
+
+    # minted by another worker
+    with app.app_context():
+        con = get_db()
+        con.execute(
+            'INSERT INTO ark (identifier, naan, assigned_name, shoulder, url) VALUES (?, ?, ?, ?, ?)',
+            (f'{NAAN}/b2zzzz1', NAAN, 'b2zzzz1', 'b2', 'https://example.org/zzzz1')
+        )
+        con.commit()
+
+    clock.now += app.config['RESOLVER_CACHE_NEGATIVE_TTL'] + 1
+    response = client.get(f'/ark:/{NAAN}/b2zzzz1')
+    assert response.headers['Location'] == 'https://example.org/zzzz1'
+    cache = app.extensions['resolution_cache']
+    # the ARK row itself is still cached
+    assert cache.get(identifier) is not MISSING
@@ -0,0 +1,92 @@
+"""Liveness and readiness endpoints."""
+import pytest
+
+from conftest import TEST_DATABASE_URI
+from app.db import get_db, get_pool
+
+
+@pytest.fixture
+def table_checks(app, monkeypatch):
+    """List that grows by one for every readiness query of the database."""
+    calls = []
+    with app.app_context():
+        pool_class = type(get_pool())
+    table_names = pool_class.table_names
+    monkeypatch.setattr(pool_class, 'table_names', lambda self, con: calls.append(1) or table_names(self, con))
+    return calls
+
+
+def test_live_and_ready(client, table_checks):
+    response = client.get('/health/live')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'alive'
+    assert table_checks == []
+
+    response = client.get('/health/ready')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['status'] == 'ready'
+    assert body['database']['backend'] == ('postgresql' if TEST_DATABASE_URI else 'sqlite')
+    assert body['worker']['requests'] >= 2
+    assert table_checks == [1]
+
+    assert client.get('/health').get_json()['status'] == 'healthy'
+
+
+def test_ready_cached(configure, table_checks):
+    client = configure(HEALTH_CHECK_INTERVAL=3600).test_client()
+    for _ in range(3):
+        assert client.get('/health/ready').status_code == 200
+    assert client.get('/health').status_code == 200
+    assert table_checks == [1]
+    assert client.get('/health/ready').get_json()['checked_seconds_ago'] > 0
+
+    client = configure(HEALTH_CHECK_INTERVAL=0).test_client()
+    for _ in range(3):
+        assert client.get('/health/ready').status_code == 200
+    assert table_checks == [1, 1, 1, 1]
+
+
+def test_missing_table(app, client):
+    with app.app_context():
+        con = get_db()
+        con.execute('ALTER TABLE naan RENAME TO naan_old')
+        con.commit()
+
+    response = client.get('/health/ready')
+    assert response.status_code == 503
+    body = response.get_json()
+    assert body['status'] == 'unavailable'
+    assert body['database']['missing_tables'] == ['naan']
+
+    response = client.get('/health')
+    assert response.status_code == 503
+    assert response.get_json()['error'] == 'missing tables: naan'
+    # liveness doesn't depend on the database
+    assert client.get('/health/live').status_code == 200
+
+
+def test_missing_database(configure, tmp_path):
+    if TEST_DATABASE_URI:
+        app = configure(DATABASE_URI=TEST_DATABASE_URI.replace('/ark_test', '/ark_missing_database'))
+    else:
+        app = configure(SQLITE_DATABASE=str(tmp_path / 'missing.db'))
+    client = app.test_client()
+
+    response = client.get('/health/ready')
+    assert response.status_code == 503
+    assert response.get_json()['database']['error']
+    assert client.get('/health').status_code == 503
+    assert client.get('/health/live').status_code == 200
+
+
+def test_unreadable_database(configure, tmp_path):
+    if TEST_DATABASE_URI:
+        pytest.skip('SQLite only')
+    path = tmp_path / 'garbage.db'
+    path.write_bytes(b'not a database' * 1000)
+    client = configure(SQLITE_DATABASE=str(path)).test_client()
+
+    response = client.get('/health/ready')
+    assert response.status_code == 503
+    assert 'not a database' in response.get_json()['database']['error']
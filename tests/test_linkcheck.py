@@ -0,0 +1,118 @@
+"""`flask ark-linkcheck` against a local stand-in HTTP server."""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from conftest import mint
+from app.commands import ark_linkcheck
+from app.db import get_db
+
+# path -> expected (status, error) of special targets
+SPECIAL = {
+    '/missing': (404, None),
+    '/moved': (200, None),
+    '/loop': (302, 'too many redirects'),
+    '/nohead': (200, None),
+    '/slow': (None, 'timeout'),
+}
+OPTIONS = ['--per-host', '4', '--delay', '0', '--timeout', '0.5']
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def respond(self, status, location=None):
+        self.send_response(status)
+        if location:
+            self.send_header('Location', location)
+        body = b'' if self.command == 'HEAD' else b'ok'
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        if self.path == '/nohead':
+            return self.respond(405)
+        self.do_GET()
+
+    def do_GET(self):
+        if self.path == '/missing':
+            return self.respond(404)
+        if self.path == '/moved':
+            return self.respond(301, '/item/moved-here')
+        if self.path == '/loop':
+            return self.respond(302, '/loop')
+        if self.path == '/slow':
+            time.sleep(2)
+        self.respond(200)
+
+
+@pytest.fixture
+def server():
+    server = StandInServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+
+
+def link_checks(app):
+    with app.app_context():
+        rows = get_db().execute('SELECT url, status, error, final_url FROM link_check')
+        return {url: (status, error, final_url) for url, status, error, final_url in rows}
+
+
+def test_outcomes(app, runner, server):
+    client = app.test_client()
+    urls = [f'{server}/item/{i}' for i in range(10)] + [server + path for path in SPECIAL] + ['ftp://example.org/x']
+    for url in urls:
+        mint(client, url=url)
+
+    result = runner.invoke(ark_linkcheck, OPTIONS)
+    assert result.exit_code == 0, result.output
+    assert result.output.startswith(f'Checked {len(urls)} links')
+
+    checks = link_checks(app)
+    assert len(checks) == len(urls)
+    for path, expected in SPECIAL.items():
+        assert checks[server + path][:2] == expected, path
+    assert checks[server + '/moved'][2] == server + '/item/moved-here'
+    assert checks['ftp://example.org/x'][1] == 'not an http(s) URL'
+    for i in range(10):
+        assert checks[f'{server}/item/{i}'] == (200, None, None)
+
+    # everything was checked just now
+    result = runner.invoke(ark_linkcheck, OPTIONS)
+    assert result.exit_code == 0, result.output
+    assert result.output.startswith('Checked 0 links')
+
+
+def test_changed_url_is_rechecked(app, runner, server):
+    identifier = mint(app.test_client(), url=f'{server}/item/1')
+    assert runner.invoke(ark_linkcheck, OPTIONS).exit_code == 0
+
+    with app.app_context():
+        con = get_db()
+        con.execute('UPDATE ark SET url = ? WHERE identifier = ?', (f'{server}/missing', identifier))
+        con.commit()
+    result = runner.invoke(ark_linkcheck, OPTIONS)
+    assert result.output.startswith('Checked 1 links')
+    assert link_checks(app) == {f'{server}/missing': (404, None, None)}
+
+
+def test_missing_table(app, runner):
+    with app.app_context():
+        con = get_db()
+        con.execute('DROP TABLE link_check')
+        con.commit()
+    result = runner.invoke(ark_linkcheck, OPTIONS)
+    assert result.exit_code != 0
+    assert 'alembic upgrade head' in result.output
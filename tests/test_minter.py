@@ -0,0 +1,155 @@
+"""Counter-based minting and group commit (MINT_GROUP_COMMIT)."""
+import threading
+
+import pytest
+
+from conftest import API_KEY, NAAN, mint
+from app.db import get_db, get_pool
+from app.minter import CounterBlocks, GroupCommitWriter, permutation_key, permute, read_counter
+from app.noid import NamespaceExhausted
+
+
+def test_group_commit_mint(app, configure):
+    configure(MINT_GROUP_COMMIT=True)
+    client = app.test_client()
+    identifiers = [mint(client, url=f'https://example.org/{i}') for i in range(3)]
+    with app.app_context():
+        rows = get_db().execute('SELECT identifier FROM ark').fetchall()
+    assert {row[0] for row in rows} == set(identifiers)
+
+
+class BlockedPool(object):
+    """Pool whose connect() waits for `release`, to keep the writer busy."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.connecting = threading.Event()
+        self.release = threading.Event()
+
+    def connect(self):
+        self.connecting.set()
+        self.release.wait()
+        return self.pool.connect()
+
+
+def test_group_commit_timeout_drops_row(app):
+    with app.app_context():
+        pool = BlockedPool(get_pool())
+        writer = GroupCommitWriter(pool, timeout=0.2)
+        sql = 'INSERT INTO naan (naan, name) VALUES (?, ?)'
+
+        # the first row is taken by the (blocked) writer, so it is waited for
+        first = threading.Thread(target=writer.insert, args=(sql, (1, 'first')))
+        first.start()
+        assert pool.connecting.wait(5)
+        with pytest.raises(TimeoutError):
+            writer.insert(sql, (2, 'dropped'))
+
+        pool.release.set()
+        first.join()
+        assert writer.insert(sql, (3, 'third'))
+        naans = {row[0] for row in get_db().execute('SELECT naan FROM naan')}
+        assert naans == {NAAN, 1, 3}
+
+
+@pytest.mark.parametrize('capacity', [1, 2, 3, 10, 16, 29, 100, 290, 841, 1000, 4096])
+def test_permute_bijection(capacity):
+    for shoulder in ('b2', 's3'):
+        key = permutation_key('secret', NAAN, shoulder, '.rdk')
+        assert sorted(permute(value, capacity, key) for value in range(capacity)) == list(range(capacity))
+
+
+def test_permute_cycle_walking():
+    key = permutation_key('secret', NAAN, 'b2', '.rdk')
+    # 10 and 16 share the 4-bit Feistel domain: with 16 nothing walks, so
+    # the values that leave [0, 10) after one pass are walked back into it
+    escaped = [value for value in range(10) if permute(value, 16, key) >= 10]
+    assert escaped
+    for value in escaped:
+        assert permute(value, 10, key) < 10
+
+    other = permutation_key('other secret', NAAN, 'b2', '.rdk')
+    assert [permute(v, 1000, key) for v in range(20)] != [permute(v, 1000, other) for v in range(20)]
+    assert [permute(v, 1000, key) for v in range(20)] != list(range(20))
+
+
+@pytest.mark.parametrize('value', [10, 11, 1000])
+def test_permute_out_of_range(value):
+    with pytest.raises(NamespaceExhausted):
+        permute(value, 10, permutation_key('secret', NAAN, 'b2', '.rd'))
+
+
+def test_permute_mint_exhausted(configure):
+    client = configure(MINT_RANDOM_MODE='permute').test_client()
+
+    def mint_rd():
+        return client.post(
+            '/api/mint', headers={'X-API-Key': API_KEY},
+            json={'naan': NAAN, 'shoulder': 'b2', 'url': 'https://example.org/item', 'template': '.rd'},
+        )
+
+    identifiers = {mint_rd().get_json()['identifier'] for _ in range(10)}
+    assert identifiers == {f'{NAAN}/b2{i}' for i in range(10)}
+    response = mint_rd()
+    assert response.status_code == 409
+    assert response.get_json()['error'] == 'Template exhausted after 10 identifiers'
+
+
+def test_counter_blocks_share_small_namespace(app):
+    # .sdd: 100 names, less than two blocks of 100
+    workers = [CounterBlocks(block_size=100), CounterBlocks(block_size=100)]
+    with app.app_context():
+        con = get_db()
+        values = []
+        for i in range(100):
+            values += workers[i % 2].take(con, NAAN, 's3', '.sdd', capacity=100)
+        assert sorted(values) == list(range(100))
+        for worker in workers:
+            with pytest.raises(NamespaceExhausted):
+                worker.take(con, NAAN, 's3', '.sdd', capacity=100)
+        assert read_counter(con, NAAN, 's3', '.sdd') == 100
+
+
+def test_counter_blocks_clamped(app):
+    first, second = CounterBlocks(block_size=100), CounterBlocks(block_size=100)
+    with app.app_context():
+        con = get_db()
+        assert first.take(con, NAAN, 's3', '.sddd', capacity=1000) == [0]
+        taken = []
+        while True:
+            try:
+                taken += second.take(con, NAAN, 's3', '.sddd', count=7, capacity=1000)
+            except NamespaceExhausted:
+                break
+        # full blocks while two are left, then only what is minted
+        assert taken == list(range(100, 996))
+        assert read_counter(con, NAAN, 's3', '.sddd') == 1000
+        # the batch of 7 that didn't fit left its 4 values
+        assert second.take(con, NAAN, 's3', '.sddd', count=4, capacity=1000) == list(range(996, 1000))
+        # the first worker still hands out its block
+        assert first.take(con, NAAN, 's3', '.sddd', count=99, capacity=1000) == list(range(1, 100))
+        with pytest.raises(NamespaceExhausted):
+            first.take(con, NAAN, 's3', '.sddd', capacity=1000)
+
+        # unbounded templates are never clamped
+        assert len(first.take(con, NAAN, 's3', '.zd', count=150)) == 150
+        assert read_counter(con, NAAN, 's3', '.zd') == 150
+
+
+def test_mint_small_namespace_two_workers(app, client):
+    def mint_sdd():
+        return client.post(
+            '/api/mint', headers={'X-API-Key': API_KEY},
+            json={'naan': NAAN, 'shoulder': 's3', 'url': 'https://example.org/item', 'template': '.sdd'},
+        )
+
+    first = app.extensions['counter_blocks']
+    second = CounterBlocks(block_size=first.block_size)
+    identifiers = set()
+    for i in range(100):
+        app.extensions['counter_blocks'] = (first, second)[i % 2]
+        response = mint_sdd()
+        assert response.status_code == 201, response.get_json()
+        identifiers.add(response.get_json()['identifier'])
+    assert identifiers == {f'{NAAN}/s3{i:02d}' for i in range(100)}
+    assert mint_sdd().status_code == 409
@@ -0,0 +1,92 @@
+"""NOID templates and NCDA check digits."""
+import secrets
+
+import pytest
+
+from conftest import NAAN
+from app.noid import EXTENDED_CHARS, NamespaceExhausted, compile_template, generate_noid, validate_noid
+
+TEMPLATES = ('.reedeedk', '.sdddk', '.zek', 'x.rdek')
+
+
+def legacy_check_digit(s):
+    """The NCDA computation of the original per-character implementation."""
+    total = 0
+    for i, c in enumerate(s, start=1):
+        if c in EXTENDED_CHARS:
+            total += i * EXTENDED_CHARS.index(c)
+    return EXTENDED_CHARS[total % 29]
+
+
+def legacy_validate(assigned_name, naan, shoulder):
+    full_ark = f'{naan}/{shoulder}{assigned_name}'
+    expected = legacy_check_digit(full_ark[:-1])
+    return (full_ark[-1] == expected, expected, full_ark[-1])
+
+
+def values(compiled, count=2000):
+    """Every value of small masks, a random sample of large ones."""
+    if compiled.capacity <= count:
+        return range(compiled.capacity)
+    return [0, compiled.capacity - 1] + [secrets.randbelow(compiled.capacity) for _ in range(count)]
+
+
+@pytest.mark.parametrize('template', TEMPLATES)
+@pytest.mark.parametrize('shoulder', ['b2', 's3', ''])
+def test_check_digit_parity(template, shoulder):
+    compiled = compile_template(template)
+    for value in values(compiled):
+        name = compiled.generate(NAAN, shoulder, sequence=value)
+        assert name[-1] == legacy_check_digit(f'{NAAN}/{shoulder}{name[:-1]}')
+        assert compiled.validate(name, NAAN, shoulder) == legacy_validate(name, NAAN, shoulder) == (True, name[-1], name[-1])
+
+        wrong = name[:-1] + EXTENDED_CHARS[(EXTENDED_CHARS.index(name[-1]) + 1) % 29]
+        assert compiled.validate(wrong, NAAN, shoulder) == legacy_validate(wrong, NAAN, shoulder)
+        assert not compiled.validate(wrong, NAAN, shoulder)[0]
+
+
+def test_z_template_grows():
+    compiled = compile_template('.zek')
+    assert compiled.capacity == 29
+    names = [compiled.generate(NAAN, 'b2', sequence=value) for value in (0, 28, 29, 29 * 29 + 5)]
+    assert [len(name) for name in names] == [2, 2, 3, 4]
+    for name in names:
+        assert validate_noid(name, '.zek', NAAN, 'b2') == legacy_validate(name, NAAN, 'b2')
+    with pytest.raises(NamespaceExhausted):
+        compile_template('.sdddk').generate(NAAN, 's3', sequence=1000)
+
+
+@pytest.mark.parametrize('template', ['.reedeedk', 'x.rdek', '.reedede'])
+def test_random_agrees_with_generate(template):
+    compiled = compile_template(template)
+    lengths = {len(compiled.generate(NAAN, 'b2', sequence=0))}
+    names = compiled.generate_many(500, NAAN, 'b2') + [generate_noid(template, NAAN, 'b2') for _ in range(100)]
+    for name in names:
+        assert len(name) in lengths
+        assert name.startswith(compiled.prefix)
+        body = name[len(compiled.prefix):]
+        for c, alphabet in zip(body, compiled.alphabets):
+            assert c in alphabet
+        assert compiled.validate(name, NAAN, 'b2')[0]
+        if compiled.has_check:
+            assert legacy_validate(name, NAAN, 'b2')[0]
+    if compiled.capacity > 10 ** 6:
+        assert len(set(names)) > 590
+
+
+def test_validate_foreign_names():
+    # names not made by the template are checked over the whole string
+    for name in ('q', 'y123', 'b2r20t674'):
+        assert validate_noid(name, 'x.rdek', NAAN, 'b2') == legacy_validate(name, NAAN, 'b2')
+    assert validate_noid('', '.reedeedk', NAAN, 'b2') == (False, None, None)
+    assert validate_noid('anything', '.reedede', NAAN, 'b2') == (True, None, None)
+    assert validate_noid('anything', 'bad', NAAN, 'b2') == (False, None, None)
+
+
+@pytest.mark.parametrize('template', ['.sdddk', '.zek'])
+def test_sequential_needs_counter(template):
+    compiled = compile_template(template)
+    with pytest.raises(ValueError):
+        compiled.generate(NAAN, 's3')
+    with pytest.raises(ValueError):
+        compiled.generate_many(2, NAAN, 's3')
@@ -0,0 +1,84 @@
+"""flask noid-check over the ark table."""
+import csv
+import json
+
+import pytest
+
+from conftest import NAAN
+from app.commands import noid_check
+from app.db import get_db
+from app.noid import EXTENDED_CHARS, compile_template
+
+
+def wrong_check(name):
+    return name[:-1] + EXTENDED_CHARS[(EXTENDED_CHARS.index(name[-1]) + 1) % len(EXTENDED_CHARS)]
+
+
+@pytest.fixture
+def arks(app):
+    """20 ARKs under b2, every fourth with a wrong check digit; returns the invalid ones."""
+    compiled = compile_template('.reedeedk')
+    invalid = []
+    with app.app_context():
+        con = get_db()
+        for i in range(20):
+            name = 'b2' + compiled.generate(NAAN, 'b2', sequence=i * 7919)
+            if i % 4 == 0:
+                name = wrong_check(name)
+                invalid.append(f'{NAAN}/{name}')
+            con.execute(
+                'INSERT INTO ark (identifier, naan, assigned_name, shoulder, url) VALUES (?, ?, ?, ?, ?)',
+                (f'{NAAN}/{name}', NAAN, name, 'b2', 'https://example.org/')
+            )
+        # written without a naan, like the rows the old importer left behind
+        name = 'b2' + compiled.generate(NAAN, 'b2', sequence=1)
+        con.execute(
+            'INSERT INTO ark (identifier, naan, assigned_name, shoulder, url) VALUES (?, NULL, ?, ?, ?)',
+            (f'{NAAN}/{name}', name, 'b2', 'https://example.org/')
+        )
+        con.commit()
+    return sorted(invalid)
+
+
+def summary(output):
+    lines = dict(line.split(':', 1) for line in output.splitlines() if ':' in line and not line.startswith(' '))
+    return {key: lines[key].strip() for key in ('Total checked', 'Valid', 'Invalid')}
+
+
+def read_invalid(path):
+    with open(path, newline='') as f:
+        return sorted(row['identifier'] for row in csv.DictReader(f))
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_check(runner, arks, tmp_path, workers):
+    output = tmp_path / 'invalid.csv'
+    result = runner.invoke(noid_check, ['-w', str(workers), '--chunk-size', '3', '-o', str(output)])
+    assert result.exit_code == 0, result.output
+    assert summary(result.output) == {'Total checked': '21', 'Valid': '16', 'Invalid': '5'}
+    assert read_invalid(output) == arks
+
+
+def test_resume(runner, arks, tmp_path):
+    output = tmp_path / 'invalid.jsonl'
+    checkpoint = tmp_path / 'invalid.jsonl.checkpoint'
+    result = runner.invoke(noid_check, ['-w', '1', '--chunk-size', '4', '--limit', '8', '-o', str(output)])
+    assert result.exit_code == 0, result.output
+    assert summary(result.output)['Total checked'] == '8'
+    state = json.loads(checkpoint.read_text())
+    assert state['counts']['total'] == 8
+    first = [json.loads(line)['identifier'] for line in output.read_text().splitlines()]
+    assert all(identifier <= state['after'] for identifier in first)
+
+    result = runner.invoke(noid_check, ['-w', '2', '--chunk-size', '4', '-o', str(output), '--resume'])
+    assert result.exit_code == 0, result.output
+    assert f"Resuming after {state['after']} (8 already checked)" in result.output
+    assert summary(result.output) == {'Total checked': '21', 'Valid': '16', 'Invalid': '5'}
+    identifiers = [json.loads(line)['identifier'] for line in output.read_text().splitlines()]
+    assert sorted(identifiers) == arks
+
+
+def test_resume_needs_checkpoint(runner, arks):
+    result = runner.invoke(noid_check, ['--resume'])
+    assert result.exit_code != 0
+    assert '--resume needs --output or --checkpoint' in result.output
@@ -0,0 +1,80 @@
+"""Resolver redirects: REDIRECT_POLICIES, caching headers, HEAD and 304."""
+from conftest import NAAN, mint
+
+
+def test_default_policy(client):
+    identifier = mint(client, url='https://example.org/item/1')
+    response = client.get(f'/ark:/{identifier}')
+    assert response.status_code == 302
+    assert response.headers['Location'] == 'https://example.org/item/1'
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert response.headers['ETag']
+    assert response.headers['Last-Modified']
+
+
+def test_policy_per_naan_and_shoulder(client, configure):
+    configure(REDIRECT_POLICIES={
+        str(NAAN): {'status': 301, 'max_age': 86400},
+        f'{NAAN}/s3': {'status': 303},
+    })
+    b2 = mint(client, shoulder='b2')
+    s3 = mint(client, shoulder='s3')
+
+    response = client.get(f'/ark:/{b2}')
+    assert response.status_code == 301
+    assert response.cache_control.public
+    assert response.cache_control.max_age == 86400
+
+    # the shoulder entry wins, max_age still comes from the NAAN
+    response = client.get(f'/ark:/{s3}')
+    assert response.status_code == 303
+    assert response.cache_control.max_age == 86400
+
+    # shoulder fallbacks use the shoulder's policy too
+    response = client.get(f'/ark:/{NAAN}/s3unknown')
+    assert response.status_code == 303
+    assert response.headers['Location'].startswith('https://example.org/s3/')
+
+
+def test_defaults_from_config(client, configure):
+    configure(REDIRECT_STATUS=307, REDIRECT_MAX_AGE=60)
+    identifier = mint(client)
+    response = client.get(f'/ark:/{identifier}')
+    assert response.status_code == 307
+    assert response.headers['Cache-Control'] == 'public, max-age=60'
+
+
+def test_head(client):
+    identifier = mint(client, url='https://example.org/item/1')
+    get = client.get(f'/ark:/{identifier}')
+    head = client.head(f'/ark:/{identifier}')
+    assert head.status_code == 302
+    assert head.data == b''
+    for header in ('Location', 'ETag', 'Last-Modified', 'Cache-Control'):
+        assert head.headers[header] == get.headers[header]
+
+
+def test_not_modified(client):
+    identifier = mint(client)
+    response = client.get(f'/ark:/{identifier}')
+    etag = response.headers['ETag']
+    last_modified = response.headers['Last-Modified']
+
+    response = client.get(f'/ark:/{identifier}', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+    response = client.get(f'/ark:/{identifier}', headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 304
+
+    response = client.get(f'/ark:/{identifier}', headers={'If-None-Match': '"other"'})
+    assert response.status_code == 302
+
+
+def test_etag_changes_with_policy(client, configure):
+    identifier = mint(client)
+    etag = client.get(f'/ark:/{identifier}').headers['ETag']
+    configure(REDIRECT_STATUS=301)
+    response = client.get(f'/ark:/{identifier}', headers={'If-None-Match': etag})
+    assert response.status_code == 301
@@ -0,0 +1,37 @@
+"""Resolution counts (RESOLUTION_STATS)."""
+from conftest import API_KEY, NAAN, mint
+from app.db import get_db
+from app.resolution_stats import get_hit_counter
+
+
+def test_counts_arks_and_shoulder_fallbacks(app, configure):
+    configure(RESOLUTION_STATS=True, RESOLUTION_STATS_INTERVAL=3600)
+    client = app.test_client()
+    identifier = mint(client)
+    for _ in range(3):
+        client.get(f'/ark:/{identifier}')
+    # made-up names under a shoulder don't get rows of their own
+    for name in ('b2junk1', 'b2junk2', 's3junk'):
+        client.get(f'/ark:/{NAAN}/{name}')
+    with app.app_context():
+        get_hit_counter().flush()
+
+    headers = {'X-API-Key': API_KEY}
+    top = client.get('/api/stats/top', headers=headers).get_json()
+    assert top['arks'] == [{'identifier': identifier, 'shoulder': 'b2', 'hits': 3}]
+
+    days = client.get('/api/stats/daily', headers=headers).get_json()['days']
+    assert [(d['hits'], d['identifiers'], d['shoulder_hits']) for d in days] == [(6, 1, 3)]
+
+    days = client.get('/api/stats/daily?shoulder=b2', headers=headers).get_json()['days']
+    assert [(d['hits'], d['identifiers'], d['shoulder_hits']) for d in days] == [(5, 1, 2)]
+
+
+def test_missing_tables(app, client):
+    with app.app_context():
+        con = get_db()
+        con.execute('DROP TABLE resolution_stats')
+        con.commit()
+    response = client.get('/api/stats/top', headers={'X-API-Key': API_KEY})
+    assert response.status_code == 503
+    assert 'alembic upgrade head' in response.get_json()['error']
@@ -0,0 +1,56 @@
+"""Bulk resolve (/api/resolve)."""
+from conftest import NAAN, mint
+
+
+def resolve(client, identifiers):
+    response = client.post('/api/resolve', json={'identifiers': identifiers})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()['results']
+
+
+def test_mixed(client):
+    identifier = mint(client, url='https://example.org/item', who='Chen')
+    identifiers = [
+        f'ark:/{identifier}', 5, f'{NAAN}/b2zzzz1', 'abc/1', f'{identifier}/page/2',
+        None, f'{NAAN}/x9zzzz1', ['x'], identifier,
+    ]
+    results = resolve(client, identifiers)
+    assert [result['input'] for result in results] == identifiers
+    assert [result['match'] for result in results] == [
+        'ark', 'invalid', 'shoulder', 'invalid', 'ark', 'invalid', 'not_found', 'invalid', 'ark',
+    ]
+
+    ark = results[0]
+    assert ark['ark'] == f'ark:/{identifier}'
+    assert (ark['url'], ark['shoulder'], ark['who']) == ('https://example.org/item', 'b2', 'Chen')
+    assert results[4]['url'] == 'https://example.org/item/page/2'
+    assert results[2] == {
+        'input': f'{NAAN}/b2zzzz1', 'ark': f'ark:/{NAAN}/b2zzzz1', 'identifier': f'{NAAN}/b2zzzz1',
+        'match': 'shoulder', 'url': 'https://example.org/b2/zzzz1', 'shoulder': 'b2',
+    }
+    assert results[1]['error'] == 'Identifier must be a string'
+    assert results[6]['url'] is None
+
+
+def test_order_across_chunks(client):
+    identifiers = [mint(client, url=f'https://example.org/{i}') for i in range(3)]
+    # more than one chunk of 500, repeated identifiers included
+    inputs = [f'{NAAN}/b2zz{i}' for i in range(600)] + identifiers[::-1] + identifiers
+    results = resolve(client, inputs)
+    assert [result['input'] for result in results] == inputs
+    assert [result['url'] for result in results[600:]] == [f'https://example.org/{i}' for i in (2, 1, 0, 0, 1, 2)]
+
+
+def test_limit(configure):
+    client = configure(RESOLVE_BATCH_MAX=3).test_client()
+    assert len(resolve(client, ['abc/1'] * 3)) == 3
+    response = client.post('/api/resolve', json={'identifiers': ['abc/1'] * 4})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'At most 3 identifiers per request'
+
+
+def test_bad_request(client):
+    assert resolve(client, []) == []
+    for body in ({}, {'identifiers': 'abc/1'}, ['abc/1']):
+        assert client.post('/api/resolve', json=body).status_code == 400
+    assert client.post('/api/resolve', data='not json').status_code == 400
@@ -0,0 +1,150 @@
+"""Memory-mapped resolver index (RESOLVER_INDEX)."""
+import os
+
+import pytest
+
+from conftest import NAAN, mint
+from app.commands import resolver_index
+from app.db import get_db
+from app.resolver_index import FENCE, HEADER, MAGIC, SECTIONS, ResolverIndex, ResolverIndexHolder, build_resolver_index
+
+WATERMARK = '2024-01-01 00:00:00.000'
+
+
+def index_rows(count):
+    rows = [
+        (f'{NAAN}/b2{i:05d}', f'https://example.org/{i % 3}/{i}', 'b2' if i % 2 else None, f'2023-12-{i % 28 + 1:02d}')
+        for i in range(count)
+    ]
+    # non-ASCII identifiers sort by their UTF-8 bytes
+    rows.append((f'{NAAN}/b2é', 'https://example.org/é', 'b2', None))
+    return rows
+
+
+def test_format(tmp_path):
+    path = str(tmp_path / 'index')
+    rows = index_rows(10)
+    assert build_resolver_index(rows, path, WATERMARK) == 11
+    assert not os.path.exists(f'{path}.tmp')
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, count, watermark, *table = HEADER.unpack_from(data)
+    assert (magic, count) == (MAGIC, 11)
+    assert watermark.rstrip(b'\0').decode() == WATERMARK
+    offsets = table[::2]
+    assert offsets[0] >= HEADER.size
+    assert all(offset % 8 == 0 for offset in offsets)
+    assert offsets == sorted(offsets)
+    assert offsets[-1] + table[-1] == len(data)
+
+    index = ResolverIndex(path)
+    assert (len(index), index.watermark) == (11, WATERMARK)
+    # url prefixes and shoulders are interned
+    assert index._prefixes == ['https://example.org/0/', 'https://example.org/1/', 'https://example.org/2/', 'https://example.org/']
+    assert index._shoulders == ['', 'b2']
+    assert index.get(f'{NAAN}/b200001') == ('https://example.org/1/1', True, 'b2', '2023-12-02')
+    assert index.get(f'{NAAN}/b200002') == ('https://example.org/2/2', True, None, '2023-12-03')
+    assert index.get(f'{NAAN}/b2é') == ('https://example.org/é', True, 'b2', None)
+
+
+def test_fence_bisect(tmp_path):
+    path = str(tmp_path / 'index')
+    count = 5 * FENCE + 7
+    rows = index_rows(count)
+    build_resolver_index(rows, path, WATERMARK)
+    index = ResolverIndex(path)
+    assert len(index._fences) == (count + 1 + FENCE - 1) // FENCE
+
+    for i, (identifier, url, _, _) in enumerate(rows):
+        assert index.find(identifier) == i
+        assert index.get(identifier)[0] == url
+    # before the first key, between keys, past the last, prefixes of keys
+    for identifier in (f'{NAAN - 1}/b2', f'{NAAN}/b200000a', f'{NAAN}/b2{FENCE:05d}a', f'{NAAN}/b2z', f'{NAAN}/b2', ''):
+        assert index.find(identifier) == -1
+        assert index.get(identifier) is None
+
+
+def test_build_checks(tmp_path):
+    path = str(tmp_path / 'index')
+    with pytest.raises(ValueError, match='not sorted'):
+        build_resolver_index([(f'{NAAN}/b2', 'https://example.org/', None, None)] * 2, path, WATERMARK)
+    with pytest.raises(ValueError, match='not a resolver index'):
+        ResolverIndex(__file__)
+
+    # ARKs without a url resolve through their shoulder
+    assert build_resolver_index([(f'{NAAN}/b2x', '', 'b2', None)], path, WATERMARK) == 0
+    assert ResolverIndex(path).get(f'{NAAN}/b2x') is None
+
+
+def test_reload_after_replace(app, tmp_path):
+    path = str(tmp_path / 'index')
+    build_resolver_index([(f'{NAAN}/b2x', 'https://example.org/old', None, None)], path, WATERMARK)
+    holder = ResolverIndexHolder(path, interval=3600)
+    with app.app_context():
+        con = get_db()
+        assert holder.get(con, f'{NAAN}/b2x')[0] == 'https://example.org/old'
+        first = holder._index
+
+        build_resolver_index([(f'{NAAN}/b2x', 'https://example.org/new', None, None)], path, WATERMARK)
+        # not checked again before the interval is over
+        assert holder.get(con, f'{NAAN}/b2x')[0] == 'https://example.org/old'
+
+        holder.interval = 0
+        assert holder.get(con, f'{NAAN}/b2x')[0] == 'https://example.org/new'
+        assert holder._index is not first
+        # an unchanged file is not mapped again
+        second = holder._index
+        holder.get(con, f'{NAAN}/b2x')
+        assert holder._index is second
+
+        os.unlink(path)
+        assert holder.get(con, f'{NAAN}/b2x') is None
+        assert holder.stats() == {'loaded': False}
+
+
+def test_resolve(configure, client, runner, tmp_path):
+    path = str(tmp_path / 'index')
+    app = configure(RESOLVER_INDEX=path, RESOLVER_INDEX_INTERVAL=0)
+    identifier = mint(client, url='https://example.org/item/1')
+    with app.app_context():
+        con = get_db()
+        # older than the watermark, so only the file knows it
+        con.execute('UPDATE ark SET updated = ?', ('2000-01-01 00:00:00',))
+        con.commit()
+    result = runner.invoke(resolver_index, ['--overlap', '0'])
+    assert result.exit_code == 0, result.output
+    assert '1 ARKs' in result.output
+
+    holder = app.extensions['resolver_index']
+    response = client.get(f'/ark:/{identifier}')
+    assert response.headers['Location'] == 'https://example.org/item/1'
+    assert holder.stats()['overlay'] == 0
+    assert holder.hits == 1
+
+    # shoulder fallback and miss: the index doesn't know them
+    response = client.get(f'/ark:/{NAAN}/b2zzzz1')
+    assert response.headers['Location'] == 'https://example.org/b2/zzzz1'
+    assert client.get(f'/ark:/{NAAN}/x9zzzz1').status_code == 404
+    assert (holder.hits, holder.misses) == (1, 2)
+
+
+def test_overlay(configure, client, runner, tmp_path):
+    path = str(tmp_path / 'index')
+    app = configure(RESOLVER_INDEX=path, RESOLVER_INDEX_INTERVAL=0)
+    built = mint(client, url='https://example.org/built')
+    # default overlap: the watermark is a minute before the build
+    assert runner.invoke(resolver_index).exit_code == 0
+
+    fresh = mint(client, url='https://example.org/fresh')
+    with app.app_context():
+        con = get_db()
+        con.execute('UPDATE ark SET url = ? WHERE identifier = ?', ('https://example.org/changed', built))
+        con.commit()
+
+    holder = app.extensions['resolver_index']
+    assert client.get(f'/ark:/{fresh}').headers['Location'] == 'https://example.org/fresh'
+    assert client.get(f'/ark:/{built}').headers['Location'] == 'https://example.org/changed'
+    assert holder.stats()['overlay'] == 2
+    assert holder.hits == 2
+    assert holder._index.get(fresh) is None
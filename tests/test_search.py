@@ -0,0 +1,118 @@
+"""Full-text search over ARK metadata (/api/search)."""
+import json
+
+import pytest
+
+from conftest import NAAN, TEST_DATABASE_URI, mint
+from app.commands import ark_import
+from app.db import get_db
+
+
+def search(client, **params):
+    response = client.get('/api/search', query_string=params)
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    return [row['identifier'] for row in body['results']], body['next_cursor']
+
+
+def test_match(client):
+    bear = mint(client, who='Chen', what='Formosan black bear', when='2021')
+    mint(client, what='Bearing of a Formosan ship')
+    mint(client)
+
+    assert search(client, q='formosan BEAR') == ([bear], None)
+    assert search(client, q='bear') == ([bear], None)
+    assert search(client, q='chen 2021') == ([bear], None)
+    assert len(search(client, q='formos*')[0]) == 2
+    assert len(search(client, q='bear*')[0]) == 2
+    assert search(client, q='whale') == ([], None)
+
+    response = client.get('/api/search', query_string={'q': 'bear'})
+    [row] = response.get_json()['results']
+    assert row['ark'] == f'ark:/{bear}'
+    assert (row['naan'], row['shoulder'], row['who']) == (NAAN, 'b2', 'Chen')
+
+
+def test_filters(app, client):
+    with app.app_context():
+        con = get_db()
+        con.execute('INSERT INTO naan (naan, name) VALUES (?, ?)', (99999, 'other'))
+        con.execute(
+            'INSERT INTO shoulder (shoulder, naan, name, redirect_prefix, template) VALUES (?, ?, ?, ?, ?)',
+            ('b2', 99999, 'b2', '', '.reedeedk')
+        )
+        con.commit()
+    b2 = mint(client, what='bear')
+    s3 = mint(client, shoulder='s3', what='bear')
+    response = client.post(
+        '/api/mint', headers={'X-API-Key': 'test-api-key'},
+        json={'naan': 99999, 'shoulder': 'b2', 'url': 'https://example.org/', 'what': 'bear'},
+    )
+    other = response.get_json()['identifier']
+
+    assert sorted(search(client, q='bear')[0]) == sorted([b2, s3, other])
+    assert sorted(search(client, q='bear', naan=NAAN)[0]) == sorted([b2, s3])
+    assert search(client, q='bear', shoulder='s3')[0] == [s3]
+    assert search(client, q='bear', naan=99999, shoulder='b2')[0] == [other]
+    assert search(client, q='bear', naan=99999, shoulder='s3')[0] == []
+
+
+def test_cursor_pages(client):
+    identifiers = {mint(client, what=f'bear number{i}') for i in range(7)}
+    mint(client, what='whale')
+
+    seen = []
+    cursor = None
+    for pages in range(1, 10):
+        params = {'q': 'bear', 'limit': 3}
+        if cursor:
+            params['cursor'] = cursor
+        page, cursor = search(client, **params)
+        assert len(page) == (3 if cursor else 1)
+        seen.extend(page)
+        if cursor is None:
+            break
+    assert pages == 3
+    assert len(seen) == len(set(seen))
+    assert set(seen) == identifiers
+
+    # the last page of an exact multiple of `limit` has no next cursor
+    page, cursor = search(client, q='bear', limit=7)
+    assert (len(page), cursor) == (7, None)
+
+
+@pytest.mark.parametrize('cursor', ['abc', '-1', '9' * 30, '1\0'] if not TEST_DATABASE_URI else ['b2\0'])
+def test_invalid_cursor(client, cursor):
+    mint(client, what='bear')
+    response = client.get('/api/search', query_string={'q': 'bear', 'cursor': cursor})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Invalid cursor'
+
+
+@pytest.mark.parametrize('params', [{}, {'q': ' * '}, {'q': 'bear', 'limit': 0}, {'q': 'bear', 'limit': 1001}])
+def test_bad_request(client, params):
+    assert client.get('/api/search', query_string=params).status_code == 400
+
+
+def test_index_follows_writes(app, client, runner, tmp_path):
+    identifier = mint(client, who='Chen', what='bear')
+    assert search(client, q='chen')[0] == [identifier]
+
+    path = tmp_path / 'import.jsonl'
+    rows = [
+        {'identifier': identifier, 'url': 'https://example.org/item', 'who': 'Lin', 'what': 'bear'},
+        {'identifier': f'{NAAN}/b2x1', 'url': 'https://example.org/x1', 'what': 'imported whale'},
+    ]
+    path.write_text(''.join(json.dumps(row) + '\n' for row in rows))
+    result = runner.invoke(ark_import, [str(path), '--no-check-digits', '--on-conflict', 'replace'])
+    assert result.exit_code == 0, result.output
+
+    assert search(client, q='chen')[0] == []
+    assert search(client, q='lin bear')[0] == [identifier]
+    assert search(client, q='whale')[0] == [f'{NAAN}/b2x1']
+
+    with app.app_context():
+        con = get_db()
+        con.execute('DELETE FROM ark WHERE identifier = ?', (identifier,))
+        con.commit()
+    assert search(client, q='bear')[0] == []
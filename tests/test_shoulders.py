@@ -0,0 +1,88 @@
+"""Shoulder prefix index and mint target checks."""
+import pytest
+
+from conftest import API_KEY, NAAN
+from app.db import get_db
+from app.shoulders import SHOULDER_COLUMNS, ShoulderIndex, get_shoulder_index
+
+
+def shoulder_row(naan, shoulder):
+    return (shoulder, naan, shoulder, '', f'https://example.org/{shoulder}/', '.reedeedk', None)
+
+
+def test_longest_prefix():
+    index = ShoulderIndex([shoulder_row(NAAN, s) for s in ('b', 'b2', 'b2c', 'x9')] + [shoulder_row(99999, 'b2')])
+    assert len(index) == 5
+    assert index.match(NAAN, 'b2c4d')['shoulder'] == 'b2c'
+    assert index.match(NAAN, 'b2d4')['shoulder'] == 'b2'
+    assert index.match(NAAN, 'bz')['shoulder'] == 'b'
+    assert index.match(str(NAAN), 'x9q')['shoulder'] == 'x9'
+    assert index.match(NAAN, 'q1') is None
+    assert index.match(12345, 'b2') is None
+    assert index.match(99999, 'b2c')['naan'] == 99999
+
+    assert index.get(NAAN, 'b2')['shoulder'] == 'b2'
+    assert index.get(NAAN, 'b2c4') is None
+    assert sorted(row['shoulder'] for row in index.rows()) == ['b', 'b2', 'b2', 'b2c', 'x9']
+    assert set(index.get(NAAN, 'b')) == set(SHOULDER_COLUMNS)
+
+
+@pytest.mark.parametrize('naan, shoulder', [
+    (NAAN, 5), (NAAN, None), (NAAN, ['b2']), (None, 'b2'), ('abc', 'b2'), ({}, 'b2'),
+])
+def test_non_string_lookup(naan, shoulder):
+    index = ShoulderIndex([shoulder_row(NAAN, 'b2')])
+    assert index.get(naan, shoulder) is None
+    assert index.match(naan, shoulder) is None
+
+
+def test_reload_after_change(configure, client):
+    app = configure(SHOULDER_INDEX_TTL=3600)
+    with app.app_context():
+        assert get_shoulder_index().match(NAAN, 'b2x')['redirect_prefix'] == 'https://example.org/b2/'
+        con = get_db()
+        con.execute('UPDATE shoulder SET redirect_prefix = ? WHERE shoulder = ?', ('https://example.com/', 'b2'))
+        con.execute(
+            'INSERT INTO shoulder (shoulder, naan, name, redirect_prefix, template) VALUES (?, ?, ?, ?, ?)',
+            ('b2c', NAAN, 'b2c', 'https://example.net/', '.sdddk')
+        )
+        con.commit()
+
+        # stale until the TTL passes
+        assert get_shoulder_index().match(NAAN, 'b2x')['redirect_prefix'] == 'https://example.org/b2/'
+        index = get_shoulder_index(max_age=0)
+        assert index.match(NAAN, 'b2x')['redirect_prefix'] == 'https://example.com/'
+        assert index.match(NAAN, 'b2c1')['shoulder'] == 'b2c'
+
+    # a new shoulder is usable for minting without waiting for the TTL
+    with app.app_context():
+        app.extensions['shoulder_index'].invalidate()
+        get_shoulder_index()
+        con = get_db()
+        con.execute(
+            'INSERT INTO shoulder (shoulder, naan, name, redirect_prefix, template) VALUES (?, ?, ?, ?, ?)',
+            ('q7', NAAN, 'q7', 'https://example.net/', '.sdddk')
+        )
+        con.commit()
+    response = client.post(
+        '/api/mint', headers={'X-API-Key': API_KEY},
+        json={'naan': NAAN, 'shoulder': 'q7', 'url': 'https://example.org/item'},
+    )
+    assert response.status_code == 201, response.get_json()
+    assert response.get_json()['identifier'].startswith(f'{NAAN}/q7')
+
+
+@pytest.mark.parametrize('fields', [
+    {'shoulder': 5}, {'shoulder': ['b2']}, {'shoulder': {'b': 2}},
+    {'naan': 'abc'}, {'naan': [NAAN]}, {'template': 5},
+])
+@pytest.mark.parametrize('path, body', [
+    ('/api/mint', {'url': 'https://example.org/item'}),
+    ('/api/mint/batch', {'items': [{'url': 'https://example.org/item'}]}),
+])
+def test_mint_rejects_bad_types(client, path, body, fields):
+    response = client.post(
+        path, headers={'X-API-Key': API_KEY},
+        json={'naan': NAAN, 'shoulder': 'b2', **body, **fields},
+    )
+    assert response.status_code == 400, response.get_json()
@@ -0,0 +1,195 @@
+"""Writes and bulk reads, on SQLite or PostgreSQL (see conftest.py)."""
+import csv
+import io
+import json
+
+import pytest
+
+from conftest import NAAN, mint
+from app.commands import ark_export, ark_import, nginx_map
+from app.db import PostgresCursor, get_db, get_pool
+
+
+def write_import(tmp_path, rows, name='import.csv'):
+    path = tmp_path / name
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['identifier', 'url', 'who'])
+        writer.writerows(rows)
+    return str(path)
+
+
+def ark_rows(app):
+    with app.app_context():
+        rows = get_db().execute('SELECT identifier, url, who, created, updated FROM ark ORDER BY identifier')
+        return {row[0]: row[1:] for row in rows}
+
+
+@pytest.fixture
+def small_pages(monkeypatch):
+    # several executemany pages per import batch on PostgreSQL
+    monkeypatch.setattr(PostgresCursor, 'PAGE_SIZE', 2)
+
+
+def test_mint_and_resolve(client):
+    identifier = mint(client, url='https://example.org/item/1')
+    response = client.get(f'/ark:/{identifier}')
+    assert response.status_code == 302
+    assert response.headers['Location'] == 'https://example.org/item/1'
+
+
+def test_mint_sequential(client):
+    identifiers = [mint(client, shoulder='s3') for _ in range(3)]
+    assert len(set(identifiers)) == 3
+    assert all(i.startswith(f'{NAAN}/s3') for i in identifiers)
+
+
+def test_mint_batch(app, client):
+    response = client.post(
+        '/api/mint/batch', headers={'X-API-Key': 'test-api-key'},
+        json={'naan': NAAN, 'shoulder': 'b2', 'items': [{'url': f'https://example.org/{i}'} for i in range(5)]},
+    )
+    assert response.status_code == 201, response.get_json()
+    assert len(ark_rows(app)) == 5
+
+
+def test_executemany_rowcount(app, small_pages):
+    with app.app_context():
+        pool = get_pool()
+        con = get_db()
+        sql = pool.insert_sql('naan', ('naan', 'name'), on_conflict='ignore', key=('naan',))
+        cur = con.executemany(sql, [(NAAN, 'again')] + [(i, f'naan {i}') for i in range(1, 6)])
+        assert cur.rowcount == 5
+        con.commit()
+        assert con.execute('SELECT count(*) FROM naan').fetchone()[0] == 6
+
+
+def test_import_skip(app, runner, tmp_path, small_pages):
+    existing = mint(app.test_client(), url='https://example.org/old')
+    new = [(f'{NAAN}/b2{name}', f'https://example.org/{name}', '') for name in ('x1', 'x2', 'x3')]
+    path = write_import(tmp_path, [(existing, 'https://example.org/new', '')] + new)
+
+    result = runner.invoke(ark_import, [path, '--no-check-digits', '--batch-size', '3'])
+    assert result.exit_code == 0, result.output
+    assert 'Imported:         3' in result.output
+    assert 'Skipped (exists): 1' in result.output
+    assert ark_rows(app)[existing][0] == 'https://example.org/old'
+
+
+def test_import_replace(app, runner, tmp_path, small_pages):
+    path = write_import(tmp_path, [(f'{NAAN}/b2x{i}', f'https://example.org/{i}', 'a') for i in range(5)])
+    assert runner.invoke(ark_import, [path, '--no-check-digits']).exit_code == 0
+    before = ark_rows(app)
+
+    rows = [(f'{NAAN}/b2x{i}', f'https://example.org/{i}', 'b' if i < 2 else 'a') for i in range(5)]
+    path = write_import(tmp_path, rows, 'replace.csv')
+    result = runner.invoke(ark_import, [path, '--no-check-digits', '--on-conflict', 'replace'])
+    assert result.exit_code == 0, result.output
+    assert 'Imported:         2' in result.output
+    assert 'Unchanged:        3' in result.output
+
+    after = ark_rows(app)
+    for identifier, (url, who, created, updated) in after.items():
+        assert created == before[identifier][2]
+        if identifier.endswith(('x0', 'x1')):
+            assert who == 'b'
+        else:
+            assert updated == before[identifier][3]
+
+
+def test_import_fail(app, runner, tmp_path):
+    existing = mint(app.test_client())
+    path = write_import(tmp_path, [(existing, 'https://example.org/new', '')])
+    result = runner.invoke(ark_import, [path, '--no-check-digits', '--on-conflict', 'fail'])
+    assert result.exit_code != 0
+    assert 'Import stopped' in result.output
+
+
+def test_import_rejects_non_strings(app, runner, tmp_path):
+    rows = [
+        {'identifier': f'{NAAN}/b2x1', 'url': 'https://example.org/1'},
+        {'identifier': 5, 'url': 'https://example.org/2'},
+        {'ark': [f'{NAAN}/b2x3'], 'url': 'https://example.org/3'},
+        {'identifier': f'{NAAN}/b2x4', 'url': {'href': 'https://example.org/4'}},
+        {'identifier': f'{NAAN}/b2x5', 'url': 'https://example.org/5', 'shoulder': 2},
+        {'identifier': f'{NAAN}/b2x6', 'url': 'https://example.org/6', 'when': 2024},
+    ]
+    path = tmp_path / 'import.jsonl'
+    path.write_text(''.join(json.dumps(row) + '\n' for row in rows))
+    rejects = tmp_path / 'rejects.csv'
+
+    result = runner.invoke(ark_import, [str(path), '--no-check-digits', '--rejects', str(rejects)])
+    assert result.exit_code == 0, result.output
+    assert 'Imported:         1' in result.output
+    assert 'Rejected:         5' in result.output
+    with open(rejects, newline='') as f:
+        reasons = [row['reason'] for row in csv.DictReader(f)]
+    assert reasons == [
+        'identifier must be a string', 'ark must be a string', 'url must be a string',
+        'shoulder must be a string', 'when must be a string',
+    ]
+
+
+@pytest.mark.parametrize('drop_indexes', [False, True])
+def test_import_indexes(app, runner, tmp_path, monkeypatch, drop_indexes):
+    with app.app_context():
+        pool = get_pool()
+        con = pool.connect()
+        indexes = sorted(pool.secondary_indexes(con, 'ark'))
+        con.close()
+    assert indexes
+
+    calls = []
+    secondary_indexes = type(pool).secondary_indexes
+    monkeypatch.setattr(type(pool), 'secondary_indexes', lambda *args: calls.append(args) or secondary_indexes(*args))
+
+    path = write_import(tmp_path, [(f'{NAAN}/b2x{i}', f'https://example.org/{i}', '') for i in range(3)])
+    args = [path, '--no-check-digits'] + (['--drop-indexes'] if drop_indexes else [])
+    result = runner.invoke(ark_import, args)
+    assert result.exit_code == 0, result.output
+    assert len(calls) == drop_indexes
+    assert ('Rebuilding' in result.output) == drop_indexes
+
+    with app.app_context():
+        con = pool.connect()
+        assert sorted(pool.secondary_indexes(con, 'ark')) == indexes
+        con.close()
+
+
+def test_export(app, runner, tmp_path):
+    client = app.test_client()
+    identifiers = {mint(client, url=f'https://example.org/{i}') for i in range(3)}
+    output = tmp_path / 'export.csv'
+
+    result = runner.invoke(ark_export, [str(output), '--watermark', str(tmp_path / 'watermark'), '--overlap', '0'])
+    assert result.exit_code == 0, result.output
+    with open(output, newline='') as f:
+        assert {row['identifier'] for row in csv.DictReader(f)} == identifiers
+
+    # nothing changed since the watermark
+    output = tmp_path / 'export.jsonl'
+    result = runner.invoke(ark_export, [str(output), '--format', 'jsonl', '--watermark', str(tmp_path / 'watermark'), '--overlap', '0'])
+    assert result.exit_code == 0, result.output
+    assert output.read_text() == ''
+
+
+def test_nginx_map(app, runner, configure, tmp_path):
+    client = app.test_client()
+    identifiers = [mint(client, url=f'https://example.org/{i}') for i in range(3)]
+    output = tmp_path / 'ark-map.conf'
+
+    result = runner.invoke(nginx_map, [str(output)])
+    assert result.exit_code == 0, result.output
+    content = output.read_text()
+    for i, identifier in enumerate(identifiers):
+        assert f'"/ark:/{identifier}" "302 0 https://example.org/{i}";' in content
+    # shoulder fallbacks (and later mints) are left to the resolver
+    assert '~' not in content
+
+    # a policy change rewrites entries of unchanged rows
+    configure(REDIRECT_POLICIES={f'{NAAN}/b2': {'status': 301, 'max_age': 600}})
+    result = runner.invoke(nginx_map, [str(output), '--incremental'])
+    assert result.exit_code == 0, result.output
+    content = output.read_text()
+    for i, identifier in enumerate(identifiers):
+        assert f'"/ark:/{identifier}" "301 600 https://example.org/{i}";' in content
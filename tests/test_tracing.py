@@ -0,0 +1,95 @@
+"""Per-request tracing and the slow-request log (TRACING)."""
+import json
+
+import pytest
+
+from conftest import NAAN, mint
+from app import tracing
+
+
+@pytest.fixture
+def trace_app(app, monkeypatch, tmp_path):
+    """trace_app(**config): re-run tracing.init_app, undone after the test."""
+    log = tmp_path / 'slow.log'
+    for name in ('_enabled', '_sample_rate', '_slow_ms', '_query_plans'):
+        monkeypatch.setattr(tracing, name, getattr(tracing, name, None), raising=False)
+    # init-db ran alembic's fileConfig in this process, which disables existing loggers
+    monkeypatch.setattr(tracing.logger, 'disabled', False)
+    monkeypatch.setattr(app, 'before_request_funcs', {k: list(v) for k, v in app.before_request_funcs.items()})
+    monkeypatch.setattr(app, 'after_request_funcs', {k: list(v) for k, v in app.after_request_funcs.items()})
+
+    def trace_app(**config):
+        app.config.update(SLOW_REQUEST_LOG=str(log), TRACE_SAMPLE_RATE=1.0)
+        app.config.update(config)
+        # init_app registers request hooks, normally before the first request
+        monkeypatch.setattr(app, '_got_first_request', False)
+        tracing.init_app(app)
+        return log
+
+    yield trace_app
+    for handler in tracing.logger.handlers:
+        handler.close()
+    tracing.logger.handlers.clear()
+
+
+def log_lines(log):
+    for handler in tracing.logger.handlers:
+        handler.flush()
+    if not log.exists():
+        return []
+    return [json.loads(line) for line in log.read_text().splitlines()]
+
+
+def test_off(app, client, trace_app):
+    before = {k: list(v) for k, v in app.after_request_funcs.items()}
+    log = trace_app(TRACING=False, SLOW_REQUEST_MS=0)
+    assert app.after_request_funcs == before
+
+    identifier = mint(client)
+    with app.test_request_context():
+        assert tracing.current_trace() is None
+        assert tracing.span('cache') is tracing._null_span
+    assert client.get(f'/ark:/{identifier}').status_code == 302
+    assert log_lines(log) == []
+
+
+def test_slow_request(app, client, trace_app):
+    identifier = mint(client, url='https://example.org/item')
+    log = trace_app(TRACING=True, SLOW_REQUEST_MS=0, TRACE_QUERY_PLANS=True)
+
+    assert client.get(f'/ark:/{identifier}?info').status_code == 302
+    [line] = log_lines(log)
+    assert line['method'] == 'GET'
+    assert line['path'] == f'/ark:/{identifier}?info'
+    assert line['route'] == '/ark:/<path:identifier>'
+    assert line['status'] == 302
+    spans = {entry['name']: entry for entry in line['spans']}
+    assert {'cache', 'resolve_ark'} <= set(spans)
+    query = spans['resolve_ark']
+    assert query['duration_ms'] >= 0
+    assert 'FROM ark' in query['sql']
+    assert query['plan'] and not query['plan'][0].startswith('error')
+    assert 'params' not in query
+
+
+def test_fast_request(app, client, trace_app):
+    log = trace_app(TRACING=True, SLOW_REQUEST_MS=60000)
+    assert client.get(f'/ark:/{NAAN}/b2x1').status_code == 302
+    assert log_lines(log) == []
+
+
+def test_unsampled(app, client, trace_app):
+    log = trace_app(TRACING=True, SLOW_REQUEST_MS=0, TRACE_SAMPLE_RATE=0.0)
+    assert client.get(f'/ark:/{NAAN}/b2x1').status_code == 302
+    assert log_lines(log) == []
+
+
+def test_mint_values_not_logged(app, client, trace_app):
+    log = trace_app(TRACING=True, SLOW_REQUEST_MS=0, TRACE_QUERY_PLANS=True)
+    mint(client, url='https://example.org/private-url', who='private-who', what='private-what')
+
+    [line] = log_lines(log)
+    assert line['route'] == '/api/mint'
+    names = [entry['name'] for entry in line['spans']]
+    assert 'mint_insert' in names
+    assert 'private' not in json.dumps(line)